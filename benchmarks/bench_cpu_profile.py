@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Seconds per output on the CPU under each CPU profile setting (see the
+STUDIO_CPU_* variables in studio/device.py).
+
+Every (target, setting) pair runs in a fresh subprocess with CUDA hidden,
+because torch only accepts thread settings before its first parallel op.
+"fp32-default" approximates torch's own defaults (a thread per logical core
+for both pools); the others use the tuned thread counts. int8 only applies
+to the audio models. Speedup is relative to the first setting of each target.
+
+    python benchmarks/bench_cpu_profile.py --targets musicgen parler --repeats 3
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+_cores = str(os.cpu_count() or 1)
+SETTINGS = {
+    "fp32-default": {"STUDIO_CPU_THREADS": _cores, "STUDIO_CPU_INTEROP": _cores, "STUDIO_CPU_BF16": "0", "STUDIO_CPU_INT8": "0"},
+    "fp32-tuned": {"STUDIO_CPU_BF16": "0", "STUDIO_CPU_INT8": "0"},
+    "bf16": {"STUDIO_CPU_BF16": "1", "STUDIO_CPU_INT8": "0"},
+    "int8": {"STUDIO_CPU_BF16": "0", "STUDIO_CPU_INT8": "1"},
+    "bf16+int8": {"STUDIO_CPU_BF16": "1", "STUDIO_CPU_INT8": "1"},
+}
+TARGETS = ("musicgen", "parler", "sdxl")
+INT8_TARGETS = ("musicgen", "parler")
+
+
+def make_musicgen(args):
+    from studio import audio_lab
+
+    audio_lab.load_model(args.musicgen_size)
+    return lambda: audio_lab.generate_audio("upbeat chiptune loop", args.seconds, args.musicgen_size)
+
+
+def make_parler(args):
+    import torch
+    from studio import resources, voice_gen
+    from studio.device import cpu_autocast
+
+    model, tokenizer = voice_gen.load_model()
+    description = voice_gen.VOICE_PRESETS[voice_gen.get_voice_names()[0]]
+    input_ids = tokenizer(description, return_tensors="pt").input_ids
+    prompt_ids = tokenizer("The quick brown fox jumps over the lazy dog.", return_tensors="pt").input_ids
+
+    def run():
+        with resources.using("voice") as device, cpu_autocast(device), torch.no_grad():
+            model.generate(input_ids=input_ids, prompt_input_ids=prompt_ids)
+    return run
+
+
+def make_sdxl(args):
+    from studio import image_gen
+    from studio.device import cpu_autocast
+
+    pipe = image_gen.load_model(args.model or image_gen.get_default_model())
+
+    def run():
+        with cpu_autocast("cpu"):
+            pipe(prompt="a red fox in the snow", width=args.size, height=args.size,
+                 num_inference_steps=args.steps)
+    return run
+
+
+def worker(args):
+    """Runs inside the subprocess: time one target under the inherited env."""
+    from studio.device import configure_cpu
+
+    profile = configure_cpu()
+    run = {"musicgen": make_musicgen, "parler": make_parler, "sdxl": make_sdxl}[args.worker](args)
+    run()  # warm-up: oneDNN primitive creation, allocator growth
+    times = []
+    for _ in range(args.repeats):
+        start = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - start)
+    print(json.dumps({"profile": profile, "seconds": min(times)}))
+
+
+def spawn(target, setting, args):
+    env = {**os.environ, **SETTINGS[setting], "CUDA_VISIBLE_DEVICES": ""}
+    cmd = [sys.executable, os.path.abspath(__file__), "--worker", target,
+           "--repeats", str(args.repeats), "--seconds", str(args.seconds),
+           "--musicgen-size", args.musicgen_size, "--size", str(args.size), "--steps", str(args.steps)]
+    if args.model:
+        cmd += ["--model", args.model]
+    result = subprocess.run(cmd, env=env, cwd=ROOT, capture_output=True, text=True)
+    if result.returncode != 0:
+        print(result.stderr[-2000:])
+        return None
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--targets", nargs="+", choices=TARGETS, default=list(TARGETS))
+    parser.add_argument("--settings", nargs="+", choices=list(SETTINGS), default=list(SETTINGS))
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--seconds", type=float, default=5, help="MusicGen audio length")
+    parser.add_argument("--musicgen-size", default="small")
+    parser.add_argument("--model", default=None, help="SDXL checkpoint (default: first in models/)")
+    parser.add_argument("--size", type=int, default=512, help="SDXL image size")
+    parser.add_argument("--steps", type=int, default=4, help="SDXL steps")
+    parser.add_argument("--worker", choices=TARGETS, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        worker(args)
+        return
+
+    rows = []
+    for target in args.targets:
+        baseline = None
+        for setting in args.settings:
+            if "int8" in setting and target not in INT8_TARGETS:
+                continue
+            print(f"  {target:9} {setting:13}", end=" ", flush=True)
+            result = spawn(target, setting, args)
+            if result is None:
+                print("failed")
+                continue
+            seconds = result["seconds"]
+            baseline = baseline or seconds
+            print(f"{seconds:7.2f}s  {result['profile']}")
+            rows.append((target, setting, result["profile"], seconds, baseline / seconds))
+
+    print("\n| target | setting | threads | interop | s/output | speedup |")
+    print("|---|---|---|---|---|---|")
+    for target, setting, profile, seconds, speedup in rows:
+        print(f"| {target} | {setting} | {profile['threads']} | {profile['interop']} | {seconds:.2f} | {speedup:.2f}x |")
+
+
+if __name__ == "__main__":
+    main()
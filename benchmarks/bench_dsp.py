@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Throughput of the audio post-processing chain (studio/dsp.py) in samples per
+second, per stage and end to end, plus what the chain delivers: integrated
+loudness and true peak of the output.
+
+The input is synthetic: a 60 Hz bass, noise bursts and a DC offset, loud
+enough that the limiter has work to do. "peak-normalize" is the old voice
+path (scale to 0.95 peak, clip to int16) for comparison. If pyloudnorm is
+installed, its loudness reading of the input is shown as a cross-check.
+
+    python benchmarks/bench_dsp.py --seconds 60 --rates 32000 44100 48000
+"""
+import os
+import sys
+import time
+import argparse
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def synthetic_mix(seconds, sample_rate, seed=0):
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(seconds * sample_rate)) / sample_rate
+    bursts = (np.sin(2 * np.pi * 2 * t) > 0.6) * rng.normal(0, 0.4, len(t))
+    return (0.7 * np.sin(2 * np.pi * 60 * t) + bursts + 0.05).astype(np.float32)
+
+
+def rate(fn, audio, repeats):
+    """Best-of-repeats samples per second for fn(copy of audio)."""
+    best = float("inf")
+    for _ in range(repeats):
+        buf = audio.copy()
+        start = time.perf_counter()
+        fn(buf)
+        best = min(best, time.perf_counter() - start)
+    return len(audio) / best
+
+
+def peak_normalize(audio):
+    peak = np.max(np.abs(audio))
+    return np.clip(audio / peak * 0.95 * 32767, -32768, 32767).astype(np.int16)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, default=30)
+    parser.add_argument("--rates", nargs="+", type=int, default=[32000, 44100])
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    from studio import dsp
+
+    for sample_rate in args.rates:
+        audio = synthetic_mix(args.seconds, sample_rate)
+        stages = {
+            "remove_dc": lambda a: dsp.remove_dc(a, sample_rate),
+            "loudness": lambda a: dsp.loudness(a, sample_rate),
+            "normalize_loudness": lambda a: dsp.normalize_loudness(a, sample_rate, dsp.MUSIC_LUFS),
+            "limit": lambda a: dsp.limit(a * 2, sample_rate),
+            "fade": lambda a: dsp.fade(a, sample_rate),
+            "resample -> 48 kHz": lambda a: dsp.resample(a, sample_rate, 48000),
+            "to_int16": dsp.to_int16,
+            "process (full chain)": lambda a: dsp.to_int16(dsp.process(a, sample_rate, target_rate=None)[1]),
+            "peak-normalize (old)": peak_normalize,
+        }
+        print(f"\n{args.seconds:g} s at {sample_rate} Hz ({len(audio)} samples)")
+        print("| stage | Msamples/s | x realtime |")
+        print("|---|---|---|")
+        for name, fn in stages.items():
+            speed = rate(fn, audio, args.repeats)
+            print(f"| {name} | {speed / 1e6:.1f} | {speed / sample_rate:.0f} |")
+
+        _, out = dsp.process(audio, sample_rate, target_rate=None)
+        print(f"input {dsp.loudness(audio, sample_rate):.2f} LUFS -> output {dsp.loudness(out, sample_rate):.2f} LUFS "
+              f"(target {dsp.MUSIC_LUFS:g}), true peak {20 * np.log10(dsp.true_peaks(audio).max()):.2f} -> "
+              f"{20 * np.log10(dsp.true_peaks(out).max()):.2f} dBTP (ceiling {dsp.TRUE_PEAK_DB:g})")
+        try:
+            import pyloudnorm
+            print(f"pyloudnorm reads the input as {pyloudnorm.Meter(sample_rate).integrated_loudness(audio):.2f} LUFS")
+        except ImportError:
+            pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Image encode time and size per output format/setting.
+
+Encodes one image (a generated output, or a synthetic 1024x1024 test image)
+as PNG at several zlib levels, lossless WebP at several efforts, and QOI,
+through the same studio.output.encode_image path the app uses. QOI is listed
+for reference: Pillow's QOI encoder is much slower than its PNG encoder.
+
+    python benchmarks/bench_encode.py --image ~/CreationStudio/outputs/images/img_....png
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def synthetic(size):
+    """Smooth gradients plus grain: roughly as compressible as a photo-like render."""
+    import numpy as np
+    from PIL import Image
+
+    y, x = np.mgrid[0:size, 0:size].astype(np.float32) / size
+    rgb = np.stack([x, y, (x + y) / 2], axis=-1) * 255
+    rgb += np.random.default_rng(0).normal(0, 6, rgb.shape)
+    return Image.fromarray(np.clip(rgb, 0, 255).astype(np.uint8))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--image", default=None, help="image to encode (default: synthetic)")
+    parser.add_argument("--size", type=int, default=1024, help="synthetic image size")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    from PIL import Image
+    from studio import output
+
+    image = Image.open(args.image).convert("RGB") if args.image else synthetic(args.size)
+    Image.init()
+    cases = [("PNG", "png", {"compress_level": level}, f"level {level}") for level in (0, 1, 3, 6, 9)]
+    cases += [("WEBP", "webp", {"lossless": True, "method": m}, f"lossless m{m}") for m in (0, 1, 4, 6)]
+    if "QOI" in Image.SAVE:
+        cases.append(("QOI", "qoi", {}, ""))
+
+    print(f"{image.width}x{image.height}\n")
+    print("| format | setting | ms | MB | vs PNG level 6 |")
+    print("|---|---|---|---|---|")
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for fmt, ext, params, label in cases:
+            path = os.path.join(tmp, f"out.{ext}")
+            times = []
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                output.encode_image(image, path, fmt, **params)
+                times.append(time.perf_counter() - start)
+            rows.append((fmt, label, min(times) * 1000, os.path.getsize(path) / 2**20))
+    base = next(r for r in rows if r[0] == "PNG" and r[1] == "level 6")
+    for fmt, label, ms, mb in rows:
+        print(f"| {fmt} | {label} | {ms:.0f} | {mb:.2f} | {base[2] / ms:.1f}x faster, {mb / base[3]:.2f}x size |")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Loop-point detection (studio/loops.py) on synthetic beats: detected vs. true
+BPM, loop length, time per call, and how the seam compares with the old
+crossfade-the-ends method.
+
+Each clip is a kick/hi-hat pattern over a bass drone, starting after a short
+silent intro like MusicGen output often does. "drift" is how far the loop
+wrap point shifts the beat grid (ms); "click" is the jump between the
+last and first sample relative to the clip's 99th-percentile sample-to-sample
+change (below 1 = no steeper than the clip's own transients). No models are needed.
+
+    python benchmarks/bench_loops.py --bpms 90 120 174 --seconds 20
+"""
+import os
+import sys
+import time
+import argparse
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+SAMPLE_RATE = 32000  # MusicGen's rate
+
+
+def synthetic_beat(bpm, seconds, sample_rate=SAMPLE_RATE, intro=0.37, seed=0):
+    """Kick on even beats, noise hi-hat on odd beats, 55 Hz drone underneath."""
+    rng = np.random.default_rng(seed)
+    n = int(seconds * sample_rate)
+    t = np.arange(n) / sample_rate
+    audio = 0.05 * np.sin(2 * np.pi * 55 * t)
+    beat = 60 / bpm
+    hit = np.arange(4000)
+    decay = np.exp(-hit / 600)
+    for i in range(int((seconds - intro) / beat)):
+        pos = int((intro + i * beat) * sample_rate)
+        length = min(len(hit), n - pos)
+        if i % 2 == 0:
+            sound = 0.6 * np.sin(2 * np.pi * 60 * hit / sample_rate) * decay
+        else:
+            sound = 0.3 * rng.normal(0, 1, len(hit)) * decay
+        audio[pos:pos + length] += sound[:length]
+    return audio.astype(np.float32)
+
+
+def drift_ms(start, end, bpm, sample_rate=SAMPLE_RATE, intro=0.37):
+    """Beat-grid jump when playback wraps from end back to start.
+
+    The true beats are at intro + k * beat; after the wrap the next beat
+    should come one beat after the last one before end.
+    """
+    beat = 60 * sample_rate / bpm
+    first = intro * sample_rate
+    last_before_end = first + np.floor((end - first) / beat) * beat
+    next_after_start = first + max(0, np.ceil((start - first) / beat)) * beat
+    gap = (end - last_before_end) + (next_after_start - start)
+    off = gap % beat
+    return min(off, beat - off) / sample_rate * 1000
+
+
+def click(loop):
+    """|Δ| across the wrap point over the 99th-percentile |Δ| within the loop."""
+    steep = np.percentile(np.abs(np.diff(loop)), 99) + 1e-9
+    return float(abs(loop[0] - loop[-1]) / steep)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--bpms", nargs="+", type=float, default=[70, 85, 100, 120, 128, 140, 174])
+    parser.add_argument("--seconds", type=float, default=29.7, help="clip length; MusicGen clips rarely end on a beat")
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    from studio import audio_lab, loops
+
+    print("| true BPM | detected | bars | loop s | ms/call | drift ms (naive) | drift ms (loops) | click (naive) | click (loops) |")
+    print("|---|---|---|---|---|---|---|---|---|")
+    for bpm in args.bpms:
+        audio = synthetic_beat(bpm, args.seconds)
+        times = []
+        for _ in range(args.repeats):
+            start = time.perf_counter()
+            found = loops.find_loop(audio, SAMPLE_RATE)
+            times.append(time.perf_counter() - start)
+        naive = audio_lab._crossfade_ends(audio, SAMPLE_RATE, 500)
+        if found is None:
+            print(f"| {bpm:g} | none | | | {min(times) * 1000:.0f} | {drift_ms(0, len(naive), bpm):.1f} | | {click(naive):.2f} | |")
+            continue
+        begin, end, detected = found
+        loop = loops.crossfade_loop(audio, begin, end, int(SAMPLE_RATE * loops.CROSSFADE_MS / 1000))
+        bars = (end - begin) / SAMPLE_RATE * detected / 60 / loops.BEATS_PER_BAR
+        print(f"| {bpm:g} | {detected:.2f} | {bars:.0f} | {len(loop) / SAMPLE_RATE:.2f} | {min(times) * 1000:.0f} "
+              f"| {drift_ms(0, len(naive), bpm):.1f} | {drift_ms(begin, end, bpm):.1f} "
+              f"| {click(naive):.2f} | {click(loop):.2f} |")
+
+
+if __name__ == "__main__":
+    main()
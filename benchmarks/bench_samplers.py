@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Quality-per-second table across SDXL samplers at 10/20/30 steps.
+
+Every sampler renders the same prompts and seeds. Quality is PSNR against a
+50-step DPM++ 2M Karras reference of the same seed, so higher means closer to
+a converged image; ancestral samplers (Euler a) inject fresh noise each step
+and converge to a different image, so their PSNR understates them. LoRA
+samplers are included only when their LoRA is present and are run at 4/8
+steps as well.
+
+    python benchmarks/bench_samplers.py --size 768 --seeds 1 2
+"""
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+PROMPTS = [
+    "a cinematic photo of a mountain lake at sunrise, golden light, mist rising",
+    "a detailed fantasy sword on a stone pedestal, studio lighting",
+]
+
+
+def psnr(a, b):
+    import numpy as np
+    mse = np.mean((np.asarray(a, dtype=np.float32) - np.asarray(b, dtype=np.float32)) ** 2)
+    return float("inf") if mse == 0 else 10 * np.log10(255.0 ** 2 / mse)
+
+
+def render(pipe, sampler, prompt, seed, steps, size, cfg):
+    import torch
+    from studio import image_gen, lora
+
+    few_step_lora = image_gen.sampler_lora(sampler)
+    lora.apply(pipe, [(few_step_lora, 1.0)] if few_step_lora else [])
+    with image_gen.use_scheduler(pipe, sampler):
+        start = time.perf_counter()
+        image = pipe(
+            prompt=prompt,
+            width=size,
+            height=size,
+            num_inference_steps=steps,
+            guidance_scale=cfg,
+            generator=torch.Generator(device="cpu").manual_seed(seed),
+        ).images[0]
+    return image, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default=None)
+    parser.add_argument("--size", type=int, default=1024)
+    parser.add_argument("--seeds", type=int, nargs="+", default=[1])
+    parser.add_argument("--cfg", type=float, default=7.0)
+    args = parser.parse_args()
+
+    from studio import image_gen, lora
+
+    pipe = image_gen.load_model(args.model or image_gen.get_default_model())
+
+    references = {}
+    for prompt in PROMPTS:
+        for seed in args.seeds:
+            references[prompt, seed], _ = render(pipe, "DPM++ 2M Karras", prompt, seed, 50, args.size, args.cfg)
+
+    print("\n| sampler | steps | s/image | PSNR vs ref (dB) | dB per second |")
+    print("|---|---|---|---|---|")
+    for sampler, spec in image_gen.SCHEDULERS.items():
+        step_counts = [10, 20, 30]
+        cfg = args.cfg
+        if spec and spec[2]:
+            if lora.find_lora(spec[2]) is None:
+                print(f"| {sampler} | - | skipped (no LoRA) | | |")
+                continue
+            step_counts = [4, 8] + step_counts
+            cfg = min(cfg, image_gen.FEW_STEP_MAX_CFG)
+
+        for steps in step_counts:
+            seconds, scores = [], []
+            for prompt in PROMPTS:
+                for seed in args.seeds:
+                    image, t = render(pipe, sampler, prompt, seed, steps, args.size, cfg)
+                    seconds.append(t)
+                    scores.append(psnr(image, references[prompt, seed]))
+            mean_t = sum(seconds) / len(seconds)
+            mean_q = sum(scores) / len(scores)
+            print(f"| {sampler} | {steps} | {mean_t:.2f} | {mean_q:.2f} | {mean_q / mean_t:.2f} |")
+
+
+if __name__ == "__main__":
+    main()
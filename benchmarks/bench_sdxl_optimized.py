@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+SDXL seconds-per-step: default pipeline vs. optimized mode.
+
+Baseline is what load_model() builds by default (attention slicing + VAE
+tiling); optimized is image_gen.optimize_pipeline (channels-last, SDPA,
+fused QKV, torch.compile). The first optimized run includes compilation,
+so it is reported separately from the steady-state timing.
+
+    python benchmarks/bench_sdxl_optimized.py --devices cpu cuda --steps 10
+"""
+import os
+import sys
+import json
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def time_steps(pipe, steps, size, seed=1):
+    """Run one generation; return (total seconds, mean seconds per denoising step)."""
+    import torch
+    stamps = []
+
+    def on_step(pipeline, step, timestep, callback_kwargs):
+        stamps.append(time.perf_counter())
+        return callback_kwargs
+
+    start = time.perf_counter()
+    pipe(
+        prompt="a lighthouse on a cliff at sunset, detailed oil painting",
+        width=size,
+        height=size,
+        num_inference_steps=steps,
+        generator=torch.Generator(device="cpu").manual_seed(seed),
+        callback_on_step_end=on_step,
+    )
+    total = time.perf_counter() - start
+    per_step = (stamps[-1] - stamps[0]) / (len(stamps) - 1) if len(stamps) > 1 else total
+    return total, per_step
+
+
+def bench_device(model_name, device, steps, size):
+    import torch
+    from diffusers import StableDiffusionXLPipeline
+    from studio import image_gen
+
+    dtype = torch.float16 if device == "cuda" else torch.float32
+    rows = []
+    for mode in ("baseline", "optimized"):
+        pipe = image_gen.load_checkpoint(StableDiffusionXLPipeline, model_name, dtype=dtype).to(device)
+        pipe.enable_vae_tiling()
+        if mode == "optimized":
+            image_gen.optimize_pipeline(pipe, device)
+        else:
+            pipe.enable_attention_slicing()
+
+        first, _ = time_steps(pipe, steps, size)
+        total, per_step = time_steps(pipe, steps, size)
+        rows.append({
+            "device": device, "mode": mode, "size": size, "steps": steps,
+            "first_run_s": round(first, 2), "total_s": round(total, 2), "s_per_step": round(per_step, 3),
+        })
+        print(f"  {device:5} {mode:10} first={first:7.2f}s  run={total:7.2f}s  {per_step:.3f} s/step")
+        del pipe
+        if device == "cuda":
+            torch.cuda.empty_cache()
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default=None, help="checkpoint name (default: image_gen default)")
+    parser.add_argument("--devices", nargs="+", default=["cpu", "cuda"])
+    parser.add_argument("--steps", type=int, default=10)
+    parser.add_argument("--size", type=int, default=None, help="default 1024 on CUDA, 512 on CPU")
+    parser.add_argument("--json", default=None, help="write results to this file")
+    args = parser.parse_args()
+
+    import torch
+    from studio import image_gen
+
+    model_name = args.model or image_gen.get_default_model()
+    results = []
+    for device in args.devices:
+        if device == "cuda" and not torch.cuda.is_available():
+            print("  cuda  skipped (not available)")
+            continue
+        size = args.size or (1024 if device == "cuda" else 512)
+        results += bench_device(model_name, device, args.steps, size)
+
+    print("\n| device | mode | size | s/step | speedup |")
+    print("|---|---|---|---|---|")
+    for r in results:
+        base = next(b for b in results if b["device"] == r["device"] and b["mode"] == "baseline")
+        print(f"| {r['device']} | {r['mode']} | {r['size']} | {r['s_per_step']:.3f} | {base['s_per_step'] / r['s_per_step']:.2f}x |")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"model": model_name, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
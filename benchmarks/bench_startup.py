@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Startup import-time benchmark for studio.app.
+
+Runs `python -X importtime -c "import studio.app"` in a fresh interpreter,
+prints the slowest modules by cumulative time, and fails if the total exceeds
+the budget or if a heavy ML package is imported before any handler runs.
+
+    python benchmarks/bench_startup.py [--budget 1.5] [--top 15]
+"""
+import os
+import sys
+import argparse
+import subprocess
+
+STUDIO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Must stay out of the startup path; they load on a tab's first request
+HEAVY_MODULES = ["torch", "diffusers", "transformers", "parler_tts"]
+
+
+def profile_imports(target="studio.app"):
+    """Return [(self_us, cumulative_us, module)] from -X importtime."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {target}"],
+        cwd=STUDIO_ROOT, capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        sys.exit(result.stderr.strip().splitlines()[-1])
+
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cum_us, name = line[len("import time:"):].split("|")
+        rows.append((int(self_us), int(cum_us), name[1:].rstrip()))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--target", default="studio.app")
+    parser.add_argument("--budget", type=float, default=1.5, help="max total import seconds")
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    rows = profile_imports(args.target)
+    # Top-level imports have no indentation in the module column
+    total_us = sum(cum for _, cum, name in rows if not name.startswith(" "))
+
+    print(f"\n  Import profile for {args.target}")
+    print(f"  {'cumulative':>12}  {'self':>10}  module")
+    for self_us, cum_us, name in sorted(rows, key=lambda r: r[1], reverse=True)[:args.top]:
+        print(f"  {cum_us / 1000:>10.1f}ms  {self_us / 1000:>8.1f}ms  {name.strip()}")
+    print(f"\n  Total: {total_us / 1e6:.2f}s (budget {args.budget:.2f}s)")
+
+    imported = {name.strip() for _, _, name in rows}
+    heavy = [m for m in HEAVY_MODULES if m in imported]
+    failed = False
+    if heavy:
+        print(f"  FAIL: heavy modules imported at startup: {', '.join(heavy)}")
+        failed = True
+    if total_us / 1e6 > args.budget:
+        print("  FAIL: import time over budget")
+        failed = True
+    if not failed:
+        print("  OK")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
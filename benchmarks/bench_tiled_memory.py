@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Peak memory and time vs. canvas size: tiled large-canvas mode vs. a direct
+SDXL pipeline call.
+
+Memory is peak allocated CUDA memory. On CPU/MPS it is the process's peak
+RSS, which never goes down, so sizes run smallest first and each row is the
+high-water mark up to that point. Direct calls stop at the first size that
+runs out of memory.
+
+    python benchmarks/bench_tiled_memory.py --sizes 1024 2048 4096 --steps 10
+"""
+import os
+import sys
+import time
+import argparse
+import resource
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+PROMPT = "seamless stone wall texture, moss between the bricks, highly detailed"
+
+
+def reset_peak():
+    import torch
+    if torch.cuda.is_available():
+        torch.cuda.empty_cache()
+        torch.cuda.reset_peak_memory_stats()
+
+
+def peak_mb():
+    import torch
+    if torch.cuda.is_available():
+        return torch.cuda.max_memory_allocated() / 2**20
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / 2**20 if sys.platform == "darwin" else rss / 2**10
+
+
+def run_direct(pipe, size, steps, generator):
+    pipe(prompt=PROMPT, width=size, height=size, num_inference_steps=steps, generator=generator)
+
+
+def run_tiled(pipe, size, steps, generator, tile_size, overlap, model_name):
+    from studio import tiled
+    tiled.render(pipe, PROMPT, "", size, size, steps, 7.0, generator,
+                 tile_size=tile_size, overlap=overlap, model_name=model_name)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default=None)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1024, 2048, 3072, 4096])
+    parser.add_argument("--steps", type=int, default=10)
+    parser.add_argument("--tile", type=int, default=None, help="tile size (default tiled.TILE_SIZE)")
+    parser.add_argument("--overlap", type=int, default=None, help="tile overlap (default tiled.TILE_OVERLAP)")
+    parser.add_argument("--no-direct", action="store_true", help="skip direct pipeline calls")
+    args = parser.parse_args()
+
+    import torch
+    from studio import image_gen, tiled
+
+    model_name = args.model or image_gen.get_default_model()
+    tile = args.tile or tiled.TILE_SIZE
+    overlap = args.overlap or tiled.TILE_OVERLAP
+    pipe = image_gen.load_model(model_name)
+
+    rows = []
+    direct_ok = not args.no_direct
+    for size in sorted(args.sizes):
+        modes = [("tiled", lambda g: run_tiled(pipe, size, args.steps, g, tile, overlap, model_name))]
+        if direct_ok:
+            modes.insert(0, ("direct", lambda g: run_direct(pipe, size, args.steps, g)))
+        for mode, run in modes:
+            reset_peak()
+            start = time.perf_counter()
+            try:
+                run(torch.Generator(device="cpu").manual_seed(1))
+            except (torch.cuda.OutOfMemoryError, RuntimeError) as e:
+                if mode != "direct" or "out of memory" not in str(e).lower():
+                    raise
+                print(f"  {size:5}px direct   out of memory")
+                rows.append((size, mode, None, None))
+                direct_ok = False
+                continue
+            seconds = time.perf_counter() - start
+            rows.append((size, mode, seconds, peak_mb()))
+            print(f"  {size:5}px {mode:8} {seconds:7.1f}s  peak {rows[-1][3]:8.0f} MB")
+
+    print("\n| canvas | mode | tiles | seconds | peak MB |")
+    print("|---|---|---|---|---|")
+    for size, mode, seconds, mb in rows:
+        tiles = len(tiled.plan_tiles(size, size, tile, overlap)) if mode == "tiled" else 1
+        if seconds is None:
+            print(f"| {size} | {mode} | {tiles} | OOM | OOM |")
+        else:
+            print(f"| {size} | {mode} | {tiles} | {seconds:.1f} | {mb:.0f} |")
+
+
+if __name__ == "__main__":
+    main()
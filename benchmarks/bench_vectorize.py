@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+SVG size and render time: built-in color tracing vs. potrace vs. the
+embedded-PNG fallback.
+
+Render time is a full rasterization of the SVG at its nominal size with
+cairosvg (pip install cairosvg) or rsvg-convert, whichever is available; the
+PSNR column compares that render with the source image. Without a renderer
+only sizes and trace times are reported.
+
+    python benchmarks/bench_vectorize.py --images logo1.png logo2.png --colors 4 8 16
+"""
+import os
+import sys
+import time
+import shutil
+import argparse
+import subprocess
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def synthetic_logo(size=1024):
+    """Flat-color shapes with a hole, a bar and text on transparency."""
+    from PIL import Image, ImageDraw
+
+    img = Image.new("RGBA", (size, size), (0, 0, 0, 0))
+    d = ImageDraw.Draw(img)
+    s = size / 1024
+    d.ellipse((100 * s, 100 * s, 900 * s, 900 * s), fill=(20, 60, 200, 255))
+    d.ellipse((300 * s, 300 * s, 700 * s, 700 * s), fill=(0, 0, 0, 0))
+    d.rectangle((450 * s, 50 * s, 570 * s, 970 * s), fill=(240, 180, 20, 255))
+    d.polygon([(120 * s, 880 * s), (380 * s, 620 * s), (380 * s, 880 * s)], fill=(220, 40, 60, 255))
+    return img
+
+
+def render(svg):
+    """Rasterize svg text to a PIL image, or None if no renderer is installed."""
+    import io
+    from PIL import Image
+
+    try:
+        import cairosvg
+        return Image.open(io.BytesIO(cairosvg.svg2png(bytestring=svg.encode())))
+    except ImportError:
+        pass
+    if shutil.which("rsvg-convert"):
+        png = subprocess.run(["rsvg-convert"], input=svg.encode(), capture_output=True, check=True).stdout
+        return Image.open(io.BytesIO(png))
+    return None
+
+
+def psnr(a, b):
+    import numpy as np
+    from PIL import Image
+
+    white = Image.new("RGBA", a.size, (255, 255, 255, 255))
+    a = np.asarray(Image.alpha_composite(white, a.convert("RGBA")).convert("RGB"), dtype=np.float32)
+    b = np.asarray(Image.alpha_composite(white, b.convert("RGBA").resize(white.size)).convert("RGB"), dtype=np.float32)
+    mse = np.mean((a - b) ** 2)
+    return float("inf") if mse == 0 else 10 * np.log10(255.0 ** 2 / mse)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", nargs="*", default=[])
+    parser.add_argument("--colors", type=int, nargs="+", default=[4, 8, 16])
+    args = parser.parse_args()
+
+    from PIL import Image
+    from studio import logo_export, vectorize
+
+    images = [(os.path.basename(p), Image.open(p)) for p in args.images] or [("synthetic", synthetic_logo())]
+    print("| image | method | trace ms | SVG KB | render ms | PSNR dB |")
+    print("|---|---|---|---|---|---|")
+    for name, image in images:
+        image.load()
+        methods = [("embedded PNG", logo_export._embedded_svg)]
+        if shutil.which("potrace"):
+            methods.append(("potrace 1-bit", logo_export._potrace_svg))
+        methods += [(f"color x{n}", lambda im, n=n: vectorize.to_svg(im, colors=n)) for n in args.colors]
+
+        for method, fn in methods:
+            start = time.perf_counter()
+            svg = fn(image)
+            trace_ms = (time.perf_counter() - start) * 1000
+            start = time.perf_counter()
+            rendered = render(svg)
+            render_ms = (time.perf_counter() - start) * 1000
+            if rendered is None:
+                render_col, psnr_col = "n/a", "n/a"
+            else:
+                render_col, psnr_col = f"{render_ms:.0f}", f"{psnr(image, rendered):.1f}"
+            print(f"| {name} | {method} | {trace_ms:.0f} | {len(svg.encode()) / 1024:.1f} | {render_col} | {psnr_col} |")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,9 +5,10 @@ A Leonardo.ai-style app for image, music, video, and voice generation.
 
 import gradio as gr
 import os
+import random
 
 # Import modules
-from . import image_gen, image_tools, logo_export, audio_lab, video_gen, voice_gen, gallery
+from . import image_gen, tiled, image_tools, logo_export, audio_lab, video_gen, voice_gen, gallery, preload, jobs, lora, output, resources
 
 CUSTOM_CSS = """
 /* Dark theme overrides — set on root, body, AND .gradio-container to beat Base theme */
@@ -338,7 +339,7 @@ def build_app():
         </div>
         """)
 
-        with gr.Tabs():
+        with gr.Tabs() as main_tabs:
 
             # ============ IMAGE GEN TAB ============
             with gr.Tab("Image Gen", id="imagegen"):
@@ -362,9 +363,45 @@ def build_app():
                             img_width = gr.Slider(512, 1536, 1024, step=64, label="Width")
                             img_height = gr.Slider(512, 1536, 1024, step=64, label="Height")
                         with gr.Row():
-                            img_steps = gr.Slider(10, 50, 25, step=1, label="Steps")
+                            img_steps = gr.Slider(1, 50, 25, step=1, label="Steps")
                             img_cfg = gr.Slider(1, 15, 7, step=0.5, label="CFG Scale")
+                        img_sampler = gr.Dropdown(
+                            choices=image_gen.get_schedulers(),
+                            value="Default",
+                            label="Sampler",
+                            info="LoRA samplers need their LoRA in models/loras and use 4-8 steps",
+                        )
                         img_seed = gr.Number(label="Seed (0 = random)", value=0)
+                        with gr.Accordion("LoRA Styles", open=False):
+                            img_loras = gr.Dropdown(
+                                choices=lora.get_loras(),
+                                multiselect=True,
+                                label="LoRAs",
+                            )
+                            with gr.Row():
+                                img_lora_weight = gr.Slider(0, 1.5, 0.8, step=0.05, label="LoRA Strength")
+                                img_lora_fuse = gr.Checkbox(
+                                    label="Fuse LoRAs",
+                                    value=False,
+                                    info="Faster steps; recently used combinations are cached",
+                                )
+                        img_refine = gr.Checkbox(
+                            label="Refiner (2-pass)",
+                            value=False,
+                            interactive=image_gen.get_refiner_available(),
+                            info=f"Base hands off to {image_gen.REFINER_NAME} for the last "
+                                 f"{100 - int(image_gen.REFINER_SPLIT * 100)}% of steps",
+                        )
+                        with gr.Accordion("Large Canvas", open=False):
+                            gr.Markdown("Posters and textures beyond 1536px, denoised in overlapping tiles. "
+                                        "Uses the prompt, model, steps, CFG, sampler and seed above.")
+                            with gr.Row():
+                                canvas_width = gr.Slider(1024, tiled.MAX_CANVAS, 4096, step=64, label="Canvas Width")
+                                canvas_height = gr.Slider(1024, tiled.MAX_CANVAS, 4096, step=64, label="Canvas Height")
+                            with gr.Row():
+                                canvas_tile = gr.Slider(512, 1536, tiled.TILE_SIZE, step=64, label="Tile Size")
+                                canvas_overlap = gr.Slider(64, 512, tiled.TILE_OVERLAP, step=32, label="Tile Overlap")
+                            canvas_btn = gr.Button("Generate Large Canvas", variant="secondary")
 
                         with gr.Row():
                             img_export_fmt = gr.Dropdown(
@@ -375,6 +412,11 @@ def build_app():
 
                         with gr.Row():
                             img_gen_btn = gr.Button("Generate", variant="primary", size="lg")
+                            img_draft_btn = gr.Button("Draft", variant="secondary", size="lg")
+                            img_final_btn = gr.Button("Finalize", variant="secondary", size="lg")
+                            img_cancel_btn = gr.Button("Cancel", variant="secondary", size="lg")
+                        img_status = gr.Markdown("")
+                        img_last_draft = gr.State(None)
 
                     with gr.Column(scale=1):
                         img_output = gr.Image(label="Result", type="pil")
@@ -386,10 +428,92 @@ def build_app():
                         img_file_output = gr.File(label="Download", visible=True)
 
                 # Image Gen events
-                img_gen_btn.click(
-                    fn=image_gen.generate,
-                    inputs=[img_prompt, img_negative, img_model, img_width, img_height, img_steps, img_cfg, img_seed],
-                    outputs=img_output,
+                def _stream_image(params, draft, done_text=""):
+                    job = jobs.Job()
+                    for kind, value in jobs.stream(image_gen.generate, *params, draft=draft, job=job):
+                        if kind == "progress":
+                            yield value.preview if value.preview is not None else gr.update(), value.status_text()
+                        else:
+                            yield value, done_text
+
+                def _generate_image(prompt, negative, model, width, height, steps, cfg, seed, sampler,
+                                    loras, lora_weight, fuse, refine):
+                    selection = [(name, lora_weight) for name in loras or []]
+                    params = [prompt, negative, model, width, height, steps, cfg, seed, sampler, selection, fuse, refine]
+                    yield from _stream_image(params, draft=False)
+
+                def _draft_image(prompt, negative, model, width, height, steps, cfg, seed, sampler,
+                                 loras, lora_weight, fuse, refine):
+                    # Drafts always get a concrete seed so Finalize starts from the same latents
+                    seed = int(seed) if seed and seed > 0 else random.randint(1, 2**31 - 1)
+                    selection = [(name, lora_weight) for name in loras or []]
+                    params = [prompt, negative, model, width, height, steps, cfg, seed, sampler, selection, fuse, refine]
+                    for image, status in _stream_image(params, draft=True, done_text=f"Draft (seed {seed}) — Finalize renders it with all steps; fine detail may change"):
+                        yield image, status, params
+
+                def _finalize_image(params):
+                    if not params:
+                        yield gr.update(), "Make a draft first"
+                        return
+                    yield from _stream_image(params, draft=False)
+
+                def _sampler_defaults(sampler, steps, cfg):
+                    # Few-step samplers cost 2-3x more and burn out at regular steps/CFG
+                    if image_gen.is_few_step(sampler) and steps > 8:
+                        return image_gen.FEW_STEP_STEPS, min(cfg, image_gen.FEW_STEP_MAX_CFG)
+                    return gr.update(), gr.update()
+
+                img_sampler.change(
+                    fn=_sampler_defaults,
+                    inputs=[img_sampler, img_steps, img_cfg],
+                    outputs=[img_steps, img_cfg],
+                )
+
+                img_inputs = [
+                    img_prompt, img_negative, img_model, img_width, img_height, img_steps, img_cfg, img_seed,
+                    img_sampler, img_loras, img_lora_weight, img_lora_fuse, img_refine,
+                ]
+                # Let concurrent users' requests reach image_gen together so it can batch them
+                img_gen_event = img_gen_btn.click(
+                    fn=_generate_image,
+                    inputs=img_inputs,
+                    outputs=[img_output, img_status],
+                    concurrency_limit=image_gen.MAX_BATCH,
+                )
+                img_draft_event = img_draft_btn.click(
+                    fn=_draft_image,
+                    inputs=img_inputs,
+                    outputs=[img_output, img_status, img_last_draft],
+                    concurrency_limit=image_gen.MAX_BATCH,
+                )
+                img_final_event = img_final_btn.click(
+                    fn=_finalize_image,
+                    inputs=[img_last_draft],
+                    outputs=[img_output, img_status],
+                    concurrency_limit=image_gen.MAX_BATCH,
+                )
+
+                def _generate_canvas(prompt, negative, model, steps, cfg, seed, sampler, width, height, tile, overlap):
+                    job = jobs.Job()
+                    params = [prompt, negative, model, width, height, steps, cfg, seed, sampler, tile, overlap]
+                    for kind, value in jobs.stream(tiled.generate, *params, job=job):
+                        if kind == "progress":
+                            yield value.preview if value.preview is not None else gr.update(), value.status_text()
+                        else:
+                            yield value, ""
+
+                canvas_event = canvas_btn.click(
+                    fn=_generate_canvas,
+                    inputs=[
+                        img_prompt, img_negative, img_model, img_steps, img_cfg, img_seed, img_sampler,
+                        canvas_width, canvas_height, canvas_tile, canvas_overlap,
+                    ],
+                    outputs=[img_output, img_status],
+                )
+                img_cancel_btn.click(
+                    fn=lambda: "Cancelled",
+                    outputs=img_status,
+                    cancels=[img_gen_event, img_draft_event, img_final_event, canvas_event],
                 )
                 img_upscale_btn.click(
                     fn=image_tools.upscale_image,
@@ -460,14 +584,29 @@ def build_app():
                                 tool_i2i_denoise = gr.Slider(0.1, 1.0, 0.6, step=0.05, label="Denoise Strength")
                                 tool_i2i_steps = gr.Slider(10, 50, 25, step=1, label="Steps")
                                 tool_i2i_cfg = gr.Slider(1, 15, 7, step=0.5, label="CFG Scale")
-                                tool_i2i_btn = gr.Button("Transform", variant="primary")
+                                with gr.Row():
+                                    tool_i2i_btn = gr.Button("Transform", variant="primary")
+                                    tool_i2i_cancel = gr.Button("Cancel", variant="secondary")
+                                tool_i2i_status = gr.Markdown("")
                             with gr.Column():
                                 tool_i2i_output = gr.Image(label="Result", type="pil")
-                        tool_i2i_btn.click(
-                            fn=image_tools.img2img,
+
+                        def _img2img(image, prompt, negative, model, denoise, steps, cfg):
+                            job = jobs.Job()
+                            for kind, value in jobs.stream(
+                                image_tools.img2img, image, prompt, negative, model, denoise, steps, cfg, job=job
+                            ):
+                                if kind == "progress":
+                                    yield value.preview if value.preview is not None else gr.update(), value.status_text()
+                                else:
+                                    yield value, ""
+
+                        tool_i2i_event = tool_i2i_btn.click(
+                            fn=_img2img,
                             inputs=[tool_i2i_input, tool_i2i_prompt, tool_i2i_neg, tool_i2i_model, tool_i2i_denoise, tool_i2i_steps, tool_i2i_cfg],
-                            outputs=tool_i2i_output,
+                            outputs=[tool_i2i_output, tool_i2i_status],
                         )
+                        tool_i2i_cancel.click(fn=lambda: "Cancelled", outputs=tool_i2i_status, cancels=[tool_i2i_event])
 
                     # Stitch & Tile sub-tab
                     with gr.Tab("Stitch & Tile"):
@@ -507,6 +646,53 @@ def build_app():
                             outputs=tool_tile_output,
                         )
 
+                    # Logo Batch sub-tab
+                    with gr.Tab("Logo Batch"):
+                        gr.Markdown("### Batch Logo Packs\nOne ZIP with a full logo pack per image plus a manifest.json")
+                        with gr.Row():
+                            with gr.Column():
+                                tool_lb_files = gr.File(label="Logo Images", file_count="multiple", file_types=["image"])
+                                tool_lb_folder = gr.Textbox(
+                                    label="...or a folder of images",
+                                    placeholder=os.path.expanduser("~/CreationStudio/outputs/images"),
+                                )
+                                with gr.Row():
+                                    tool_lb_gallery = gr.Dropdown(
+                                        choices=[],
+                                        multiselect=True,
+                                        label="...or pick from the gallery",
+                                        scale=4,
+                                    )
+                                    tool_lb_refresh = gr.Button("Refresh", variant="secondary", scale=1)
+                                tool_lb_btn = gr.Button("Export Batch", variant="primary")
+                            with gr.Column():
+                                tool_lb_output = gr.File(label="Download")
+                                tool_lb_status = gr.Markdown("")
+
+                        def _gallery_choices():
+                            paths = gallery.get_image_gallery()
+                            return gr.update(choices=[(os.path.basename(p), p) for p in paths])
+
+                        def _export_logo_batch(files, folder, picked, progress=gr.Progress()):
+                            sources = [f.name for f in files or []]
+                            if folder and folder.strip():
+                                sources.append(os.path.expanduser(folder.strip()))
+                            sources += picked or []
+                            path = logo_export.export_logo_batch(
+                                sources, progress=lambda done, total: progress(done / total, desc=f"{done}/{total} packs"),
+                            )
+                            if path is None:
+                                return None, "No images found"
+                            return path, f"Saved {os.path.basename(path)}"
+
+                        tool_lb_refresh.click(fn=_gallery_choices, outputs=tool_lb_gallery)
+                        tool_lb_btn.click(
+                            fn=_export_logo_batch,
+                            inputs=[tool_lb_files, tool_lb_folder, tool_lb_gallery],
+                            outputs=[tool_lb_output, tool_lb_status],
+                        )
+                        app.load(fn=_gallery_choices, outputs=tool_lb_gallery)
+
             # ============ AUDIO LAB TAB ============
             with gr.Tab("Audio Lab", id="audiolab"):
                 with gr.Tabs():
@@ -533,14 +719,18 @@ def build_app():
                                     info="Small=fast, Medium=balanced, Large=best (slower)",
                                 )
                                 aud_loop = gr.Checkbox(label="Make Loopable", value=False)
+                                aud_seed = gr.Number(label="Seed (0 = random)", value=0)
                                 aud_format = gr.Radio(
                                     choices=["WAV", "MP3", "OGG"],
                                     value="WAV",
                                     label="Export Format",
                                 )
-                                aud_gen_btn = gr.Button("Generate", variant="primary", size="lg")
+                                with gr.Row():
+                                    aud_gen_btn = gr.Button("Generate", variant="primary", size="lg")
+                                    aud_stream_btn = gr.Button("Generate & Stream", size="lg")
 
                             with gr.Column(scale=1):
+                                aud_live = gr.Audio(label="Live Preview", streaming=True, autoplay=True)
                                 aud_output = gr.Audio(label="Generated Audio")
                                 aud_file = gr.File(label="Download")
 
@@ -561,18 +751,86 @@ def build_app():
                             outputs=[aud_prompt, aud_duration],
                         )
 
-                        def _generate_audio(prompt, duration, model, category, loop, fmt):
+                        def _generate_audio(prompt, duration, model, category, loop, fmt, seed):
                             audio_tuple, path = audio_lab.generate_and_process(
-                                prompt, duration, model, category, loop, fmt
+                                prompt, duration, model, category, loop, fmt, int(seed or 0)
                             )
                             return audio_tuple, path
 
                         aud_gen_btn.click(
                             fn=_generate_audio,
-                            inputs=[aud_prompt, aud_duration, aud_model, aud_category, aud_loop, aud_format],
+                            inputs=[aud_prompt, aud_duration, aud_model, aud_category, aud_loop, aud_format, aud_seed],
                             outputs=[aud_output, aud_file],
                         )
 
+                        def _stream_audio(prompt, duration, model, category, loop, fmt, seed):
+                            # Chunks play as they are decoded; the saved file follows at the end
+                            for kind, value in audio_lab.stream_and_process(
+                                prompt, duration, model, category, loop, fmt, int(seed or 0)
+                            ):
+                                if kind == "chunk":
+                                    yield value, gr.update(), gr.update()
+                                else:
+                                    audio_tuple, path = value
+                                    yield gr.update(), audio_tuple, path
+
+                        aud_stream_btn.click(
+                            fn=_stream_audio,
+                            inputs=[aud_prompt, aud_duration, aud_model, aud_category, aud_loop, aud_format, aud_seed],
+                            outputs=[aud_live, aud_output, aud_file],
+                        )
+
+                    # Variations
+                    with gr.Tab("Variations"):
+                        gr.Markdown("Generate several takes of one prompt in a single pass, ranked best first.")
+                        with gr.Row():
+                            with gr.Column(scale=1):
+                                var_category = gr.Radio(choices=["BGM", "SFX", "Ambient"], value="SFX", label="Category")
+                                var_prompt = gr.Textbox(
+                                    label="Describe the audio",
+                                    lines=2,
+                                    placeholder="explosion sound effect, cinematic boom",
+                                )
+                                var_duration = gr.Slider(1, 30, 3, step=1, label="Duration (seconds)")
+                                var_model = gr.Radio(choices=["small", "medium", "large"], value="small", label="Model Quality")
+                                var_count = gr.Slider(2, audio_lab.MAX_VARIATIONS, 4, step=1, label="Takes")
+                                var_seed = gr.Number(label="Seed (0 = random)", value=0)
+                                var_format = gr.Radio(choices=["WAV", "MP3", "OGG"], value="WAV", label="Export Format")
+                                var_btn = gr.Button("Generate Takes", variant="primary", size="lg")
+
+                            with gr.Column(scale=1):
+                                var_table = gr.Dataframe(
+                                    headers=["Rank", "Take", "Score", "Loudness dB", "Silence", "Flatness", "CLAP"],
+                                    label="Ranking",
+                                    interactive=False,
+                                )
+                                var_players = [
+                                    gr.Audio(label=f"#{i + 1}", visible=False)
+                                    for i in range(audio_lab.MAX_VARIATIONS)
+                                ]
+                                var_files = gr.File(label="Download", file_count="multiple")
+
+                        def _generate_variations(prompt, duration, model, category, count, fmt, seed):
+                            takes = audio_lab.generate_variations(
+                                prompt, duration, model, category, int(count), fmt, int(seed or 0)
+                            )
+                            rows = [
+                                [t["rank"], t["take"], t["score"], t["loudness_db"], t["silence"], t["flatness"], t["clap"]]
+                                for t in takes
+                            ]
+                            players = [
+                                gr.update(value=t["audio"], label=f"#{t['rank']} (score {t['score']})", visible=True)
+                                for t in takes
+                            ]
+                            players += [gr.update(value=None, visible=False)] * (audio_lab.MAX_VARIATIONS - len(takes))
+                            return [rows, *players, [t["path"] for t in takes]]
+
+                        var_btn.click(
+                            fn=_generate_variations,
+                            inputs=[var_prompt, var_duration, var_model, var_category, var_count, var_format, var_seed],
+                            outputs=[var_table, *var_players, var_files],
+                        )
+
                     # Chain / Stitch
                     with gr.Tab("Chain / Stitch"):
                         gr.Markdown("Generate multiple audio segments and stitch them into one track.\nPut each prompt on a new line.")
@@ -591,15 +849,19 @@ def build_app():
                                 )
                                 chain_crossfade = gr.Slider(0, 2000, 500, step=100, label="Crossfade (ms)")
                                 chain_format = gr.Radio(choices=["WAV", "MP3", "OGG"], value="WAV", label="Format")
+                                chain_seed = gr.Number(label="Seed (0 = random)", value=0)
                                 chain_btn = gr.Button("Generate Chain", variant="primary", size="lg")
 
                             with gr.Column(scale=1):
                                 chain_output = gr.Audio(label="Stitched Audio")
                                 chain_file = gr.File(label="Download")
 
+                        def _generate_chain(prompts, duration, model, crossfade, fmt, seed):
+                            return audio_lab.generate_chain(prompts, duration, model, crossfade, fmt, int(seed or 0))
+
                         chain_btn.click(
-                            fn=audio_lab.generate_chain,
-                            inputs=[chain_prompts, chain_dur, chain_model, chain_crossfade, chain_format],
+                            fn=_generate_chain,
+                            inputs=[chain_prompts, chain_dur, chain_model, chain_crossfade, chain_format, chain_seed],
                             outputs=[chain_output, chain_file],
                         )
 
@@ -623,19 +885,20 @@ def build_app():
                             value="WAV",
                             label="Export Format",
                         )
+                        vox_seed = gr.Number(label="Seed (0 = random)", value=0)
                         vox_gen_btn = gr.Button("Generate Voice", variant="primary", size="lg")
 
                     with gr.Column(scale=1):
                         vox_output = gr.Audio(label="Generated Voice")
                         vox_file = gr.File(label="Download")
 
-                def _generate_voice(text, voice_name, fmt):
-                    audio_tuple, path = voice_gen.generate_voice(text, voice_name, fmt)
+                def _generate_voice(text, voice_name, fmt, seed):
+                    audio_tuple, path = voice_gen.generate_voice(text, voice_name, fmt, int(seed or 0))
                     return audio_tuple, path
 
                 vox_gen_btn.click(
                     fn=_generate_voice,
-                    inputs=[vox_text, vox_voice, vox_format],
+                    inputs=[vox_text, vox_voice, vox_format, vox_seed],
                     outputs=[vox_output, vox_file],
                 )
 
@@ -672,7 +935,11 @@ def build_app():
                                     value="MP4",
                                     label="Output Format",
                                 )
-                                vid_gen_btn = gr.Button("Generate", variant="primary", size="lg")
+                                vid_seed = gr.Number(label="Seed (0 = random)", value=0)
+                                with gr.Row():
+                                    vid_gen_btn = gr.Button("Generate", variant="primary", size="lg")
+                                    vid_cancel_btn = gr.Button("Cancel", variant="secondary", size="lg")
+                                vid_status = gr.Markdown("")
 
                             with gr.Column(scale=1):
                                 vid_output = gr.Video(label="Generated Video")
@@ -684,15 +951,24 @@ def build_app():
 
                         vid_preset.change(fn=toggle_custom, inputs=[vid_preset], outputs=[vid_custom_row])
 
-                        def _gen_video(prompt, frames, guidance, fps, preset, fmt, cw, ch):
-                            path = video_gen.generate_video(prompt, frames, guidance, int(fps), preset, fmt.lower(), cw, ch)
-                            return path, path
-
-                        vid_gen_btn.click(
+                        def _gen_video(prompt, frames, guidance, fps, preset, fmt, cw, ch, seed):
+                            job = jobs.Job()
+                            for kind, value in jobs.stream(
+                                video_gen.generate_video,
+                                prompt, frames, guidance, int(fps), preset, fmt.lower(), cw, ch, int(seed or 0),
+                                job=job,
+                            ):
+                                if kind == "progress":
+                                    yield gr.update(), gr.update(), value.status_text()
+                                else:
+                                    yield value, value, ""
+
+                        vid_gen_event = vid_gen_btn.click(
                             fn=_gen_video,
-                            inputs=[vid_prompt, vid_frames, vid_guidance, vid_fps, vid_preset, vid_format, vid_custom_w, vid_custom_h],
-                            outputs=[vid_output, vid_file],
+                            inputs=[vid_prompt, vid_frames, vid_guidance, vid_fps, vid_preset, vid_format, vid_custom_w, vid_custom_h, vid_seed],
+                            outputs=[vid_output, vid_file, vid_status],
                         )
+                        vid_cancel_btn.click(fn=lambda: "Cancelled", outputs=vid_status, cancels=[vid_gen_event])
 
                     # Video Chain
                     with gr.Tab("Video Chain"):
@@ -756,6 +1032,13 @@ def build_app():
 
                 gr.Markdown("### Images")
                 gal_images = gr.Gallery(label="Generated Images", columns=4, height="auto")
+                gal_paths = gr.State([])
+                with gr.Row():
+                    gal_params = gr.JSON(label="Generation Parameters")
+                    with gr.Column():
+                        gal_remix_btn = gr.Button("Remix in Image Gen", variant="primary")
+                        gal_catalog_btn = gr.Button("Rebuild Catalog", variant="secondary")
+                        gal_catalog_status = gr.Markdown("")
 
                 gr.Markdown("### Audio")
                 gal_audio_list = gr.Dataframe(
@@ -788,15 +1071,79 @@ def build_app():
                         size = f"{os.path.getsize(f) / (1024*1024):.1f} MB"
                         video_data.append([name, ext, size])
 
-                    return images, audio_data, video_data
-
-                gal_refresh.click(
-                    fn=refresh_gallery,
-                    outputs=[gal_images, gal_audio_list, gal_video_list],
+                    return images, audio_data, video_data, images
+
+                def show_parameters(paths, evt: gr.SelectData):
+                    if evt.index is None or evt.index >= len(paths):
+                        return None
+                    return gallery.get_parameters(paths[evt.index])
+
+                def remix(params):
+                    # Only text-to-image outputs map onto the Image Gen controls
+                    if not params or params.get("kind") not in ("image", "canvas"):
+                        gr.Warning("Select an image generated in Image Gen to remix it")
+                        return [gr.update()] * 18
+                    updates = [
+                        params.get("prompt", ""),
+                        params.get("negative_prompt", ""),
+                        params.get("model", image_gen.get_default_model()),
+                        params.get("steps", 25),
+                        params.get("cfg", 7),
+                        params.get("seed", 0),
+                        params.get("scheduler", "Default"),
+                    ]
+                    size = [params.get("width", 1024), params.get("height", 1024)]
+                    # Canvas sizes and tiling go to the Large Canvas sliders, regular sizes to Width/Height
+                    if params["kind"] == "canvas":
+                        updates += [gr.update(), gr.update()] + size + [
+                            params.get("tile_size", tiled.TILE_SIZE),
+                            params.get("overlap", tiled.TILE_OVERLAP),
+                        ]
+                    else:
+                        updates += size + [gr.update()] * 4
+                    return updates + _remix_extras(params) + [gr.Tabs(selected="imagegen")]
+
+                def _remix_extras(params):
+                    """LoRA selection, strength, fuse and refiner controls for a remix."""
+                    recorded = params.get("loras") or []
+                    available = set(lora.get_loras())
+                    names = [n for n, _ in recorded if n in available]
+                    missing = [n for n, _ in recorded if n not in available]
+                    if missing:
+                        gr.Warning(f"LoRA not found, remixing without it: {', '.join(missing)}")
+                    weights = sorted({float(w) for n, w in recorded if n in available})
+                    if len(weights) > 1:
+                        gr.Warning(f"LoRAs used different strengths {weights}; remixing all at {weights[0]}")
+                    refine = bool(params.get("refine")) and image_gen.get_refiner_available()
+                    if params.get("refine") and not refine:
+                        gr.Warning("Refiner not found, remixing without it")
+                    return [
+                        names,
+                        weights[0] if weights else gr.update(),
+                        bool(params.get("fuse_loras", False)),
+                        refine,
+                    ]
+
+                def _rebuild_catalog():
+                    entries = gallery.rebuild_catalog()
+                    return f"Catalog rebuilt: {len(entries)} files with parameters"
+
+                gallery_outputs = [gal_images, gal_audio_list, gal_video_list, gal_paths]
+                gal_refresh.click(fn=refresh_gallery, outputs=gallery_outputs)
+                gal_images.select(fn=show_parameters, inputs=[gal_paths], outputs=gal_params)
+                gal_remix_btn.click(
+                    fn=remix,
+                    inputs=[gal_params],
+                    outputs=[
+                        img_prompt, img_negative, img_model, img_steps, img_cfg, img_seed, img_sampler,
+                        img_width, img_height, canvas_width, canvas_height, canvas_tile, canvas_overlap,
+                        img_loras, img_lora_weight, img_lora_fuse, img_refine, main_tabs,
+                    ],
                 )
+                gal_catalog_btn.click(fn=_rebuild_catalog, outputs=gal_catalog_status)
 
                 # Auto-load on tab visit
-                app.load(fn=refresh_gallery, outputs=[gal_images, gal_audio_list, gal_video_list])
+                app.load(fn=refresh_gallery, outputs=gallery_outputs)
 
     return app
 
@@ -805,7 +1152,7 @@ def launch():
     import os
     import socket
     import uvicorn
-    from fastapi import FastAPI
+    from fastapi import FastAPI, Request, HTTPException
     from fastapi.staticfiles import StaticFiles
 
     outputs_dir = os.path.expanduser("~/CreationStudio/outputs")
@@ -817,7 +1164,7 @@ def launch():
     gradio_app = build_app()
 
     # FastAPI wrapper: serves PWA static files + Gradio app
-    from fastapi.responses import FileResponse
+    from fastapi.responses import FileResponse, StreamingResponse
 
     fastapi_app = FastAPI()
     fastapi_app.mount("/pwa", StaticFiles(directory=pwa_dir), name="pwa")
@@ -829,6 +1176,36 @@ def launch():
             media_type="application/javascript",
         )
 
+    @fastapi_app.get("/api/status/models")
+    async def model_status():
+        return preload.status()
+
+    @fastapi_app.get("/api/resources")
+    async def resource_status():
+        """Which models are loaded, on which device, against each device's budget."""
+        return resources.status()
+
+    @fastapi_app.get("/api/status/saves")
+    async def save_status():
+        return output.save_stats()
+
+    @fastapi_app.post("/api/logo-pack")
+    async def logo_pack(request: Request):
+        """Request body: an image file. Response: the logo pack ZIP, streamed as it is built."""
+        import io
+        from PIL import Image, UnidentifiedImageError
+
+        try:
+            image = Image.open(io.BytesIO(await request.body()))
+            image.load()
+        except (UnidentifiedImageError, OSError):
+            raise HTTPException(status_code=400, detail="Body must be an image file")
+        return StreamingResponse(
+            logo_export.stream_logo_pack(image),
+            media_type="application/zip",
+            headers={"Content-Disposition": 'attachment; filename="logo_pack.zip"'},
+        )
+
     gr.mount_gradio_app(
         fastapi_app,
         gradio_app,
@@ -857,8 +1234,12 @@ def launch():
     print(f"  Local:   http://127.0.0.1:7860")
     print(f"  Network: http://{local_ip}:7860")
     print(f"  PWA:     Install via browser menu on any device")
+    print(f"  Models:  http://127.0.0.1:7860/api/status/models")
     print(f"  {'='*50}\n")
 
+    # Models from the preload manifest load in the background while the server accepts requests
+    preload.start()
+
     uvicorn.run(fastapi_app, host="0.0.0.0", port=7860)
 
 
@@ -1,14 +1,54 @@
 import os
 import io
-import datetime
+import json
+import shutil
+import queue
+import threading
+import contextlib
+import collections
 import numpy as np
-import torch
-from transformers import AutoProcessor, MusicgenForConditionalGeneration
-from .device import AUDIO_DEVICE
-
-OUT_DIR = os.path.expanduser("~/CreationStudio/outputs/audio")
-
-_models = {}
+from . import cache, dsp, loops, metadata, output, resources
+from .jobs import JobCancelled
+
+# Folder under output.OUT_DIR; each category gets a subfolder
+OUT_SUBDIR = "audio"
+
+# MusicGen weight precision (STUDIO_MUSICGEN_PRECISION): fp32, bf16, or int8
+# (dynamic int8 Linear layers; runs on the CPU). "auto" is int8 on CPU-only
+# hosts with STUDIO_CPU_INT8=1, else fp32. Converted weights are saved under
+# VARIANT_DIR, so later loads read the small copy instead of converting the
+# full-precision checkpoint again.
+MODEL_PRECISION = os.environ.get("STUDIO_MUSICGEN_PRECISION", "auto").lower()
+VARIANT_DIR = os.path.expanduser("~/CreationStudio/cache/musicgen")
+VARIANT_MARKER = "studio_variant.json"
+# MusicGen sizes kept loaded at once; loading another one unloads the least
+# recently used (studio.resources may unload them sooner under memory pressure)
+MAX_LOADED = int(os.environ.get("STUDIO_MUSICGEN_MAX_LOADED", "2"))
+
+# Streaming: audio is decoded and sent every STREAM_CHUNK_SECONDS of generated
+# tokens. Each window also decodes STREAM_CONTEXT_SECONDS of already-sent audio
+# before it, so the codec continues smoothly, and holds back the last
+# STREAM_LOOKAHEAD_SECONDS until the next window has right context for them.
+# Decoder memory depends on these, not on the clip length.
+STREAM_CHUNK_SECONDS = 1.0
+STREAM_CONTEXT_SECONDS = 0.5
+STREAM_LOOKAHEAD_SECONDS = 0.2
+
+# Variations: K takes of one prompt come from one batched generate() call and
+# are ranked by a weighted mean of cheap scores in [0, 1]. CLAP text-audio
+# similarity is added when CLAP_MODEL_ID is already downloaded (never fetched).
+MAX_VARIATIONS = 8
+CLAP_MODEL_ID = "laion/clap-htsat-unfused"
+CLAP_SAMPLE_RATE = 48000
+SCORE_WEIGHTS = {"clap": 3.0, "silence": 1.0, "loudness": 1.0, "flatness": 0.5}
+TARGET_LOUDNESS_DB = -18.0  # RMS dBFS a take is rewarded for being near
+SILENCE_DB = -50.0          # 50 ms frames quieter than this count as silence
+
+_clap = None
+_clap_lock = threading.Lock()
+
+_models = collections.OrderedDict()  # size -> (processor, model), least recently used first
+_load_lock = threading.Lock()
 
 CATEGORY_PRESETS = {
     "BGM": {
@@ -29,32 +69,476 @@ CATEGORY_PRESETS = {
 }
 
 
+def precision():
+    """MODEL_PRECISION with "auto" resolved for this host."""
+    from .device import CPU_INT8
+
+    if MODEL_PRECISION != "auto":
+        return MODEL_PRECISION
+    if not CPU_INT8:
+        return "fp32"
+    from .device import AUDIO_DEVICE
+    return "fp32" if AUDIO_DEVICE == "cuda" else "int8"
+
+
+def _variant_path(model_size, prec):
+    return os.path.join(VARIANT_DIR, f"{model_size}-{prec}")
+
+
+def _load_variant(model_id, model_size, prec):
+    """Cached (processor, model) in precision prec, or None if not converted yet."""
+    import torch
+    from transformers import AutoProcessor, MusicgenConfig, MusicgenForConditionalGeneration
+    from .device import quantize_int8
+
+    path = _variant_path(model_size, prec)
+    marker = os.path.join(path, VARIANT_MARKER)
+    if not os.path.exists(marker):
+        return None
+    with open(marker) as f:
+        info = json.load(f)
+    revision = cache.hub_revision(model_id)
+    # A newer hub snapshot invalidates the copy; no snapshot at all (deleted to
+    # save space) keeps it usable
+    if revision and info.get("revision") != revision:
+        return None
+    proc = AutoProcessor.from_pretrained(path)
+    if prec == "bf16":
+        mod = MusicgenForConditionalGeneration.from_pretrained(path, torch_dtype=torch.bfloat16)
+    else:
+        # Rebuild the module structure without initializing weights, swap in the
+        # quantized layers, then load their saved int8 state
+        try:
+            from transformers.modeling_utils import no_init_weights
+        except ImportError:
+            no_init_weights = contextlib.nullcontext
+        with no_init_weights():
+            mod = MusicgenForConditionalGeneration(MusicgenConfig.from_pretrained(path))
+        quantize_int8(mod)
+        # Packed int8 weights are not plain tensors; this is our own file
+        mod.load_state_dict(torch.load(os.path.join(path, "model.pt"), weights_only=False))
+        mod.eval()
+    return proc, mod
+
+
+def _save_variant(proc, mod, model_id, model_size, prec):
+    import torch
+
+    path = _variant_path(model_size, prec)
+    tmp = path + ".partial"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    proc.save_pretrained(tmp)
+    if prec == "bf16":
+        mod.save_pretrained(tmp)
+    else:
+        mod.config.save_pretrained(tmp)
+        torch.save(mod.state_dict(), os.path.join(tmp, "model.pt"))
+    with open(os.path.join(tmp, VARIANT_MARKER), "w") as f:
+        json.dump({"model": model_id, "precision": prec, "revision": cache.hub_revision(model_id)}, f)
+    shutil.rmtree(path, ignore_errors=True)
+    os.replace(tmp, path)
+
+
+def _load_weights(model_id, model_size, prec):
+    import torch
+    from transformers import AutoProcessor, MusicgenForConditionalGeneration
+    from .device import quantize_int8
+
+    if prec != "fp32":
+        variant = _load_variant(model_id, model_size, prec)
+        if variant:
+            print(f"[AudioLab] Using cached {prec} weights for {model_id}")
+            return variant
+    proc = AutoProcessor.from_pretrained(model_id)
+    mod = MusicgenForConditionalGeneration.from_pretrained(model_id)
+    if prec == "fp32":
+        return proc, mod
+    if prec == "bf16":
+        mod = mod.to(torch.bfloat16)
+    else:
+        quantize_int8(mod)
+    try:
+        _save_variant(proc, mod, model_id, model_size, prec)
+    except OSError as e:
+        # Caching is an optimization; a full disk must not break generation
+        print(f"[AudioLab] Could not cache {prec} weights: {e}")
+    return proc, mod
+
+
+def _evict_lru():
+    """Unload least recently used sizes until there is room for one more."""
+    for size in list(_models):
+        if len(_models) < MAX_LOADED:
+            break
+        # release() calls our unload hook, which removes it from _models
+        if resources.release(f"musicgen-{size}"):
+            print(f"[AudioLab] Unloaded musicgen-{size} (least recently used)")
+
+
 def load_model(model_size="small"):
-    """Load MusicGen model (small/medium/large)."""
-    if model_size not in _models:
-        model_id = f"facebook/musicgen-{model_size}"
-        print(f"[AudioLab] Loading {model_id}...")
-        proc = AutoProcessor.from_pretrained(model_id)
-        mod = MusicgenForConditionalGeneration.from_pretrained(model_id)
-        mod = mod.to(AUDIO_DEVICE)
-        _models[model_size] = (proc, mod)
-        print(f"[AudioLab] {model_id} loaded on {AUDIO_DEVICE}")
-    return _models[model_size]
-
-
-def generate_audio(prompt, duration, model_size="small"):
+    """Load MusicGen model (small/medium/large) in MODEL_PRECISION."""
+    from .device import AUDIO_DEVICE, accelerators
+
+    with _load_lock:
+        if model_size not in _models:
+            model_id = f"facebook/musicgen-{model_size}"
+            devices = accelerators() if AUDIO_DEVICE == "cuda" else ["cpu"]
+            prec = precision()
+            if prec == "int8":
+                # Quantized layers only have CPU kernels
+                devices = ["cpu"]
+            _evict_lru()
+            print(f"[AudioLab] Loading {model_id} ({prec})...")
+            proc, mod = _load_weights(model_id, model_size, prec)
+            _models[model_size] = (proc, mod)
+            device = resources.claim(
+                f"musicgen-{model_size}", mod,
+                devices=devices,
+                unload=lambda: _models.pop(model_size, None),
+            )
+            print(f"[AudioLab] {model_id} loaded on {device}")
+        else:
+            _models.move_to_end(model_size)
+            resources.touch(f"musicgen-{model_size}")
+        return _models[model_size]
+
+
+def _audio_key(prompt, duration, model_size, seed, **extra):
+    # MusicGen samples, so only seeded requests are reproducible and cached
+    if seed <= 0:
+        return None
+    model_id = f"facebook/musicgen-{model_size}"
+    return cache.make_key(
+        "audio",
+        prompt=prompt,
+        duration=float(duration),
+        model=model_id,
+        revision=cache.hub_revision(model_id),
+        seed=int(seed),
+        # Reduced precision changes the samples; fp32 keys stay as they were
+        **({} if precision() == "fp32" else {"precision": precision()}),
+        **extra,
+    )
+
+
+def generate_audio(prompt, duration, model_size="small", seed=0):
     """Generate audio from text prompt. Returns (sample_rate, numpy_array)."""
+    key = _audio_key(prompt, duration, model_size, seed)
+    if key:
+        hit = cache.lookup("audio", key, "npz")
+        if hit:
+            return cache.load_audio(hit)
+
+    from .device import cpu_autocast, sampling_rng
+
     processor, model = load_model(model_size)
     tokens = int(duration * 50)
     inputs = processor(text=[prompt], padding=True, return_tensors="pt")
-    inputs = {k: v.to(AUDIO_DEVICE) for k, v in inputs.items()}
-    audio_values = model.generate(**inputs, max_new_tokens=tokens)
-    audio = audio_values[0, 0].cpu().numpy()
+    with sampling_rng(seed if key else None), \
+            resources.using(f"musicgen-{model_size}") as device, cpu_autocast(device):
+        inputs = {k: v.to(model.device) for k, v in inputs.items()}
+        audio_values = model.generate(**inputs, max_new_tokens=tokens)
+    audio = audio_values[0, 0].float().cpu().numpy()
     sample_rate = model.config.audio_encoder.sampling_rate
+    if key:
+        cache.store_audio("audio", key, sample_rate, audio)
     return sample_rate, audio
 
 
-def make_loopable(audio, sample_rate, crossfade_ms=500):
+class _StreamFinished(Exception):
+    """Raised from the streamer's end() to skip generate's own full decode."""
+
+
+class _WindowStreamer:
+    """generate(streamer=...) hook that turns MusicGen tokens into audio windows.
+
+    MusicGen delays codebook k by k steps, so a frame is complete only once
+    the last codebook has caught up. Every chunk_frames new tokens, the
+    complete frames not yet sent are decoded together with context_frames
+    already-sent frames before them and everything decoded so far after
+    them, and all but the last lookahead_frames are queued. Those are
+    decoded again, with more right context, in the next window.
+    """
+
+    def __init__(self, model, chunk_frames, context_frames, lookahead_frames):
+        self.codec = model.audio_encoder
+        self.num_codebooks = model.decoder.num_codebooks
+        self.hop = int(np.prod(model.config.audio_encoder.upsampling_ratios))
+        self.chunk_frames = chunk_frames
+        self.context_frames = context_frames
+        self.lookahead_frames = lookahead_frames
+        self.columns = []
+        self.new_tokens = 0
+        self.sent = 0
+        self.cancelled = False
+        self.chunks = queue.Queue()
+
+    def put(self, value):
+        # The first call carries the start tokens, later ones one step each
+        if self.cancelled:
+            raise JobCancelled()
+        value = value.reshape(self.num_codebooks, -1)
+        self.columns.append(value)
+        self.new_tokens += value.shape[1]
+        if self.new_tokens >= self.chunk_frames:
+            self.new_tokens = 0
+            self._emit(final=False)
+
+    def end(self):
+        self._emit(final=True)
+        # generate() would now decode the whole clip again in one piece, which
+        # is exactly the memory peak streaming avoids; every frame is sent already
+        raise _StreamFinished()
+
+    def _emit(self, final):
+        import torch
+
+        ids = torch.cat(self.columns, dim=1)
+        # Column 0 is the start token; codebook k's frame f is in column f + k + 1
+        frames = ids.shape[1] - self.num_codebooks
+        stop = frames if final else frames - self.lookahead_frames
+        if stop <= self.sent:
+            return
+        start = max(0, self.sent - self.context_frames)
+        codes = torch.stack([ids[k, k + 1 + start:k + 1 + frames] for k in range(self.num_codebooks)])
+        with torch.no_grad():
+            audio = self.codec.decode(codes[None, None].to(self.codec.device), [None]).audio_values[0, 0]
+        audio = audio.float().cpu().numpy()
+        self.chunks.put(audio[(self.sent - start) * self.hop:(stop - start) * self.hop])
+        self.sent = stop
+
+
+def stream_audio(prompt, duration, model_size="small", seed=0):
+    """Generate audio like generate_audio, yielding (sample_rate, chunk) as it is decoded.
+
+    The first chunk arrives after STREAM_CHUNK_SECONDS of tokens instead of
+    the whole clip, and the codec only ever decodes one window at a time.
+    """
+    key = _audio_key(prompt, duration, model_size, seed)
+    if key:
+        hit = cache.lookup("audio", key, "npz")
+        if hit:
+            yield cache.load_audio(hit)
+            return
+
+    from .device import cpu_autocast, sampling_rng
+
+    processor, model = load_model(model_size)
+    if getattr(model.decoder.config, "audio_channels", 1) != 1:
+        # Stereo checkpoints interleave two codebook sets; decode them in one piece
+        yield generate_audio(prompt, duration, model_size, seed)
+        return
+    sample_rate = model.config.audio_encoder.sampling_rate
+    frame_rate = sample_rate / np.prod(model.config.audio_encoder.upsampling_ratios)
+    streamer = _WindowStreamer(
+        model,
+        chunk_frames=max(1, round(STREAM_CHUNK_SECONDS * frame_rate)),
+        context_frames=round(STREAM_CONTEXT_SECONDS * frame_rate),
+        lookahead_frames=round(STREAM_LOOKAHEAD_SECONDS * frame_rate),
+    )
+    inputs = processor(text=[prompt], padding=True, return_tensors="pt")
+    done = object()
+
+    def run():
+        try:
+            with sampling_rng(seed if key else None), \
+                    resources.using(f"musicgen-{model_size}") as device, cpu_autocast(device):
+                model.generate(
+                    **{k: v.to(model.device) for k, v in inputs.items()},
+                    max_new_tokens=int(duration * 50),
+                    streamer=streamer,
+                )
+        except (JobCancelled, _StreamFinished):
+            pass
+        except Exception as e:
+            streamer.chunks.put(e)
+        streamer.chunks.put(done)
+
+    threading.Thread(target=run, name="musicgen-stream", daemon=True).start()
+    chunks = []
+    try:
+        while True:
+            chunk = streamer.chunks.get()
+            if chunk is done:
+                break
+            if isinstance(chunk, Exception):
+                raise chunk
+            chunks.append(chunk)
+            yield sample_rate, chunk
+    finally:
+        # The consumer went away (e.g. the browser closed): stop at the next token
+        streamer.cancelled = True
+    if key and chunks:
+        cache.store_audio("audio", key, sample_rate, np.concatenate(chunks))
+
+
+def generate_batch(prompt, duration, model_size="small", count=4, seed=0):
+    """count takes of one prompt from a single batched generate() call.
+
+    Returns (sample_rate, audio) with audio shaped (count, samples).
+    """
+    key = _audio_key(prompt, duration, model_size, seed, variations=int(count))
+    if key:
+        hit = cache.lookup("audio", key, "npz")
+        if hit:
+            return cache.load_audio(hit)
+
+    from .device import cpu_autocast, sampling_rng
+
+    processor, model = load_model(model_size)
+    inputs = processor(text=[prompt] * int(count), padding=True, return_tensors="pt")
+    with sampling_rng(seed if key else None), \
+            resources.using(f"musicgen-{model_size}") as device, cpu_autocast(device):
+        inputs = {k: v.to(model.device) for k, v in inputs.items()}
+        audio_values = model.generate(**inputs, max_new_tokens=int(duration * 50))
+    audio = audio_values[:, 0].float().cpu().numpy()
+    sample_rate = model.config.audio_encoder.sampling_rate
+    if key:
+        cache.store_audio("audio", key, sample_rate, audio)
+    return sample_rate, audio
+
+
+def _unload_clap():
+    global _clap
+    _clap = None
+
+
+def _load_clap():
+    """(processor, model) for CLAP if it is in the local hub cache, else None."""
+    global _clap
+    with _clap_lock:
+        if _clap is None:
+            try:
+                from transformers import ClapModel, ClapProcessor
+                proc = ClapProcessor.from_pretrained(CLAP_MODEL_ID, local_files_only=True)
+                model = ClapModel.from_pretrained(CLAP_MODEL_ID, local_files_only=True).eval()
+            except (OSError, ImportError, ValueError):
+                print(f"[AudioLab] {CLAP_MODEL_ID} not downloaded, ranking without text similarity")
+                _clap = False
+                return None
+            _clap = (proc, model)
+            resources.claim("clap", model, unload=_unload_clap)
+        return _clap or None
+
+
+def clap_similarity(prompt, audio, sample_rate):
+    """Cosine similarity of prompt to each take (rows of audio), or None without CLAP."""
+    clap = _load_clap()
+    if clap is None:
+        return None
+    import math
+    import torch
+    from scipy.signal import resample_poly
+
+    proc, model = clap
+    g = math.gcd(CLAP_SAMPLE_RATE, sample_rate)
+    resampled = resample_poly(audio, CLAP_SAMPLE_RATE // g, sample_rate // g, axis=-1)
+    with resources.using("clap"), torch.no_grad():
+        text = proc(text=[prompt], return_tensors="pt", padding=True).to(model.device)
+        sound = proc(audios=list(resampled), sampling_rate=CLAP_SAMPLE_RATE, return_tensors="pt").to(model.device)
+        t = torch.nn.functional.normalize(model.get_text_features(**text), dim=-1)
+        a = torch.nn.functional.normalize(model.get_audio_features(**sound), dim=-1)
+    return (a @ t.T)[:, 0].float().cpu().numpy()
+
+
+def score_takes(audio, sample_rate, similarity=None):
+    """Per-take scores for audio shaped (takes, samples), all computed at once.
+
+    loudness: RMS dBFS; silence: share of 50 ms frames below SILENCE_DB;
+    flatness: mean spectral flatness (1 = white noise, 0 = pure tone).
+    score is the SCORE_WEIGHTS-weighted mean of the terms mapped to [0, 1].
+    """
+    audio = np.atleast_2d(np.asarray(audio, dtype=np.float32))
+    frame = max(1, int(sample_rate * 0.05))
+    n_frames = max(1, audio.shape[1] // frame)
+    frames = audio[:, :n_frames * frame].reshape(audio.shape[0], n_frames, frame)
+
+    eps = 1e-10
+    loudness = 10 * np.log10(np.mean(audio ** 2, axis=1) + eps)
+    frame_db = 10 * np.log10(np.mean(frames ** 2, axis=2) + eps)
+    silence = np.mean(frame_db < SILENCE_DB, axis=1)
+    power = np.abs(np.fft.rfft(frames * np.hanning(frame), axis=2)) ** 2 + eps
+    flatness_per_frame = np.exp(np.mean(np.log(power), axis=2)) / np.mean(power, axis=2)
+    # Silent frames are perfectly "flat" noise floor; leave them out
+    voiced = frame_db >= SILENCE_DB
+    flatness = np.where(
+        voiced.any(axis=1),
+        np.sum(flatness_per_frame * voiced, axis=1) / np.maximum(voiced.sum(axis=1), 1),
+        1.0,
+    )
+
+    terms = {
+        "loudness": 1 - np.minimum(1, np.abs(loudness - TARGET_LOUDNESS_DB) / 20),
+        "silence": 1 - silence,
+        "flatness": 1 - flatness,
+    }
+    if similarity is not None:
+        terms["clap"] = (np.asarray(similarity) + 1) / 2
+    total = sum(SCORE_WEIGHTS[name] * value for name, value in terms.items())
+    score = total / sum(SCORE_WEIGHTS[name] for name in terms)
+    return [
+        {
+            "score": round(float(score[i]), 3),
+            "loudness_db": round(float(loudness[i]), 1),
+            "silence": round(float(silence[i]), 3),
+            "flatness": round(float(flatness[i]), 3),
+            "clap": None if similarity is None else round(float(similarity[i]), 3),
+        }
+        for i in range(audio.shape[0])
+    ]
+
+
+def generate_variations(prompt, duration, model_size, category, count=4, export_fmt="WAV", seed=0):
+    """count takes of one prompt, best first: [{rank, score, ..., audio, path}].
+
+    All takes come from one batched pass; each is saved with its scores.
+    """
+    count = max(1, min(MAX_VARIATIONS, int(count)))
+    sample_rate, audio = generate_batch(prompt, duration, model_size, count, seed)
+    scores = score_takes(audio, sample_rate, clap_similarity(prompt, audio, sample_rate))
+    order = sorted(range(count), key=lambda i: scores[i]["score"], reverse=True)
+
+    output_id = output.new_id()
+    takes = []
+    for rank, i in enumerate(order, 1):
+        record = metadata.make_record(
+            "audio_variation",
+            prompt=prompt,
+            duration=float(duration),
+            model_size=model_size,
+            category=category,
+            seed=int(seed),
+            variations=count,
+            take=i,
+            rank=rank,
+            **scores[i],
+        )
+        take_rate, take = dsp.process(audio[i], sample_rate)
+        path = _save_take(take_rate, take, category, export_fmt, record, f"{output_id}_{rank}", "variation")
+        takes.append({"rank": rank, "take": i, **scores[i], "audio": (take_rate, take), "path": path})
+    print(f"[AudioLab] Ranked {count} takes: " + ", ".join(f"#{t['take']}={t['score']}" for t in takes))
+    return takes
+
+
+def make_loopable(audio, sample_rate, crossfade_ms=None):
+    """Cut audio to a seamless loop of whole bars (see loops.find_loop).
+
+    Audio without a steady beat falls back to crossfading its own end into
+    its start.
+    """
+    found = loops.find_loop(audio, sample_rate)
+    if found is None:
+        print("[AudioLab] No steady beat found, crossfading the ends")
+        return _crossfade_ends(audio, sample_rate, 500 if crossfade_ms is None else crossfade_ms)
+    start, end, bpm = found
+    beats = (end - start) / sample_rate * bpm / 60
+    print(f"[AudioLab] Loop: {beats / loops.BEATS_PER_BAR:.0f} bars at {bpm:.1f} BPM")
+    crossfade_ms = loops.CROSSFADE_MS if crossfade_ms is None else crossfade_ms
+    return loops.crossfade_loop(audio, start, end, int(sample_rate * crossfade_ms / 1000))
+
+
+def _crossfade_ends(audio, sample_rate, crossfade_ms):
     """Crossfade start and end for seamless looping."""
     crossfade_samples = int(sample_rate * crossfade_ms / 1000)
     if len(audio) < crossfade_samples * 2:
@@ -95,48 +579,75 @@ def stitch_segments(segments, sample_rate, crossfade_ms=200):
     return result
 
 
-def generate_and_process(prompt, duration, model_size, category, loop, export_fmt):
+def generate_and_process(prompt, duration, model_size, category, loop, export_fmt, seed=0):
     """Full pipeline: generate + optional loop + save in chosen format."""
-    sample_rate, audio = generate_audio(prompt, duration, model_size)
-
+    sample_rate, audio = generate_audio(prompt, duration, model_size, seed)
+    return _finish(sample_rate, audio, prompt, duration, model_size, category, loop, export_fmt, seed)
+
+
+def stream_and_process(prompt, duration, model_size, category, loop, export_fmt, seed=0):
+    """generate_and_process while streaming: yields ("chunk", (sample_rate, chunk))
+    as audio is decoded, then ("done", ((sample_rate, audio), path))."""
+    chunks, sample_rate = [], None
+    for sample_rate, chunk in stream_audio(prompt, duration, model_size, seed):
+        chunks.append(chunk)
+        yield "chunk", (sample_rate, chunk)
+    audio = np.concatenate(chunks) if chunks else np.zeros(0, dtype=np.float32)
+    yield "done", _finish(sample_rate, audio, prompt, duration, model_size, category, loop, export_fmt, seed)
+
+
+def _finish(sample_rate, audio, prompt, duration, model_size, category, loop, export_fmt, seed):
+    """Loop if asked and save in the chosen format; returns ((sample_rate, audio), path)."""
+    record = metadata.make_record(
+        "audio",
+        prompt=prompt,
+        duration=float(duration),
+        model_size=model_size,
+        category=category,
+        loop=bool(loop),
+        seed=int(seed),
+    )
+
+    # Loops skip the edge fades; their ends have to join up
+    sample_rate, audio = dsp.process(audio, sample_rate, fade_ms=0 if loop else dsp.FADE_MS)
     if loop:
         audio = make_loopable(audio, sample_rate)
 
-    # Save
-    cat_dir = os.path.join(OUT_DIR, category.lower())
-    os.makedirs(cat_dir, exist_ok=True)
-    ts = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+    return (sample_rate, audio), _save_take(sample_rate, audio, category, export_fmt, record)
 
+
+def _save_take(sample_rate, audio, category, export_fmt, record, output_id=None, prefix=None):
+    """Write audio as WAV (plus MP3/OGG if asked) with sidecars; returns the export path."""
     export_fmt = export_fmt.lower()
-    wav_path = os.path.join(cat_dir, f"{category.lower()}_{ts}.wav")
+    wav_path = output.allocate(
+        os.path.join(OUT_SUBDIR, category.lower()), prefix or category.lower(), "wav", output_id
+    )
 
     # Always save WAV first
-    import scipy.io.wavfile
-    audio_int16 = (audio * 32767).astype(np.int16)
-    scipy.io.wavfile.write(wav_path, sample_rate, audio_int16)
+    output.write_wav(wav_path, sample_rate, dsp.to_int16(audio))
+    metadata.write_sidecar(wav_path, record)
 
     if export_fmt == "wav":
-        return (sample_rate, audio), wav_path
+        return wav_path
 
     # Convert using pydub if available
     try:
         from pydub import AudioSegment
         sound = AudioSegment.from_wav(wav_path)
-        if export_fmt == "mp3":
-            out_path = wav_path.replace(".wav", ".mp3")
-            sound.export(out_path, format="mp3")
-        elif export_fmt == "ogg":
-            out_path = wav_path.replace(".wav", ".ogg")
-            sound.export(out_path, format="ogg")
+        if export_fmt in ("mp3", "ogg"):
+            out_path = output.sibling(wav_path, export_fmt)
+            with output.writing(out_path) as tmp:
+                sound.export(tmp, format=export_fmt)
+            metadata.write_sidecar(out_path, record)
         else:
             out_path = wav_path
-        return (sample_rate, audio), out_path
+        return out_path
     except ImportError:
         print("[AudioLab] pydub not available, returning WAV")
-        return (sample_rate, audio), wav_path
+        return wav_path
 
 
-def generate_chain(prompts_text, duration_each, model_size, crossfade_ms, export_fmt):
+def generate_chain(prompts_text, duration_each, model_size, crossfade_ms, export_fmt, seed=0):
     """Generate multiple segments from newline-separated prompts, stitch them."""
     prompts = [p.strip() for p in prompts_text.strip().split("\n") if p.strip()]
     if not prompts:
@@ -146,19 +657,22 @@ def generate_chain(prompts_text, duration_each, model_size, crossfade_ms, export
     sample_rate = None
     for i, prompt in enumerate(prompts):
         print(f"[AudioLab] Generating segment {i+1}/{len(prompts)}: {prompt[:50]}...")
-        sr, audio = generate_audio(prompt, duration_each, model_size)
+        sr, audio = generate_audio(prompt, duration_each, model_size, seed + i if seed > 0 else 0)
         segments.append(audio)
         sample_rate = sr
 
     stitched = stitch_segments(segments, sample_rate, crossfade_ms)
-
-    cat_dir = os.path.join(OUT_DIR, "bgm")
-    os.makedirs(cat_dir, exist_ok=True)
-    ts = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-
-    import scipy.io.wavfile
-    audio_int16 = (stitched * 32767).astype(np.int16)
-    wav_path = os.path.join(cat_dir, f"chain_{ts}.wav")
-    scipy.io.wavfile.write(wav_path, sample_rate, audio_int16)
+    sample_rate, stitched = dsp.process(stitched, sample_rate)
+
+    wav_path = output.allocate(os.path.join(OUT_SUBDIR, "bgm"), "chain", "wav")
+    output.write_wav(wav_path, sample_rate, dsp.to_int16(stitched))
+    metadata.write_sidecar(wav_path, metadata.make_record(
+        "audio_chain",
+        prompts=prompts,
+        duration_each=float(duration_each),
+        model_size=model_size,
+        crossfade_ms=crossfade_ms,
+        seed=int(seed),
+    ))
 
     return (sample_rate, stitched), wav_path
@@ -0,0 +1,68 @@
+import time
+import threading
+from concurrent.futures import Future
+
+
+class MicroBatcher:
+    """Coalesce concurrent compatible requests into batched calls.
+
+    submit() queues a request under a group key and blocks for its result.
+    A single worker thread waits up to `window` seconds after the oldest
+    pending request, then passes up to `max_batch` requests of that group to
+    run_batch(key, requests), which returns one result per request. Because
+    there is one worker, batches also run strictly one at a time.
+    """
+
+    def __init__(self, run_batch, window=0.1, max_batch=4, name="batcher"):
+        self.run_batch = run_batch
+        self.window = window
+        self.max_batch = max_batch
+        self._pending = {}  # key -> [(arrival time, request, future)]
+        self._cond = threading.Condition()
+        self._worker = threading.Thread(target=self._loop, name=name, daemon=True)
+        self._worker.start()
+
+    def submit(self, key, request):
+        """Queue request under key and block until its result is ready."""
+        future = Future()
+        with self._cond:
+            self._pending.setdefault(key, []).append((time.monotonic(), request, future))
+            self._cond.notify()
+        return future.result()
+
+    def _next_batch(self):
+        with self._cond:
+            while not self._pending:
+                self._cond.wait()
+            # Serve the group whose oldest request has waited longest
+            key = min(self._pending, key=lambda k: self._pending[k][0][0])
+            deadline = self._pending[key][0][0] + self.window
+            while len(self._pending[key]) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            group = self._pending[key]
+            batch, rest = group[:self.max_batch], group[self.max_batch:]
+            if rest:
+                self._pending[key] = rest
+            else:
+                del self._pending[key]
+            return key, batch
+
+    def _loop(self):
+        while True:
+            key, batch = self._next_batch()
+            requests = [request for _, request, _ in batch]
+            futures = [future for _, _, future in batch]
+            try:
+                results = self.run_batch(key, requests)
+            except Exception as e:
+                for future in futures:
+                    future.set_exception(e)
+                continue
+            for future, result in zip(futures, results):
+                if isinstance(result, BaseException):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
@@ -0,0 +1,155 @@
+import os
+import json
+import time
+import hashlib
+import threading
+import numpy as np
+
+CACHE_DIR = os.path.expanduser("~/CreationStudio/outputs/.cache")
+
+# Eviction limits: least-recently-used entries go first once the cache is
+# over MAX_CACHE_MB, and anything untouched for MAX_AGE_DAYS is dropped.
+MAX_CACHE_MB = 4096
+MAX_AGE_DAYS = 30
+
+_lock = threading.Lock()
+_model_hashes = {}
+
+
+def model_hash(path):
+    """SHA-256 of a model file, memoized on disk by (path, size, mtime)."""
+    st = os.stat(path)
+    fingerprint = f"{os.path.abspath(path)}|{st.st_size}|{int(st.st_mtime)}"
+    if fingerprint in _model_hashes:
+        return _model_hashes[fingerprint]
+
+    index_path = os.path.join(CACHE_DIR, "model_hashes.json")
+    index = {}
+    if os.path.exists(index_path):
+        try:
+            with open(index_path) as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            index = {}
+
+    digest = index.get(fingerprint)
+    if digest is None:
+        print(f"[Cache] Hashing {os.path.basename(path)} (one-time)...")
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(16 * 1024 * 1024), b""):
+                h.update(block)
+        digest = h.hexdigest()
+        with _lock:
+            index[fingerprint] = digest
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            tmp = index_path + ".tmp"
+            with open(tmp, "w") as f:
+                json.dump(index, f, indent=1)
+            os.replace(tmp, index_path)
+
+    _model_hashes[fingerprint] = digest
+    return digest
+
+
+def hub_revision(model_id):
+    """Commit hash of the locally cached Hugging Face snapshot, if any."""
+    try:
+        from huggingface_hub import snapshot_download
+        return os.path.basename(snapshot_download(model_id, local_files_only=True))
+    except Exception:
+        return None
+
+
+def make_key(kind, **params):
+    """Canonical hash of every input that affects a generator's output."""
+    payload = json.dumps({"kind": kind, **params}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _entry_path(kind, key, ext):
+    return os.path.join(CACHE_DIR, kind, key[:2], f"{key}.{ext}")
+
+
+def lookup(kind, key, ext):
+    """Return the cached file path for key, or None on a miss."""
+    path = _entry_path(kind, key, ext)
+    if not os.path.exists(path):
+        return None
+    age = time.time() - os.path.getmtime(path)
+    if age > MAX_AGE_DAYS * 86400:
+        _remove(path)
+        return None
+    # Bump mtime so eviction treats this entry as recently used
+    os.utime(path, None)
+    print(f"[Cache] Hit {kind}/{key[:12]}")
+    return path
+
+
+def store(kind, key, ext, write_fn):
+    """Write a cache entry via write_fn(path) and trigger eviction."""
+    path = _entry_path(kind, key, ext)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        write_fn(tmp)
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+    evict()
+    return path
+
+
+def store_audio(kind, key, sample_rate, audio):
+    """Cache a (sample_rate, audio) pair as .npz."""
+    def write(path):
+        with open(path, "wb") as f:
+            np.savez(f, sample_rate=sample_rate, audio=audio)
+    return store(kind, key, "npz", write)
+
+
+def load_audio(path):
+    """Read back a cached (sample_rate, audio) pair."""
+    with np.load(path) as data:
+        return int(data["sample_rate"]), data["audio"]
+
+
+def _remove(path):
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+
+def evict():
+    """Drop expired entries, then oldest entries until under MAX_CACHE_MB."""
+    if not os.path.isdir(CACHE_DIR):
+        return
+    with _lock:
+        now = time.time()
+        entries = []
+        for root, _, files in os.walk(CACHE_DIR):
+            for name in files:
+                if name == "model_hashes.json" or name.endswith(".tmp"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                if now - st.st_mtime > MAX_AGE_DAYS * 86400:
+                    _remove(path)
+                else:
+                    entries.append((st.st_mtime, st.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        limit = MAX_CACHE_MB * 1024 * 1024
+        if total <= limit:
+            return
+        entries.sort()
+        for _, size, path in entries:
+            if total <= limit:
+                break
+            _remove(path)
+            total -= size
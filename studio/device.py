@@ -1,7 +1,26 @@
-import torch
+import os
+import functools
+import threading
+import contextlib
 
+# CPU execution profile, applied whenever a model runs on the CPU:
+#   STUDIO_CPU_WORKERS  jobs/processes sharing the CPU; cores are split between them (1)
+#   STUDIO_CPU_THREADS  intra-op threads per worker (default: available cores / workers)
+#   STUDIO_CPU_INTEROP  inter-op threads; one model at a time gains nothing from more (1)
+#   STUDIO_CPU_BF16     auto (bf16 autocast if the CPU has native bf16: AVX512-BF16/AMX), 1, 0
+#   STUDIO_CPU_INT8     1 = dynamic int8 quantization of the MusicGen/Parler
+#                       text encoder and decoder Linear layers (0)
+CPU_WORKERS = int(os.environ.get("STUDIO_CPU_WORKERS", "1"))
+CPU_THREADS = int(os.environ.get("STUDIO_CPU_THREADS", "0"))
+CPU_INTEROP = int(os.environ.get("STUDIO_CPU_INTEROP", "1"))
+CPU_BF16 = os.environ.get("STUDIO_CPU_BF16", "auto").lower()
+CPU_INT8 = os.environ.get("STUDIO_CPU_INT8", "0") == "1"
+
+
+@functools.lru_cache(maxsize=None)
 def detect_device():
     """Auto-detect best available device and dtype."""
+    import torch
     if torch.cuda.is_available():
         device = "cuda"
         dtype = torch.float16
@@ -14,10 +33,136 @@ def detect_device():
         device = "cpu"
         dtype = torch.float32
         name = "CPU"
+        configure_cpu()
     print(f"[Device] Using {name} | dtype={dtype}")
     return device, dtype
 
-DEVICE, DTYPE = detect_device()
 
-# MusicGen always on CPU (MPS has channel limit bug >65536)
-AUDIO_DEVICE = "cuda" if torch.cuda.is_available() else "cpu"
+def accelerators():
+    """Devices models can be placed on: every CUDA GPU, else DEVICE.
+
+    studio.resources picks among these when a model is loaded.
+    """
+    import torch
+    if torch.cuda.is_available():
+        return [f"cuda:{i}" for i in range(torch.cuda.device_count())]
+    return [detect_device()[0]]
+
+
+def _audio_device():
+    # MusicGen always on CPU (MPS has channel limit bug >65536)
+    import torch
+    if torch.cuda.is_available():
+        return "cuda"
+    configure_cpu()
+    return "cpu"
+
+
+def _available_cores():
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def _native_bf16():
+    import torch
+    try:
+        return bool(torch.ops.mkldnn._is_mkldnn_bf16_supported())
+    except (AttributeError, RuntimeError):
+        pass
+    try:
+        with open("/proc/cpuinfo") as f:
+            flags = f.read()
+        return "avx512_bf16" in flags or "amx_bf16" in flags
+    except OSError:
+        return False
+
+
+@functools.lru_cache(maxsize=None)
+def configure_cpu():
+    """Apply the CPU profile once per process; returns it as a dict."""
+    import torch
+
+    threads = CPU_THREADS or max(1, _available_cores() // max(1, CPU_WORKERS))
+    torch.set_num_threads(threads)
+    try:
+        torch.set_num_interop_threads(CPU_INTEROP)
+    except RuntimeError:
+        # Only allowed before the first inter-op parallel work; keep torch's value
+        pass
+    # oneDNN kernels for conv/matmul (on by default; a profile shouldn't depend on that)
+    torch.backends.mkldnn.enabled = True
+    bf16 = CPU_BF16 == "1" or (CPU_BF16 == "auto" and _native_bf16())
+    profile = {
+        "threads": torch.get_num_threads(),
+        "interop": torch.get_num_interop_threads(),
+        "bf16": bf16,
+        "int8": CPU_INT8,
+    }
+    print(f"[Device] CPU profile: {profile}")
+    return profile
+
+
+def cpu_autocast(device):
+    """bf16 autocast when device is the CPU and the profile enables it."""
+    if device != "cpu" or not configure_cpu()["bf16"]:
+        return contextlib.nullcontext()
+    import torch
+    return torch.autocast("cpu", dtype=torch.bfloat16)
+
+
+# Sampling models (MusicGen, Parler) draw from torch's process-global RNG, so
+# runs hold this lock: another thread sampling in between would change what a
+# seeded run produces. Diffusers pipelines get their own Generators instead.
+_rng_lock = threading.RLock()
+
+
+@contextlib.contextmanager
+def sampling_rng(seed=None):
+    """Own the global torch RNG for one generation, seeded if seed is given.
+
+    The global RNG state is restored afterwards, so seeding doesn't make the
+    unseeded runs that follow deterministic.
+    """
+    import torch
+
+    with _rng_lock:
+        if seed is None:
+            yield
+            return
+        cuda = list(range(torch.cuda.device_count())) if torch.cuda.is_available() else []
+        with torch.random.fork_rng(devices=cuda):
+            torch.manual_seed(int(seed))
+            yield
+
+
+def quantize_int8(model, parts=("text_encoder", "decoder")):
+    """Dynamic int8 quantization of the Linear layers in model's parts, in place.
+
+    CPU only: quantized layers can't be moved to a GPU. The audio codec
+    (convolutions) is left in float. Returns whether anything was quantized.
+    """
+    import torch
+    from torch.ao.quantization import quantize_dynamic
+
+    done = False
+    for part in parts:
+        module = getattr(model, part, None)
+        if module is not None:
+            setattr(model, part, quantize_dynamic(module, {torch.nn.Linear}, dtype=torch.qint8))
+            done = True
+    return done
+
+
+def __getattr__(name):
+    # DEVICE/DTYPE/AUDIO_DEVICE are resolved on first access so importing
+    # studio modules does not pull in torch or probe CUDA at startup. They are
+    # the device kind; which GPU a model lands on is up to studio.resources.
+    if name == "DEVICE":
+        return detect_device()[0]
+    if name == "DTYPE":
+        return detect_device()[1]
+    if name == "AUDIO_DEVICE":
+        return _audio_device()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
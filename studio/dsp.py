@@ -0,0 +1,185 @@
+import os
+import math
+import functools
+import numpy as np
+
+# Post-processing for every audio output, on float32 buffers. process() runs
+# DC removal, optional resampling, EBU R128 loudness normalization, a
+# true-peak limiter and edge fades. Each stage is one vectorized numpy/scipy
+# call over the whole buffer (no per-sample Python), in place where possible.
+#
+#   STUDIO_MUSIC_LUFS  integrated loudness for MusicGen output (default -14,
+#                      the streaming-platform level)
+#   STUDIO_VOICE_LUFS  integrated loudness for speech (default -16)
+#   STUDIO_AUDIO_RATE  resample outputs to this rate (default: keep the model's)
+MUSIC_LUFS = float(os.environ.get("STUDIO_MUSIC_LUFS", "-14"))
+VOICE_LUFS = float(os.environ.get("STUDIO_VOICE_LUFS", "-16"))
+OUTPUT_RATE = int(os.environ.get("STUDIO_AUDIO_RATE", "0")) or None
+# Ceiling for inter-sample peaks, measured at TRUE_PEAK_OVERSAMPLE x
+TRUE_PEAK_DB = -1.0
+TRUE_PEAK_OVERSAMPLE = 4
+# The limiter's gain holds for this long around each peak and ramps over the
+# same time, longer than a bass cycle so it doesn't distort low notes
+LIMITER_MS = 20
+# Quiet takes get at most this much gain, so noise isn't pulled up to target
+MAX_GAIN_DB = 20.0
+DC_CUTOFF_HZ = 10.0
+FADE_MS = 10
+
+# ITU-R BS.1770 measurement
+_BLOCK_SECONDS = 0.4
+_BLOCK_STEP = 0.1
+_ABSOLUTE_GATE = -70.0
+_RELATIVE_GATE = -10.0
+
+
+def db_to_gain(db):
+    return 10 ** (db / 20)
+
+
+@functools.lru_cache(maxsize=8)
+def _k_weighting(sample_rate):
+    """BS.1770 K-weighting (high shelf + high-pass) as second-order sections."""
+    # Shelf
+    k = math.tan(math.pi * 1681.974450955533 / sample_rate)
+    q = 0.7071752369554196
+    vh = 10 ** (3.999843853973347 / 20)
+    vb = vh ** 0.4996667741545416
+    a0 = 1 + k / q + k * k
+    shelf = [(vh + vb * k / q + k * k) / a0, 2 * (k * k - vh) / a0, (vh - vb * k / q + k * k) / a0,
+             1.0, 2 * (k * k - 1) / a0, (1 - k / q + k * k) / a0]
+    # High-pass
+    k = math.tan(math.pi * 38.13547087602444 / sample_rate)
+    q = 0.5003270373238773
+    a0 = 1 + k / q + k * k
+    highpass = [1.0, -2.0, 1.0, 1.0, 2 * (k * k - 1) / a0, (1 - k / q + k * k) / a0]
+    return np.array([shelf, highpass])
+
+
+def loudness(audio, sample_rate):
+    """Integrated loudness of mono audio in LUFS (-inf for silence)."""
+    from scipy.signal import sosfilt
+
+    weighted = sosfilt(_k_weighting(sample_rate), np.asarray(audio, dtype=np.float32))
+    # Mean square of every 400 ms block (75% overlap) from one cumulative sum
+    energy = np.concatenate([[0.0], np.cumsum(np.square(weighted, dtype=np.float64))])
+    block = int(_BLOCK_SECONDS * sample_rate)
+    step = int(_BLOCK_STEP * sample_rate)
+    if len(weighted) < block:
+        block, starts = len(weighted), np.array([0])
+    else:
+        starts = np.arange(0, len(weighted) - block + 1, step)
+    if block == 0:
+        return -math.inf
+    power = (energy[starts + block] - energy[starts]) / block
+
+    gated = power[power > 10 ** ((_ABSOLUTE_GATE + 0.691) / 10)]
+    if not len(gated):
+        return -math.inf
+    relative = -0.691 + 10 * np.log10(gated.mean()) + _RELATIVE_GATE
+    gated = gated[gated > 10 ** ((relative + 0.691) / 10)]
+    return float(-0.691 + 10 * np.log10(gated.mean()))
+
+
+def normalize_loudness(audio, sample_rate, target_lufs, max_gain_db=MAX_GAIN_DB):
+    """Scale audio in place to target_lufs; silent audio is left alone."""
+    current = loudness(audio, sample_rate)
+    if not math.isfinite(current):
+        return audio
+    audio *= db_to_gain(min(target_lufs - current, max_gain_db))
+    return audio
+
+
+@functools.lru_cache(maxsize=4)
+def _interpolator(oversample):
+    """48-tap low-pass for oversampling, the filter length BS.1770 uses."""
+    from scipy.signal import firwin
+
+    return firwin(12 * oversample, 0.9 / oversample, window=("kaiser", 5.0))
+
+
+def true_peaks(audio, oversample=TRUE_PEAK_OVERSAMPLE):
+    """Per-sample peak magnitude including inter-sample peaks (oversampled)."""
+    from scipy.signal import resample_poly
+
+    up = resample_poly(audio, oversample, 1, window=_interpolator(oversample))
+    # Max over the polyphase slices; much faster than reshape(-1, k).max(axis=1)
+    return np.maximum.reduce([np.abs(up[k::oversample][:len(audio)]) for k in range(oversample)])
+
+
+def limit(audio, sample_rate, ceiling_db=TRUE_PEAK_DB, window_ms=LIMITER_MS):
+    """Look-ahead true-peak limiter, in place.
+
+    The gain each sample needs is min-filtered over the window, then box
+    smoothed over the same window. Every sample in the box had that sample
+    inside its min window, so the smoothed gain never exceeds what any peak
+    needs, and it ramps instead of stepping.
+    """
+    from scipy.ndimage import minimum_filter1d, uniform_filter1d
+
+    ceiling = db_to_gain(ceiling_db)
+    # Inter-sample peaks stay well within 6 dB of the sample peaks
+    if np.abs(audio).max(initial=0) < ceiling / 2:
+        return audio
+    peaks = true_peaks(audio)
+    if peaks.max(initial=0) <= ceiling:
+        return audio
+    gain = np.minimum(1.0, ceiling / np.maximum(peaks, 1e-12)).astype(np.float32)
+    window = int(sample_rate * window_ms / 1000) | 1
+    gain = uniform_filter1d(minimum_filter1d(gain, window), window)
+    audio *= gain
+    return audio
+
+
+def remove_dc(audio, sample_rate, cutoff_hz=DC_CUTOFF_HZ):
+    """Subtract the mean and high-pass below cutoff_hz (one-pole), for drifting offsets."""
+    from scipy.signal import lfilter
+
+    audio -= audio.mean()
+    r = math.exp(-2 * math.pi * cutoff_hz / sample_rate)
+    return lfilter(np.array([1.0, -1.0], np.float32), np.array([1.0, -r], np.float32), audio)
+
+
+def fade(audio, sample_rate, fade_in_ms=FADE_MS, fade_out_ms=FADE_MS):
+    """Linear fade in and out, in place, so the file starts and ends at zero."""
+    for ms, edge in ((fade_in_ms, slice(None)), (fade_out_ms, slice(None, None, -1))):
+        n = min(int(sample_rate * ms / 1000), len(audio) // 2)
+        if n > 0:
+            audio[edge][:n] *= np.linspace(0, 1, n, dtype=np.float32)
+    return audio
+
+
+def resample(audio, sample_rate, target_rate):
+    """Polyphase resampling to target_rate."""
+    from scipy.signal import resample_poly
+
+    if not target_rate or target_rate == sample_rate:
+        return audio
+    g = math.gcd(int(sample_rate), int(target_rate))
+    return resample_poly(audio, target_rate // g, sample_rate // g).astype(np.float32, copy=False)
+
+
+def process(audio, sample_rate, target_lufs=MUSIC_LUFS, ceiling_db=TRUE_PEAK_DB,
+            fade_ms=FADE_MS, target_rate=OUTPUT_RATE):
+    """The full chain on mono audio; returns (sample_rate, float32 audio).
+
+    target_lufs=None skips loudness normalization; fade_ms=0 skips the fades
+    (for loops, whose ends must stay continuous).
+    """
+    audio = np.array(audio, dtype=np.float32)
+    if not len(audio):
+        return sample_rate, audio
+    audio = remove_dc(audio, sample_rate)
+    audio = resample(audio, sample_rate, target_rate)
+    sample_rate = target_rate or sample_rate
+    if target_lufs is not None:
+        normalize_loudness(audio, sample_rate, target_lufs)
+    limit(audio, sample_rate, ceiling_db)
+    if fade_ms:
+        fade(audio, sample_rate, fade_ms, fade_ms)
+    return sample_rate, audio
+
+
+def to_int16(audio):
+    """16-bit PCM, clipped rather than wrapped."""
+    return np.rint(np.clip(audio, -1.0, 1.0) * 32767).astype(np.int16)
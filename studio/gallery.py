@@ -1,6 +1,7 @@
 import os
 import glob
 from pathlib import Path
+from . import metadata
 
 OUT_DIR = os.path.expanduser("~/CreationStudio/outputs")
 
@@ -10,9 +11,9 @@ def scan_outputs(category="all"):
     results = {"images": [], "logos": [], "sprites": [], "audio": [], "video": []}
 
     patterns = {
-        "images": "images/*.{png,jpg,jpeg}",
+        "images": "images/*.{png,jpg,jpeg,webp}",
         "logos": "logos/*.{png,jpg,svg,pdf,zip}",
-        "sprites": "sprites/*.png",
+        "sprites": "sprites/*.{png,webp}",
         "audio": "audio/**/*.{wav,mp3,ogg}",
         "video": "video/*.{mp4,gif,webm}",
     }
@@ -57,3 +58,13 @@ def get_video_files():
     """Get all video files."""
     results = scan_outputs("video")
     return results.get("video", [])[:20]
+
+
+def get_parameters(path):
+    """Generation parameters embedded in (or stored beside) an output file."""
+    return metadata.recall(path)
+
+
+def rebuild_catalog():
+    """Recreate outputs/catalog.json from the metadata in the output files."""
+    return metadata.rebuild_catalog(OUT_DIR)
@@ -1,13 +1,74 @@
-import torch
 import os
 import glob
-from diffusers import StableDiffusionXLPipeline
-from .device import DEVICE, DTYPE
+import json
+import random
+import contextlib
+import threading
+from PIL import Image
+from . import cache, lora, metadata, output, resources
+from .batcher import MicroBatcher
+from .jobs import JobCancelled, batch_step_callback
 
 MODEL_DIR = os.path.expanduser("~/CreationStudio/ComfyUI/models/checkpoints")
+# Converted checkpoints live next to MODEL_DIR, one folder per checkpoint
+DIFFUSERS_DIR = os.path.join(os.path.dirname(MODEL_DIR), "diffusers")
+CONVERSION_MARKER = "studio_conversion.json"
+
+# Two-pass mode: the base denoises the first REFINER_SPLIT of the schedule and
+# hands its latents straight to the refiner, which shares the base's VAE and
+# second text encoder
+REFINER_NAME = "sd_xl_refiner_1.0.safetensors"
+REFINER_SPLIT = 0.8
+
+# Opt-in optimized execution (STUDIO_OPTIMIZE=1): torch.compile, channels-last,
+# SDPA and fused QKV. Compiled kernels persist in COMPILE_CACHE_DIR, so only
+# the first run after install pays the compile time.
+OPTIMIZE = os.environ.get("STUDIO_OPTIMIZE", "0") == "1"
+COMPILE_CACHE_DIR = os.path.expanduser("~/CreationStudio/cache/torch_compile")
+
+# Distilled SDXL autoencoder used for cheap latent previews
+TINY_VAE_ID = "madebyollin/taesdxl"
+
+# Sampler name -> (diffusers scheduler class, config overrides, LoRA keyword).
+# Few-step samplers only work with their distillation LoRA, found in
+# lora.LORA_DIR by keyword; "Default" keeps the scheduler the checkpoint shipped with.
+SCHEDULERS = {
+    "Default": None,
+    "DPM++ 2M Karras": ("DPMSolverMultistepScheduler", {"use_karras_sigmas": True}, None),
+    "DPM++ 2M": ("DPMSolverMultistepScheduler", {}, None),
+    "Euler": ("EulerDiscreteScheduler", {}, None),
+    "Euler a": ("EulerAncestralDiscreteScheduler", {}, None),
+    "UniPC": ("UniPCMultistepScheduler", {}, None),
+    "LCM (LoRA)": ("LCMScheduler", {}, "lcm"),
+    "Lightning (LoRA)": ("EulerDiscreteScheduler", {"timestep_spacing": "trailing"}, "lightning"),
+}
+# Distilled few-step samplers burn out at normal CFG
+FEW_STEP_MAX_CFG = 2.0
+# Steps the UI switches to when a few-step sampler is picked (they need 4-8)
+FEW_STEP_STEPS = 6
+
+# Draft mode: the same seed, size and sampler with at most DRAFT_STEPS steps,
+# decoded with the tiny VAE, so the draft starts from the same latents as the
+# final. Finalize runs all the steps: the composition carries over, while the
+# fine detail can still change.
+DRAFT_STEPS = 8
+
+# Request coalescing: concurrent requests with identical model/size/steps/
+# sampler/LoRA settings arriving within BATCH_WINDOW seconds run as one
+# batched pipeline call of up to MAX_BATCH images
+BATCH_WINDOW = 0.1
+MAX_BATCH = 4
 
 _pipe = None
 _current_model = None
+_tiny_vae = None
+_refiner = None
+_refiner_base = None
+_batcher = None
+_batcher_lock = threading.Lock()
+_load_lock = threading.Lock()
+# Held while a generation is using the shared pipeline
+_run_lock = threading.Lock()
 
 
 def get_models():
@@ -22,49 +83,493 @@ def get_default_model():
     return next((m for m in models if "Juggernaut" in m), models[0])
 
 
-def load_model(model_name):
-    global _pipe, _current_model
-    if model_name == _current_model and _pipe is not None:
-        return _pipe
+def _variant(dtype):
+    """diffusers weight variant matching a torch dtype (None = full precision)."""
+    import torch
+    return {torch.float16: "fp16", torch.bfloat16: "bf16"}.get(dtype)
+
+
+def converted_path(model_name):
+    return os.path.join(DIFFUSERS_DIR, os.path.splitext(model_name)[0])
+
+
+def _converted_variants(model_name):
+    """Variants already converted for the current checkpoint file, or []."""
+    marker = os.path.join(converted_path(model_name), CONVERSION_MARKER)
+    if not os.path.exists(marker):
+        return []
+    with open(marker) as f:
+        info = json.load(f)
+    st = os.stat(os.path.join(MODEL_DIR, model_name))
+    # A replaced checkpoint invalidates the converted copy
+    if info.get("size") != st.st_size or info.get("mtime") != int(st.st_mtime):
+        return []
+    return info.get("variants", [])
+
+
+def convert_checkpoint(model_name, variants=("fp16",), pipe=None, pipeline_cls=None):
+    """One-time conversion of a single-file checkpoint to diffusers' folder layout.
+
+    Each variant ("fp16", "bf16", or None for full precision) is written as
+    safetensors shards under DIFFUSERS_DIR so later loads can memory-map them.
+    """
+    import torch
+    from diffusers import StableDiffusionXLImg2ImgPipeline, StableDiffusionXLPipeline
+
+    if pipeline_cls is None:
+        # The refiner has no first text encoder, so only the img2img class can read it
+        is_refiner = model_name == REFINER_NAME
+        pipeline_cls = StableDiffusionXLImg2ImgPipeline if is_refiner else StableDiffusionXLPipeline
+    model_path = os.path.join(MODEL_DIR, model_name)
+    out_dir = converted_path(model_name)
+    done = _converted_variants(model_name)
+    todo = [v for v in variants if v not in done]
+    if not todo:
+        return out_dir
+
+    dtypes = {"fp16": torch.float16, "bf16": torch.bfloat16, None: torch.float32}
+    os.makedirs(out_dir, exist_ok=True)
+    for variant in todo:
+        print(f"[ImageGen] Converting {model_name} -> {variant or 'fp32'}...")
+        # Each variant is read at its own dtype; casting one variant into
+        # another would compound rounding (fp16 -> bf16 loses range and bits)
+        if pipe is None or pipe.unet.dtype != dtypes[variant]:
+            pipe = pipeline_cls.from_single_file(
+                model_path, torch_dtype=dtypes[variant], use_safetensors=True
+            )
+        pipe.save_pretrained(out_dir, variant=variant, safe_serialization=True)
+        done.append(variant)
+
+    # Marker goes last so an interrupted conversion is redone next time
+    st = os.stat(model_path)
+    tmp = os.path.join(out_dir, CONVERSION_MARKER + ".tmp")
+    with open(tmp, "w") as f:
+        json.dump({"source": model_name, "size": st.st_size, "mtime": int(st.st_mtime), "variants": done}, f)
+    os.replace(tmp, os.path.join(out_dir, CONVERSION_MARKER))
+    print(f"[ImageGen] Converted {model_name} to {out_dir}")
+    return out_dir
+
+
+def load_checkpoint(pipeline_cls, model_name, dtype=None, **components):
+    """Load an SDXL pipeline class, preferring the converted diffusers copy.
+
+    The first load of a checkpoint parses the single file and converts it in
+    the current dtype's variant; later loads memory-map the safetensors shards.
+    components are already-loaded modules to share instead of loading (e.g. vae).
+    """
+    from .device import DTYPE
+
+    dtype = dtype or DTYPE
     model_path = os.path.join(MODEL_DIR, model_name)
     if not os.path.exists(model_path):
         raise FileNotFoundError(f"Model not found: {model_path}")
-    print(f"[ImageGen] Loading {model_name}...")
-    _pipe = StableDiffusionXLPipeline.from_single_file(
-        model_path, torch_dtype=DTYPE, use_safetensors=True
+    variant = _variant(dtype)
+
+    if variant in _converted_variants(model_name):
+        return pipeline_cls.from_pretrained(
+            converted_path(model_name),
+            torch_dtype=dtype,
+            variant=variant,
+            use_safetensors=True,
+            low_cpu_mem_usage=True,
+            **components,
+        )
+
+    pipe = pipeline_cls.from_single_file(
+        model_path, torch_dtype=dtype, use_safetensors=True, **components
     )
-    _pipe = _pipe.to(DEVICE)
-    _pipe.enable_attention_slicing()
-    _pipe.enable_vae_tiling()
-    _current_model = model_name
-    print(f"[ImageGen] {model_name} loaded on {DEVICE}")
-    return _pipe
-
-
-def generate(prompt, negative_prompt, model_name, width, height, steps, cfg, seed):
-    """Generate an image from text prompt."""
-    pipeline = load_model(model_name)
-    generator = torch.Generator(device="cpu")
+    try:
+        convert_checkpoint(model_name, variants=(variant,), pipe=pipe, pipeline_cls=pipeline_cls)
+    except OSError as e:
+        # Conversion is an optimization; a full disk must not break generation
+        print(f"[ImageGen] Conversion of {model_name} failed: {e}")
+    return pipe
+
+
+def optimize_pipeline(pipe, device, compile=True):
+    """Apply channels-last, SDPA/fused-QKV attention and torch.compile in place."""
+    import torch
+    from diffusers.models.attention_processor import AttnProcessor2_0
+
+    pipe.unet.to(memory_format=torch.channels_last)
+    pipe.vae.to(memory_format=torch.channels_last)
+    pipe.unet.set_attn_processor(AttnProcessor2_0())
+    pipe.vae.set_attn_processor(AttnProcessor2_0())
+    # Fusing swaps in the fused SDPA processor, so it must come after the line above
+    try:
+        pipe.fuse_qkv_projections()
+    except (AttributeError, ValueError) as e:
+        print(f"[ImageGen] Fused QKV unavailable: {e}")
+
+    # torch.compile on MPS is still experimental
+    if compile and device != "mps":
+        os.makedirs(COMPILE_CACHE_DIR, exist_ok=True)
+        os.environ.setdefault("TORCHINDUCTOR_CACHE_DIR", COMPILE_CACHE_DIR)
+        os.environ.setdefault("TORCHINDUCTOR_FX_GRAPH_CACHE", "1")
+        import torch._inductor.config as inductor_config
+        inductor_config.fx_graph_cache = True
+        mode = "max-autotune" if device.startswith("cuda") else "default"
+        pipe.unet = torch.compile(pipe.unet, mode=mode, fullgraph=True)
+        # VAE tiling loops over tiles in Python, so the decoder allows graph breaks
+        pipe.vae.decode = torch.compile(pipe.vae.decode, mode=mode)
+    return pipe
+
+
+def _unload_pipe():
+    global _pipe, _current_model
+    _pipe, _current_model = None, None
+
+
+def _unload_refiner():
+    global _refiner, _refiner_base
+    _refiner, _refiner_base = None, None
+
+
+def load_model(model_name):
+    global _pipe, _current_model
+    import torch
+    from diffusers import StableDiffusionXLPipeline
+
+    with _load_lock:
+        if model_name == _current_model and _pipe is not None:
+            resources.touch("image")
+            return _pipe
+        print(f"[ImageGen] Loading {model_name}...")
+        pipe = load_checkpoint(StableDiffusionXLPipeline, model_name)
+        # Replaces (and frees) the previous checkpoint's registration; its
+        # unload hook clears the globals, so they're only set afterwards
+        device = resources.claim("image", pipe, unload=_unload_pipe)
+        if OPTIMIZE:
+            # Attention slicing would replace the SDPA processors, so it is skipped here
+            optimize_pipeline(pipe, device)
+        else:
+            pipe.enable_attention_slicing()
+            if device == "cpu":
+                # oneDNN convolutions are fastest on channels-last tensors
+                pipe.unet.to(memory_format=torch.channels_last)
+                pipe.vae.to(memory_format=torch.channels_last)
+        pipe.enable_vae_tiling()
+        _pipe = pipe
+        _current_model = model_name
+        print(f"[ImageGen] {model_name} loaded on {device}")
+        return _pipe
+
+
+def get_refiner_available():
+    return os.path.exists(os.path.join(MODEL_DIR, REFINER_NAME))
+
+
+def load_refiner(base):
+    """Load the SDXL refiner sharing base's VAE and second text encoder."""
+    global _refiner, _refiner_base
+    from diffusers import StableDiffusionXLImg2ImgPipeline
+
+    with _load_lock:
+        if _refiner is not None and _refiner_base is base:
+            resources.touch("image:refiner")
+            return _refiner
+        # Drop a refiner bound to a previous base before loading the new one
+        _refiner = None
+        print(f"[ImageGen] Loading refiner {REFINER_NAME}...")
+        _refiner = load_checkpoint(
+            StableDiffusionXLImg2ImgPipeline,
+            REFINER_NAME,
+            text_encoder_2=base.text_encoder_2,
+            vae=base.vae,
+        )
+        # Shares the base's modules, so it must sit on the same device and
+        # is unloaded rather than moved when memory runs short
+        device = resources.claim("image:refiner", _refiner, unload=_unload_refiner, offload=False, parent="image")
+        if not OPTIMIZE:
+            _refiner.enable_attention_slicing()
+        _refiner_base = base
+        print(f"[ImageGen] Refiner loaded on {device}")
+        return _refiner
+
+
+def load_tiny_vae():
+    """Load the tiny SDXL autoencoder once; returns None if it is unavailable."""
+    global _tiny_vae
+    if _tiny_vae is None:
+        from diffusers import AutoencoderTiny
+        from .device import DEVICE, DTYPE
+
+        try:
+            _tiny_vae = AutoencoderTiny.from_pretrained(TINY_VAE_ID, torch_dtype=DTYPE).to(DEVICE)
+        except Exception as e:
+            print(f"[ImageGen] Tiny VAE unavailable ({e}), previews disabled")
+            _tiny_vae = False
+    return _tiny_vae or None
+
+
+def preview_latents(latents):
+    """Decode in-progress SDXL latents to a low-res PIL preview with the tiny VAE."""
+    import torch
+    import torch.nn.functional as F
+
+    vae = load_tiny_vae()
+    if vae is None:
+        return None
+    with torch.no_grad():
+        # Halving the latents keeps the preview decode cheap
+        # The tiny VAE stays put while the pipeline may move between devices
+        small = F.interpolate(latents[:1].to(vae.device, vae.dtype), scale_factor=0.5, mode="bilinear")
+        decoded = vae.decode(small).sample[0]
+    arr = ((decoded.float().clamp(-1, 1) + 1) * 127.5).permute(1, 2, 0).byte().cpu().numpy()
+    return Image.fromarray(arr)
+
+
+@contextlib.contextmanager
+def _draft_components(pipe):
+    """Temporarily decode with the tiny VAE, on the UNet's device.
+
+    The tiny VAE lives on the default device, but resources may have put the
+    pipe on another GPU; the pipeline runs on its first module's device, so
+    the swapped-in VAE has to sit with the UNet.
+    """
+    vae = pipe.vae
+    tiny = load_tiny_vae()
+    home = tiny.device if tiny is not None else None
+    if tiny is not None:
+        tiny.to(pipe.unet.device)
+        pipe.vae = tiny
+    try:
+        yield pipe
+    finally:
+        pipe.vae = vae
+        if tiny is not None:
+            tiny.to(home)
+
+
+def get_schedulers():
+    return list(SCHEDULERS.keys())
+
+
+def is_few_step(name):
+    spec = SCHEDULERS.get(name)
+    return bool(spec and spec[2])
+
+
+def sampler_lora(name):
+    """LoRA file name a few-step sampler depends on, or None for regular samplers."""
+    spec = SCHEDULERS.get(name)
+    if not spec or not spec[2]:
+        return None
+    path = lora.find_lora(spec[2])
+    if path is None:
+        raise FileNotFoundError(f"{name} needs a LoRA with '{spec[2]}' in its name in {lora.LORA_DIR}")
+    return os.path.basename(path)
+
+
+@contextlib.contextmanager
+def use_scheduler(pipe, name):
+    """Run with the named sampler, swapping the scheduler in place (no reload)."""
+    import diffusers
+
+    spec = SCHEDULERS.get(name)
+    if spec is None:
+        yield pipe
+        return
+
+    cls_name, overrides, _ = spec
+    original = pipe.scheduler
+    # Build from the checkpoint's own config so betas/prediction type are preserved
+    pipe.scheduler = getattr(diffusers, cls_name).from_config(original.config, **overrides)
+    try:
+        yield pipe
+    finally:
+        pipe.scheduler = original
+
+
+def _generate_refined(pipeline, call, scheduler, jobs):
+    """Base pass to REFINER_SPLIT, then the refiner finishes from the same latents."""
+    refiner = load_refiner(pipeline)
+    with resources.using("image:refiner"):
+        with use_scheduler(pipeline, scheduler):
+            latents = pipeline(
+                **call,
+                denoising_end=REFINER_SPLIT,
+                output_type="latent",
+                callback_on_step_end=batch_step_callback(jobs, preview_latents),
+            ).images
+        # The latents never leave the device or pass through the VAE between passes
+        with use_scheduler(refiner, scheduler):
+            return refiner(
+                prompt=call["prompt"],
+                negative_prompt=call["negative_prompt"],
+                image=latents,
+                num_inference_steps=call["num_inference_steps"],
+                guidance_scale=call["guidance_scale"],
+                generator=call["generator"],
+                denoising_start=REFINER_SPLIT,
+                callback_on_step_end=batch_step_callback(
+                    jobs, preview_latents, offset=int(call["num_inference_steps"] * REFINER_SPLIT)
+                ),
+            ).images
+
+
+def _run_batch(group, requests):
+    """MicroBatcher callback: one pipeline call for requests sharing group settings."""
+    import torch
+    from .device import cpu_autocast
+
+    model_name, width, height, steps, cfg, scheduler, selection, fuse_loras, refine, draft = group
+    # Requests cancelled while queued never reach the device
+    live = [r for r in requests if not (r["job"] and r["job"].cancelled)]
+    if not live:
+        return [JobCancelled() for _ in requests]
+
+    # Tiled canvases (tiled.py) drive the same pipeline outside the batcher
+    with _run_lock:
+        pipeline = load_model(model_name)
+        with resources.using("image") as device, cpu_autocast(device):
+            lora.apply(pipeline, list(selection), fuse=fuse_loras)
+
+            generators = [torch.Generator(device="cpu").manual_seed(r["seed"]) for r in live]
+
+            jobs = [r["job"] for r in live]
+            for job in jobs:
+                if job:
+                    job.start(steps)
+            if len(live) > 1:
+                print(f"[ImageGen] Batching {len(live)} requests ({width}x{height}, {steps} steps)")
+
+            call = dict(
+                prompt=[r["prompt"] for r in live],
+                negative_prompt=[r["negative_prompt"] for r in live],
+                width=width,
+                height=height,
+                num_inference_steps=steps,
+                guidance_scale=cfg,
+                generator=generators,
+            )
+            if refine:
+                images = _generate_refined(pipeline, call, scheduler, jobs)
+            else:
+                with use_scheduler(pipeline, scheduler), \
+                        _draft_components(pipeline) if draft else contextlib.nullcontext():
+                    images = pipeline(**call, callback_on_step_end=batch_step_callback(jobs, preview_latents)).images
+
+            results = dict(zip(map(id, live), images))
+            return [
+                JobCancelled() if r["job"] and r["job"].cancelled else results.get(id(r), JobCancelled())
+                for r in requests
+            ]
+
+
+def _get_batcher():
+    global _batcher
+    with _batcher_lock:
+        if _batcher is None:
+            _batcher = MicroBatcher(_run_batch, window=BATCH_WINDOW, max_batch=MAX_BATCH, name="image-batcher")
+        return _batcher
+
+
+def generate(prompt, negative_prompt, model_name, width, height, steps, cfg, seed,
+             scheduler="Default", loras=None, fuse_loras=False, refine=False, draft=False, job=None):
+    """Generate an image from text prompt. Pass a jobs.Job for progress and cancellation.
+
+    scheduler picks a sampler from SCHEDULERS. loras is a list of (LoRA file
+    name, weight); fuse_loras merges them into the weights (see lora.apply).
+    refine=True hands the base latents to the SDXL refiner for the last steps.
+    draft=True gives a fast preview (see DRAFT_STEPS); calling again with the
+    same seed and draft=False renders the same composition with all steps.
+
+    Concurrent requests with the same settings are coalesced into one batched
+    pipeline call (see BATCH_WINDOW/MAX_BATCH).
+    """
+    width, height, steps, cfg = int(width), int(height), int(steps), float(cfg)
+    if draft:
+        steps = min(steps, DRAFT_STEPS)
+        # Drafts are about speed; the refiner only adds fine detail
+        refine = False
+    selection = [(name, float(weight)) for name, weight in (loras or [])]
+    few_step_lora = sampler_lora(scheduler)
+    if few_step_lora:
+        selection.append((few_step_lora, 1.0))
+        if cfg > FEW_STEP_MAX_CFG:
+            print(f"[ImageGen] {scheduler}: clamping CFG {cfg} -> {FEW_STEP_MAX_CFG}")
+            cfg = FEW_STEP_MAX_CFG
+        # The distillation LoRA only exists for the base UNet
+        refine = False
+    if refine and not get_refiner_available():
+        raise FileNotFoundError(f"Refiner not found: {os.path.join(MODEL_DIR, REFINER_NAME)}")
+
+    # Only seeded requests are reproducible, so only those are cached
+    key, image = None, None
     if seed > 0:
-        generator = generator.manual_seed(int(seed))
+        key = cache.make_key(
+            "image",
+            prompt=prompt,
+            negative_prompt=negative_prompt,
+            model=cache.model_hash(os.path.join(MODEL_DIR, model_name)),
+            width=width,
+            height=height,
+            steps=steps,
+            cfg=cfg,
+            seed=int(seed),
+            scheduler=scheduler,
+            loras=[(cache.model_hash(os.path.join(lora.LORA_DIR, n)), w) for n, w in selection],
+            fuse_loras=bool(fuse_loras),
+            refiner=cache.model_hash(os.path.join(MODEL_DIR, REFINER_NAME)) if refine else None,
+            draft=bool(draft),
+        )
+        hit = cache.lookup("image", key, output.intermediate_format()[1])
+        if hit:
+            # Skip only the diffusion; a hit is still saved like a fresh image
+            image = Image.open(hit)
+            image.load()
 
-    image = pipeline(
+    # Unseeded requests still get a concrete seed so the saved file can be remixed
+    seed = int(seed) if seed > 0 else random.randint(1, 2**31 - 1)
+    if image is None:
+        group = (
+            model_name, width, height, steps, cfg, scheduler,
+            tuple(selection), bool(fuse_loras), bool(refine), bool(draft),
+        )
+        request = {"prompt": prompt, "negative_prompt": negative_prompt, "seed": seed, "job": job}
+        image = _get_batcher().submit(group, request)
+        if key:
+            fmt, ext = output.intermediate_format()
+            cache.store("image", key, ext, lambda p: output.encode_image(image, p, fmt))
+
+    record = metadata.make_record(
+        "image",
         prompt=prompt,
         negative_prompt=negative_prompt,
-        width=int(width),
-        height=int(height),
-        num_inference_steps=int(steps),
-        guidance_scale=float(cfg),
-        generator=generator,
-    ).images[0]
+        model=model_name,
+        width=width,
+        height=height,
+        steps=steps,
+        cfg=cfg,
+        seed=seed,
+        scheduler=scheduler,
+        loras=[[n, w] for n, w in selection if n != few_step_lora],
+        fuse_loras=bool(fuse_loras),
+        refine=bool(refine),
+    )
+
+    # Drafts are iteration previews; only finals go to the gallery
+    if draft:
+        return image
 
     # Save to outputs
-    import datetime
-    out_dir = os.path.expanduser("~/CreationStudio/outputs/images")
-    os.makedirs(out_dir, exist_ok=True)
-    ts = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-    path = os.path.join(out_dir, f"img_{ts}.png")
-    image.save(path)
-    print(f"[ImageGen] Saved to {path}")
+    # Encoding happens in the background; the caller gets the image right away
+    path = output.allocate("images", "img", output.image_ext())
+    metadata.save_image(image, path, record)
+    print(f"[ImageGen] Saving to {path}")
 
     return image
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Pre-convert SDXL checkpoints to diffusers' folder layout.")
+    parser.add_argument("models", nargs="*", help="checkpoint file names (default: all in MODEL_DIR)")
+    parser.add_argument("--variants", nargs="+", default=["fp16"], choices=["fp16", "bf16", "fp32"])
+    args = parser.parse_args()
+
+    variants = tuple(None if v == "fp32" else v for v in args.variants)
+    for name in args.models or [m for m in get_models() if m != "No models found"]:
+        convert_checkpoint(name, variants=variants)
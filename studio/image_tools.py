@@ -1,9 +1,6 @@
-import os
-import datetime
 import numpy as np
 from PIL import Image
-
-OUT_DIR = os.path.expanduser("~/CreationStudio/outputs")
+from . import metadata, output, resources
 
 
 def upscale_image(image, scale=4):
@@ -35,10 +32,7 @@ def upscale_image(image, scale=4):
         w, h = image.size
         result = image.resize((w * scale, h * scale), Image.LANCZOS)
 
-    ts = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-    path = os.path.join(OUT_DIR, "images", f"upscaled_{ts}.png")
-    os.makedirs(os.path.dirname(path), exist_ok=True)
-    result.save(path)
+    output.save_image_async(result, output.allocate("images", "upscaled", output.image_ext()))
     return result
 
 
@@ -53,48 +47,59 @@ def remove_background(image):
         print("[RemoveBG] rembg not available")
         return image
 
-    ts = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-    path = os.path.join(OUT_DIR, "images", f"nobg_{ts}.png")
-    os.makedirs(os.path.dirname(path), exist_ok=True)
-    result.save(path)
+    output.save_image_async(result, output.allocate("images", "nobg", output.image_ext()))
     return result
 
 
-def img2img(image, prompt, negative_prompt, model_name, denoise_strength, steps, cfg):
-    """Image-to-image transformation using SDXL."""
+def img2img(image, prompt, negative_prompt, model_name, denoise_strength, steps, cfg, job=None):
+    """Image-to-image transformation using SDXL. Pass a jobs.Job for progress and cancellation."""
     if image is None:
         return None
     from diffusers import StableDiffusionXLImg2ImgPipeline
-    from .device import DEVICE, DTYPE
-    import torch
+    from . import image_gen
 
-    model_path = os.path.join(
-        os.path.expanduser("~/CreationStudio/ComfyUI/models/checkpoints"), model_name
-    )
     print(f"[Img2Img] Loading {model_name}...")
-    pipe = StableDiffusionXLImg2ImgPipeline.from_single_file(
-        model_path, torch_dtype=DTYPE, use_safetensors=True
-    )
-    pipe = pipe.to(DEVICE)
+    # Serialized with the shared pipeline's loads so the two don't claim
+    # memory against each other at the same time
+    with image_gen._load_lock:
+        pipe = image_gen.load_checkpoint(StableDiffusionXLImg2ImgPipeline, model_name)
+        # One-off pipeline: accounted for while it runs, released right after
+        name = f"img2img:{id(pipe):x}"
+        resources.claim(name, pipe, offload=False)
     pipe.enable_attention_slicing()
     pipe.enable_vae_tiling()
 
     # Ensure image is RGB and proper size
     image = image.convert("RGB").resize((1024, 1024), Image.LANCZOS)
 
-    result = pipe(
+    if job:
+        # img2img skips the first (1 - strength) of the schedule
+        job.start(max(1, int(int(steps) * float(denoise_strength))))
+
+    try:
+        with resources.using(name):
+            result = pipe(
+                prompt=prompt,
+                negative_prompt=negative_prompt,
+                image=image,
+                strength=float(denoise_strength),
+                num_inference_steps=int(steps),
+                guidance_scale=float(cfg),
+                callback_on_step_end=job.step_callback(image_gen.preview_latents) if job else None,
+            ).images[0]
+    finally:
+        resources.release(name)
+
+    record = metadata.make_record(
+        "img2img",
         prompt=prompt,
         negative_prompt=negative_prompt,
-        image=image,
-        strength=float(denoise_strength),
-        num_inference_steps=int(steps),
-        guidance_scale=float(cfg),
-    ).images[0]
-
-    ts = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-    path = os.path.join(OUT_DIR, "images", f"img2img_{ts}.png")
-    os.makedirs(os.path.dirname(path), exist_ok=True)
-    result.save(path)
+        model=model_name,
+        denoise_strength=float(denoise_strength),
+        steps=int(steps),
+        cfg=float(cfg),
+    )
+    metadata.save_image(result, output.allocate("images", "img2img", output.image_ext()), record)
     return result
 
 
@@ -129,10 +134,7 @@ def stitch_sprite_sheet(images, cols, padding=0):
         y = r * (h + padding)
         sheet.paste(img.convert("RGBA"), (x, y))
 
-    ts = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-    path = os.path.join(OUT_DIR, "sprites", f"spritesheet_{ts}.png")
-    os.makedirs(os.path.dirname(path), exist_ok=True)
-    sheet.save(path)
+    output.save_image_async(sheet, output.allocate("sprites", "spritesheet", output.image_ext()))
     return sheet
 
 
@@ -162,8 +164,5 @@ def make_seamless_tile(image):
 
     result = Image.fromarray(np.clip(result, 0, 255).astype(np.uint8))
 
-    ts = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-    path = os.path.join(OUT_DIR, "sprites", f"tile_{ts}.png")
-    os.makedirs(os.path.dirname(path), exist_ok=True)
-    result.save(path)
+    output.save_image_async(result, output.allocate("sprites", "tile", output.image_ext()))
     return result
@@ -0,0 +1,143 @@
+import time
+import queue
+import threading
+
+# Decode a latent preview every N denoising steps (previews cost a tiny-VAE decode)
+PREVIEW_EVERY = 5
+
+
+class JobCancelled(Exception):
+    """Raised inside a pipeline step callback once the job is cancelled."""
+
+
+class Job:
+    """Progress and cancellation state for one diffusion run.
+
+    Generators accept an optional job and pass job.step_callback() to the
+    pipeline as callback_on_step_end; the callback publishes step/ETA/preview
+    updates and raises JobCancelled at the next step after cancel().
+    """
+
+    def __init__(self, total_steps=None):
+        self.total_steps = total_steps
+        self.step = 0
+        self.preview = None
+        self.started = time.time()
+        self.updates = queue.Queue()
+        self._cancel = threading.Event()
+
+    def cancel(self):
+        self._cancel.set()
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    def check(self):
+        if self.cancelled:
+            raise JobCancelled()
+
+    def eta(self):
+        """Seconds remaining, extrapolated from the mean step time so far."""
+        if not self.total_steps or self.step == 0:
+            return None
+        per_step = (time.time() - self.started) / self.step
+        return per_step * (self.total_steps - self.step)
+
+    def status_text(self):
+        if not self.total_steps:
+            return "Working..."
+        text = f"Step {self.step}/{self.total_steps}"
+        eta = self.eta()
+        if eta is not None:
+            text += f" — about {eta:.0f}s left"
+        return text
+
+    def start(self, total_steps):
+        """(Re)start timing for a run of total_steps steps."""
+        self.total_steps = total_steps
+        self.step = 0
+        self.started = time.time()
+
+    def report(self, step, preview=None):
+        self.step = step
+        if preview is not None:
+            self.preview = preview
+        self.updates.put(("progress", self))
+
+    def step_callback(self, preview_fn=None, offset=0):
+        """Build a diffusers callback_on_step_end for this job.
+
+        offset is added to the pipeline's step index, for jobs that chain
+        several pipelines over one step budget.
+        """
+        return batch_step_callback([self], preview_fn, offset)
+
+
+def batch_step_callback(jobs, preview_fn=None, offset=0):
+    """callback_on_step_end for a batched run where image i belongs to jobs[i].
+
+    jobs may contain None for requests without progress tracking. The run is
+    aborted only once every job in it is cancelled (untracked requests can't
+    be); a job cancelled inside a live batch just stops receiving updates.
+    """
+    def callback(pipe, step, timestep, callback_kwargs):
+        nonlocal preview_fn
+        if all(job is not None and job.cancelled for job in jobs):
+            raise JobCancelled()
+        want_preview = preview_fn is not None and (step + 1) % PREVIEW_EVERY == 0
+        for i, job in enumerate(jobs):
+            if job is None or job.cancelled:
+                continue
+            preview = None
+            if want_preview and preview_fn is not None:
+                try:
+                    preview = preview_fn(callback_kwargs["latents"][i:i + 1])
+                except Exception as e:
+                    print(f"[Jobs] Preview failed: {e}")
+                    preview_fn = None
+            job.report(offset + step + 1, preview)
+        return callback_kwargs
+    return callback
+
+
+def _release_device_memory():
+    try:
+        import torch
+        if torch.cuda.is_available():
+            torch.cuda.empty_cache()
+    except ImportError:
+        pass
+
+
+def stream(fn, *args, job, **kwargs):
+    """Run fn(*args, job=job, **kwargs) on a worker thread and yield updates.
+
+    Yields ("progress", job) while the job runs and ("done", result) at the
+    end; worker exceptions are re-raised here. Closing the generator (a Gradio
+    cancel or a disconnected client) cancels the job, so the worker stops at
+    its next step and frees the device.
+    """
+    def worker():
+        try:
+            job.updates.put(("done", fn(*args, job=job, **kwargs)))
+        except JobCancelled:
+            print("[Jobs] Cancelled")
+            _release_device_memory()
+            job.updates.put(("cancelled", None))
+        except Exception as e:
+            job.updates.put(("error", e))
+
+    threading.Thread(target=worker, daemon=True).start()
+    try:
+        while True:
+            kind, value = job.updates.get()
+            if kind == "error":
+                raise value
+            if kind == "cancelled":
+                return
+            yield kind, value
+            if kind == "done":
+                return
+    finally:
+        job.cancel()
@@ -1,147 +1,305 @@
-import os
 import io
-import datetime
+import os
+import json
+import base64
+import hashlib
 import zipfile
+import datetime
 import subprocess
-import tempfile
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 from PIL import Image
+from . import output, vectorize
+
+# Folder under output.OUT_DIR
+OUT_SUBDIR = "logos"
+
+# SVG export: "color" traces up to vectorize.MAX_COLORS flat colors with the
+# built-in tracer; "potrace" traces a 1-bit threshold with potrace. Either
+# falls back to the next (color -> potrace -> embedded PNG) if unavailable.
+SVG_MODE = "color"
+
+PACK_SCALES = (1, 2, 4)
+# Pack members are encoded concurrently. Threads are enough: Pillow releases
+# the GIL while resizing/encoding and potrace runs as its own process.
+PACK_WORKERS = 4
+# Batch export runs one image per process (None = one process per CPU). The
+# workers are spawned, not forked: forking the threaded server (possibly
+# with CUDA initialised) can deadlock the children.
+BATCH_WORKERS = None
+BATCH_EXTS = (".png", ".jpg", ".jpeg", ".webp")
+
+
+def _resize(image, scale):
+    if scale == 1:
+        return image
+    w, h = image.size
+    return image.resize((int(w * scale), int(h * scale)), Image.LANCZOS)
+
+
+def _encode(image, fmt, **params):
+    buf = io.BytesIO()
+    image.save(buf, fmt, **params)
+    return buf.getvalue()
+
+
+class _Scaled:
+    """Lazily computed Lanczos resizes of one image, shared by all pack members."""
+
+    def __init__(self, image):
+        self.image = image
+        self._cache = {1: image}
+
+    def __call__(self, scale):
+        if scale not in self._cache:
+            self._cache[scale] = _resize(self.image, scale)
+        return self._cache[scale]
+
+
+def png_bytes(image, scale=1):
+    return _encode(_resize(image, scale), "PNG", compress_level=output.PNG_COMPRESS_LEVEL)
+
+
+def jpg_bytes(image, quality=95):
+    return _encode(image.convert("RGB"), "JPEG", quality=quality)
+
 
-OUT_DIR = os.path.expanduser("~/CreationStudio/outputs/logos")
+def _embedded_svg(image):
+    """SVG wrapping the raster as a data URI, for when potrace is missing."""
+    b64 = base64.b64encode(png_bytes(image)).decode()
+    w, h = image.size
+    return f'''<?xml version="1.0" encoding="UTF-8"?>
+<svg xmlns="http://www.w3.org/2000/svg" xmlns:xlink="http://www.w3.org/1999/xlink" width="{w}" height="{h}">
+  <image width="{w}" height="{h}" xlink:href="data:image/png;base64,{b64}"/>
+</svg>'''
+
+
+def svg_text(image):
+    """Vector SVG for image (see SVG_MODE)."""
+    if SVG_MODE == "color":
+        try:
+            svg = vectorize.to_svg(image)
+            if "<path" in svg:
+                return svg
+            print("[LogoExport] Color tracing found no shapes, tracing with potrace")
+        except ImportError:
+            print("[LogoExport] OpenCV not available, tracing with potrace")
+    return _potrace_svg(image)
+
+
+def _potrace_svg(image):
+    """Trace a 1-bit threshold with potrace over stdin/stdout (no temp files)."""
+    bw = image.convert("L").point(lambda x: 0 if x < 128 else 255, "1")
+    try:
+        result = subprocess.run(
+            ["potrace", "-s", "-o", "-", "-"],
+            input=_encode(bw, "BMP"), check=True, capture_output=True,
+        )
+        return result.stdout.decode()
+    except (FileNotFoundError, subprocess.CalledProcessError):
+        print("[LogoExport] potrace not found, creating embedded SVG")
+        return _embedded_svg(image)
 
 
-def _ensure_dir():
-    os.makedirs(OUT_DIR, exist_ok=True)
+def pdf_bytes(image):
+    rgb = image.convert("RGB")
+    try:
+        import img2pdf
+        return img2pdf.convert(png_bytes(rgb))
+    except ImportError:
+        # Fallback using Pillow
+        return _encode(rgb, "PDF")
 
 
 def export_png(image, scale=1):
     """Export as PNG with optional scale multiplier."""
     if image is None:
         return None
-    _ensure_dir()
-    if scale != 1:
-        w, h = image.size
-        image = image.resize((int(w * scale), int(h * scale)), Image.LANCZOS)
-    ts = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-    path = os.path.join(OUT_DIR, f"logo_{ts}_{scale}x.png")
-    image.save(path, "PNG")
-    return path
+    path = output.allocate(OUT_SUBDIR, "logo", "png", f"{output.new_id()}_{scale}x")
+    return output.write_bytes(path, png_bytes(image, scale))
 
 
 def export_jpg(image, quality=95):
     """Export as JPG."""
     if image is None:
         return None
-    _ensure_dir()
-    rgb = image.convert("RGB")
-    ts = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-    path = os.path.join(OUT_DIR, f"logo_{ts}.jpg")
-    rgb.save(path, "JPEG", quality=quality)
-    return path
+    return output.write_bytes(output.allocate(OUT_SUBDIR, "logo", "jpg"), jpg_bytes(image, quality))
 
 
 def export_svg(image):
-    """Export as SVG using potrace (raster-to-vector)."""
+    """Export as SVG (raster-to-vector, see SVG_MODE)."""
     if image is None:
         return None
-    _ensure_dir()
-    ts = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-
-    # Convert to BMP for potrace
-    bw = image.convert("L").point(lambda x: 0 if x < 128 else 255, "1")
-    with tempfile.NamedTemporaryFile(suffix=".bmp", delete=False) as tmp:
-        bw.save(tmp.name, "BMP")
-        bmp_path = tmp.name
-
-    svg_path = os.path.join(OUT_DIR, f"logo_{ts}.svg")
-
-    try:
-        subprocess.run(
-            ["potrace", bmp_path, "-s", "-o", svg_path],
-            check=True, capture_output=True
-        )
-    except (FileNotFoundError, subprocess.CalledProcessError):
-        # Fallback: create simple SVG with embedded image
-        print("[LogoExport] potrace not found, creating embedded SVG")
-        buf = io.BytesIO()
-        image.save(buf, format="PNG")
-        import base64
-        b64 = base64.b64encode(buf.getvalue()).decode()
-        w, h = image.size
-        svg_content = f'''<?xml version="1.0" encoding="UTF-8"?>
-<svg xmlns="http://www.w3.org/2000/svg" xmlns:xlink="http://www.w3.org/1999/xlink" width="{w}" height="{h}">
-  <image width="{w}" height="{h}" xlink:href="data:image/png;base64,{b64}"/>
-</svg>'''
-        with open(svg_path, "w") as f:
-            f.write(svg_content)
-    finally:
-        os.unlink(bmp_path)
-
-    return svg_path
+    return output.write_text(output.allocate(OUT_SUBDIR, "logo", "svg"), svg_text(image))
 
 
 def export_pdf(image):
     """Export as PDF."""
     if image is None:
         return None
-    _ensure_dir()
-    ts = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-    pdf_path = os.path.join(OUT_DIR, f"logo_{ts}.pdf")
+    return output.write_bytes(output.allocate(OUT_SUBDIR, "logo", "pdf"), pdf_bytes(image))
 
-    try:
-        import img2pdf
-        rgb = image.convert("RGB")
-        buf = io.BytesIO()
-        rgb.save(buf, format="PNG")
-        buf.seek(0)
-        with open(pdf_path, "wb") as f:
-            f.write(img2pdf.convert(buf))
-    except ImportError:
-        # Fallback using Pillow
-        rgb = image.convert("RGB")
-        rgb.save(pdf_path, "PDF")
 
-    return pdf_path
+def _pack_members(image, scaled=None):
+    """(archive name, function producing the member's bytes) for a logo pack."""
+    scaled = scaled or _Scaled(image)
+    members = [(f"png/logo_{scale}x.png", lambda s=scale: png_bytes(scaled(s))) for scale in PACK_SCALES]
+    members += [
+        ("jpg/logo.jpg", lambda: jpg_bytes(image)),
+        ("svg/logo.svg", lambda: svg_text(image).encode()),
+        ("pdf/logo.pdf", lambda: pdf_bytes(image)),
+    ]
+    return members
+
+
+class _ChunkSink:
+    """Write-only, unseekable file object collecting what ZipFile writes.
+
+    ZipFile falls back to streaming mode (data descriptors after each member)
+    when it can't seek, so the archive can be sent while it is being built.
+    """
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data, self.chunks = b"".join(self.chunks), []
+        return data
+
+
+def stream_logo_pack(image):
+    """Yield the logo pack ZIP as byte chunks while it is being built.
+
+    All formats are encoded in parallel in memory; each member is written to
+    the archive (and yielded) as soon as it and the ones before it are done.
+    """
+    image.load()
+    sink = _ChunkSink()
+    with ThreadPoolExecutor(max_workers=PACK_WORKERS) as pool:
+        futures = [(name, pool.submit(fn)) for name, fn in _pack_members(image)]
+        with zipfile.ZipFile(sink, "w", zipfile.ZIP_DEFLATED) as zf:
+            for name, future in futures:
+                # PNG/JPG/PDF are already compressed; deflating them again only costs time
+                compress = zipfile.ZIP_DEFLATED if name.endswith(".svg") else zipfile.ZIP_STORED
+                zf.writestr(name, future.result(), compress_type=compress)
+                yield sink.drain()
+        yield sink.drain()
 
 
 def export_logo_pack(image):
     """Export complete logo pack as ZIP with all formats + sizes."""
     if image is None:
         return None
-    _ensure_dir()
-    ts = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-    zip_path = os.path.join(OUT_DIR, f"logo_pack_{ts}.zip")
-
-    with zipfile.ZipFile(zip_path, "w", zipfile.ZIP_DEFLATED) as zf:
-        # PNG at multiple scales
-        for scale in [1, 2, 4]:
-            w, h = image.size
-            scaled = image.resize((w * scale, h * scale), Image.LANCZOS)
-            buf = io.BytesIO()
-            scaled.save(buf, "PNG")
-            zf.writestr(f"png/logo_{scale}x.png", buf.getvalue())
-
-        # JPG
-        rgb = image.convert("RGB")
-        buf = io.BytesIO()
-        rgb.save(buf, "JPEG", quality=95)
-        zf.writestr("jpg/logo.jpg", buf.getvalue())
-
-        # SVG
-        svg_path = export_svg(image)
-        if svg_path and os.path.exists(svg_path):
-            zf.write(svg_path, "svg/logo.svg")
-            os.unlink(svg_path)
-
-        # PDF
-        pdf_path = export_pdf(image)
-        if pdf_path and os.path.exists(pdf_path):
-            zf.write(pdf_path, "pdf/logo.pdf")
-            os.unlink(pdf_path)
+    zip_path = output.allocate(OUT_SUBDIR, "logo_pack", "zip")
+
+    with output.writing(zip_path) as tmp, open(tmp, "wb") as f:
+        for chunk in stream_logo_pack(image):
+            f.write(chunk)
 
     print(f"[LogoExport] Logo pack saved to {zip_path}")
     return zip_path
 
 
+def _batch_sources(sources):
+    """Expand folders in sources to the image files inside them, each file once."""
+    paths = []
+    for src in sources:
+        if os.path.isdir(src):
+            paths += sorted(
+                os.path.join(src, name) for name in os.listdir(src)
+                if name.lower().endswith(BATCH_EXTS)
+            )
+        elif os.path.isfile(src):
+            paths.append(src)
+    # A file given directly and again through its folder is packed once
+    seen = set()
+    unique = []
+    for path in paths:
+        real = os.path.realpath(path)
+        if real not in seen:
+            seen.add(real)
+            unique.append(path)
+    return unique
+
+
+def _batch_pack(path):
+    """Process-pool worker: every pack member for one image file, in memory.
+
+    Each resize is computed once and reused by every member that needs that
+    scale. Returns (manifest entry, [(archive name, bytes)]).
+    """
+    try:
+        with Image.open(path) as image:
+            image.load()
+            files = [(name, fn()) for name, fn in _pack_members(image, _Scaled(image))]
+    except Exception as e:
+        return {"source": path, "error": str(e)}, []
+    entry = {
+        "source": path,
+        "size": list(image.size),
+        "files": [
+            {"name": name, "bytes": len(data), "sha256": hashlib.sha256(data).hexdigest()}
+            for name, data in files
+        ],
+    }
+    return entry, files
+
+
+def export_logo_batch(sources, progress=None):
+    """Export logo packs for many images into one ZIP with a manifest.json.
+
+    sources are image files and/or folders of images. Images are processed
+    in parallel across BATCH_WORKERS processes; each gets a folder named
+    after its file in the archive. progress(done, total) is called after each.
+    """
+    paths = _batch_sources(sources or [])
+    if not paths:
+        return None
+    zip_path = output.allocate(OUT_SUBDIR, "logo_batch", "zip")
+
+    # Disambiguate folder names of files that share a name; a suffixed name
+    # can itself be a real file's stem, so check against every name taken
+    folders, used = [], set()
+    for path in paths:
+        stem = os.path.splitext(os.path.basename(path))[0]
+        folder, n = stem, 2
+        while folder in used:
+            folder, n = f"{stem}_{n}", n + 1
+        used.add(folder)
+        folders.append(folder)
+
+    manifest = {
+        "created": datetime.datetime.now().isoformat(timespec="seconds"),
+        "count": len(paths),
+        "items": [],
+    }
+    with output.writing(zip_path) as tmp, zipfile.ZipFile(tmp, "w", zipfile.ZIP_DEFLATED) as zf:
+        with ProcessPoolExecutor(max_workers=BATCH_WORKERS, mp_context=multiprocessing.get_context("spawn")) as pool:
+            # map keeps input order, so the archive layout is deterministic
+            for i, (folder, (entry, files)) in enumerate(zip(folders, pool.map(_batch_pack, paths))):
+                for name, data in files:
+                    compress = zipfile.ZIP_DEFLATED if name.endswith(".svg") else zipfile.ZIP_STORED
+                    zf.writestr(f"{folder}/{name}", data, compress_type=compress)
+                entry["folder"] = folder
+                manifest["items"].append(entry)
+                if entry.get("error"):
+                    print(f"[LogoExport] Skipped {entry['source']}: {entry['error']}")
+                if progress:
+                    progress(i + 1, len(paths))
+        zf.writestr("manifest.json", json.dumps(manifest, indent=2))
+
+    failed = sum(1 for item in manifest["items"] if item.get("error"))
+    print(f"[LogoExport] Batch of {len(paths) - failed} logo packs saved to {zip_path}")
+    return zip_path
+
+
 def export_image(image, fmt="PNG"):
     """Export image in specified format. Returns file path."""
     fmt = fmt.upper()
@@ -0,0 +1,184 @@
+import numpy as np
+
+# Beat-aligned loop finding: an onset envelope (spectral flux) gives the
+# tempo by FFT autocorrelation and the beat phase by comb matching. The loop
+# is a power-of-two number of bars starting on a beat, its end nudged to the
+# sample where the waveform best matches the start, and the seam crossfaded
+# with the audio just before the loop start. Everything is vectorized numpy,
+# O(n log n) in the audio length.
+FRAME = 2048
+HOP = 512
+MIN_BPM = 60
+MAX_BPM = 200
+# Log-normal tempo prior (centre, width in octaves) against double/half-tempo picks
+PRIOR_BPM = 120
+PRIOR_OCTAVES = 1.0
+# Onsets halfway between the picked beats this strong (relative to those on
+# them) mean the pick was a two-beat pattern (kick/snare), not the beat itself
+OFFBEAT_RATIO = 0.1
+BEATS_PER_BAR = 4
+# Below this autocorrelation peak the audio isn't rhythmic enough to trust
+MIN_CONFIDENCE = 0.15
+# How far (ms) the loop end may move to line the waveform up with the start
+SEAM_SEARCH_MS = 15
+SEAM_WINDOW = 2048
+CROSSFADE_MS = 40
+
+
+def onset_envelope(audio, sample_rate, frame=FRAME, hop=HOP):
+    """Spectral-flux onset strength per hop; returns (envelope, frames per second)."""
+    audio = np.asarray(audio, dtype=np.float32)
+    # Centre frames on multiples of hop
+    padded = np.pad(audio, (frame // 2, frame // 2))
+    if len(padded) < frame:
+        return np.zeros(1, dtype=np.float32), sample_rate / hop
+    frames = np.lib.stride_tricks.sliding_window_view(padded, frame)[::hop]
+    mag = np.abs(np.fft.rfft(frames * np.hanning(frame).astype(np.float32), axis=1))
+    log_mag = np.log1p(100 * mag)
+    flux = np.maximum(np.diff(log_mag, axis=0, prepend=log_mag[:1]), 0).sum(axis=1)
+    return flux.astype(np.float32), sample_rate / hop
+
+
+def _autocorrelation(x):
+    """Normalized autocorrelation of x for lags 0..len(x)-1, via FFT."""
+    x = x - x.mean()
+    n = len(x)
+    spectrum = np.fft.rfft(x, 2 * n)
+    ac = np.fft.irfft(spectrum * np.conj(spectrum))[:n]
+    return ac / ac[0] if ac[0] > 0 else ac
+
+
+def estimate_tempo(envelope, rate, min_bpm=MIN_BPM, max_bpm=MAX_BPM):
+    """(bpm, confidence) from the onset envelope; confidence is the autocorrelation peak."""
+    ac = _autocorrelation(envelope)
+    lo = max(1, int(rate * 60 / max_bpm))
+    hi = min(len(ac) - 2, int(rate * 60 / min_bpm) + 1)
+    if hi <= lo:
+        return None, 0.0
+    lags = np.arange(lo, hi + 1)
+    bpms = 60 * rate / lags
+    prior = np.exp(-0.5 * (np.log2(bpms / PRIOR_BPM) / PRIOR_OCTAVES) ** 2)
+    best = lags[np.argmax(ac[lags] * prior)]
+    # Parabolic interpolation for a sub-frame period
+    a, b, c = ac[best - 1], ac[best], ac[best + 1]
+    denom = a - 2 * b + c
+    shift = 0.5 * (a - c) / denom if denom else 0.0
+    period = best + shift
+    if period / 2 >= lo and _offbeat_ratio(envelope, period) >= OFFBEAT_RATIO:
+        period /= 2
+    return 60 * rate / period, float(b)
+
+
+def _offbeat_ratio(envelope, period):
+    """Mean onset strength halfway between beats relative to that on the beats."""
+    strength = envelope - np.median(envelope)
+    beats = np.arange(beat_phase(envelope, period), len(envelope) - period, period)
+    if len(beats) == 0:
+        return 0.0
+    on = strength[np.rint(beats).astype(int)].mean()
+    off = strength[np.rint(beats + period / 2).astype(int)].mean()
+    return float(off / on) if on > 0 else 0.0
+
+
+def _refine_lag(envelope, lag, radius):
+    """Autocorrelation peak within radius of lag, to sub-frame precision.
+
+    A tempo error of a fraction of a percent adds up to tens of ms over a
+    multi-bar loop; measuring the whole loop length directly avoids that.
+    """
+    ac = _autocorrelation(envelope)
+    lo = max(1, int(lag - radius))
+    hi = min(len(ac) - 2, int(lag + radius) + 1)
+    if hi <= lo:
+        return lag
+    best = lo + int(np.argmax(ac[lo:hi + 1]))
+    a, b, c = ac[best - 1], ac[best], ac[best + 1]
+    denom = a - 2 * b + c
+    return best + (0.5 * (a - c) / denom if denom else 0.0)
+
+
+def beat_phase(envelope, period):
+    """Offset (in envelope frames, < period) of the beat grid best matching the onsets."""
+    offsets = np.arange(max(1, int(period)))
+    count = max(1, int((len(envelope) - 1 - offsets[-1]) // period) + 1)
+    idx = np.rint(offsets[:, None] + np.arange(count)[None, :] * period).astype(int)
+    idx = np.minimum(idx, len(envelope) - 1)
+    return int(offsets[np.argmax(envelope[idx].sum(axis=1))])
+
+
+def _seam_shift(audio, start, end, search, window=SEAM_WINDOW):
+    """Shift in [-search, search] for end that best matches the waveform at start.
+
+    Normalized cross-correlation of the window after start against the region
+    around end, computed with one FFT correlation.
+    """
+    window = min(window, len(audio) - end - search, len(audio) - start)
+    if window <= 0 or end - search < 0:
+        return 0
+    template = audio[start:start + window]
+    region = audio[end - search:end + search + window]
+    n = len(region) + len(template)
+    corr = np.fft.irfft(np.fft.rfft(region, n) * np.conj(np.fft.rfft(template, n)), n)[:2 * search + 1]
+    energy = np.cumsum(np.concatenate([[0.0], region.astype(np.float64) ** 2]))
+    local = energy[window:window + 2 * search + 1] - energy[:2 * search + 1]
+    score = corr / (np.sqrt(local * np.dot(template, template)) + 1e-12)
+    return int(np.argmax(score)) - search
+
+
+def find_loop(audio, sample_rate, min_confidence=MIN_CONFIDENCE):
+    """(start, end, bpm) sample positions of a beat-aligned loop in mono audio,
+    or None if it isn't rhythmic enough."""
+    audio = np.asarray(audio, dtype=np.float32)
+    envelope, rate = onset_envelope(audio, sample_rate)
+    bpm, confidence = estimate_tempo(envelope, rate)
+    if bpm is None or confidence < min_confidence:
+        return None
+
+    period = 60 * rate / bpm
+    beat = 60 * sample_rate / bpm
+    first = beat_phase(envelope, period) * HOP
+    search = int(sample_rate * SEAM_SEARCH_MS / 1000)
+    # Leave room for the crossfade pre-roll and the seam search
+    pre_roll = int(sample_rate * CROSSFADE_MS / 1000)
+    while first < pre_roll:
+        first += beat
+
+    available = len(audio) - first - search - SEAM_WINDOW
+    bars = int(available // (beat * BEATS_PER_BAR))
+    if bars < 1:
+        return None
+    bars = 2 ** int(np.log2(bars))
+    lag = _refine_lag(envelope, bars * BEATS_PER_BAR * period, period / 4)
+    length = lag * HOP
+    bpm = 60 * rate * bars * BEATS_PER_BAR / lag
+
+    # Try each beat of the first bar as the start; keep the best-matching seam
+    best = None
+    for k in range(BEATS_PER_BAR):
+        start = int(round(first + k * beat))
+        end = int(round(start + length))
+        if end + search + SEAM_WINDOW > len(audio):
+            break
+        shift = _seam_shift(audio, start, end, search)
+        a = audio[start:start + SEAM_WINDOW]
+        b = audio[end + shift:end + shift + SEAM_WINDOW]
+        error = np.mean((a - b) ** 2) / (np.mean(a ** 2) + 1e-12)
+        if best is None or error < best[0]:
+            best = (error, start, end + shift)
+    if best is None:
+        return None
+    return best[1], best[2], bpm
+
+
+def crossfade_loop(audio, start, end, crossfade):
+    """audio[start:end] whose tail fades into the audio leading up to start.
+
+    Played on repeat, the jump from end back to start then lands exactly
+    where the faded-in material continues.
+    """
+    loop = np.array(audio[start:end], dtype=np.float32)
+    crossfade = min(crossfade, start, len(loop) // 2)
+    if crossfade > 0:
+        fade = np.linspace(0, 1, crossfade, dtype=np.float32)
+        loop[-crossfade:] = loop[-crossfade:] * (1 - fade) + audio[start - crossfade:start] * fade
+    return loop
@@ -0,0 +1,160 @@
+import os
+import re
+import glob
+import collections
+
+LORA_DIR = os.path.expanduser("~/CreationStudio/ComfyUI/models/loras")
+
+# Fused mode keeps this many recently used LoRA combinations as ready-made
+# weight sets on the pipeline's device, so switching back to one is a tensor
+# copy instead of a reload + fuse. Each entry costs roughly the size of the
+# layers the LoRAs touch (a few hundred MB for typical SDXL LoRAs in fp16).
+FUSED_CACHE_SIZE = 2
+
+_COMPONENTS = ("unet", "text_encoder", "text_encoder_2")
+
+
+def get_loras():
+    """LoRA file names available in LORA_DIR."""
+    return sorted(os.path.basename(p) for p in glob.glob(os.path.join(LORA_DIR, "*.safetensors")))
+
+
+def find_lora(keyword):
+    """Path of the first LoRA whose file name contains keyword, or None."""
+    for name in get_loras():
+        if keyword in name.lower():
+            return os.path.join(LORA_DIR, name)
+    return None
+
+
+def adapter_name(lora_name):
+    # PEFT adapter names end up in module attribute paths, so no dots
+    return re.sub(r"[^0-9A-Za-z_]", "_", os.path.splitext(lora_name)[0])
+
+
+class _State:
+    """Per-pipeline LoRA bookkeeping, stored on the pipeline object."""
+
+    def __init__(self):
+        self.loaded = set()       # adapters currently injected as PEFT layers
+        self.fused = None         # combo whose weights are merged into the base
+        self.base = {}            # (component, module path) -> original weight
+        self.cache = collections.OrderedDict()  # combo -> {(component, path): fused weight}
+
+
+def _state(pipe):
+    if not hasattr(pipe, "_studio_lora"):
+        pipe._studio_lora = _State()
+    return pipe._studio_lora
+
+
+def _weight(pipe, component, path):
+    module = getattr(pipe, component).get_submodule(path)
+    # With PEFT layers injected the original Linear/Conv sits under base_layer
+    return module.base_layer.weight if hasattr(module, "base_layer") else module.weight
+
+
+def _lora_modules(pipe):
+    """(component, path) of every layer wrapped by a PEFT LoRA layer."""
+    found = []
+    for component in _COMPONENTS:
+        model = getattr(pipe, component, None)
+        if model is None:
+            continue
+        for path, module in model.named_modules():
+            if hasattr(module, "base_layer") and hasattr(module, "lora_A"):
+                found.append((component, path))
+    return found
+
+
+def _load_adapters(pipe, selection):
+    state = _state(pipe)
+    for name, _ in selection:
+        adapter = adapter_name(name)
+        if adapter not in state.loaded:
+            print(f"[LoRA] Loading {name}...")
+            pipe.load_lora_weights(os.path.join(LORA_DIR, name), adapter_name=adapter)
+            state.loaded.add(adapter)
+
+
+def _restore_base(pipe):
+    """Undo whatever fused combination is merged into the base weights."""
+    import torch
+
+    state = _state(pipe)
+    if state.fused is None:
+        return
+    with torch.no_grad():
+        for (component, path), weight in state.base.items():
+            _weight(pipe, component, path).copy_(weight)
+    state.fused = None
+
+
+def _fuse(pipe, selection, combo):
+    """Merge a combination into the base weights and drop the PEFT layers."""
+    import torch
+
+    state = _state(pipe)
+    _load_adapters(pipe, selection)
+    names = [adapter_name(n) for n, _ in selection]
+    pipe.enable_lora()
+    pipe.set_adapters(names, adapter_weights=[w for _, w in selection])
+
+    targets = _lora_modules(pipe)
+    with torch.no_grad():
+        for key in targets:
+            if key not in state.base:
+                state.base[key] = _weight(pipe, *key).detach().clone()
+
+    pipe.fuse_lora(adapter_names=names, lora_scale=1.0)
+    # Unloading keeps the merged weights and removes the LoRA layers, so
+    # inference has zero adapter overhead
+    pipe.unload_lora_weights()
+    state.loaded.clear()
+    state.fused = combo
+
+    with torch.no_grad():
+        state.cache[combo] = {key: _weight(pipe, *key).detach().clone() for key in targets}
+    while len(state.cache) > FUSED_CACHE_SIZE:
+        state.cache.popitem(last=False)
+
+
+def apply(pipe, selection, fuse=False):
+    """Configure pipe for a LoRA selection without reloading the base model.
+
+    selection is a list of (lora file name, weight). Unfused, adapters are
+    loaded once and switched with set_adapters. Fused, the combination is
+    merged into the weights; recently fused combinations come from a cache.
+    """
+    import torch
+
+    state = _state(pipe)
+    selection = [(n, float(w)) for n, w in selection if w]
+    combo = tuple(sorted(selection))
+
+    if fuse and combo:
+        if state.fused == combo:
+            return
+        _restore_base(pipe)
+        if combo in state.cache:
+            state.cache.move_to_end(combo)
+            # Adapters left by an unfused selection would add on top of the fused weights
+            if state.loaded:
+                pipe.unload_lora_weights()
+                state.loaded.clear()
+            with torch.no_grad():
+                for (component, path), weight in state.cache[combo].items():
+                    _weight(pipe, component, path).copy_(weight)
+            state.fused = combo
+            return
+        _fuse(pipe, selection, combo)
+        return
+
+    _restore_base(pipe)
+    if not combo:
+        if state.loaded:
+            pipe.disable_lora()
+        return
+    _load_adapters(pipe, selection)
+    pipe.enable_lora()
+    pipe.set_adapters([adapter_name(n) for n, _ in selection], adapter_weights=[w for _, w in selection])
@@ -0,0 +1,121 @@
+import os
+import json
+import zlib
+import struct
+from . import output
+
+OUT_DIR = os.path.expanduser("~/CreationStudio/outputs")
+CATALOG_PATH = os.path.join(OUT_DIR, "catalog.json")
+
+# Generation parameters travel with the files: PNGs carry them as a JSON
+# tEXt chunk under PNG_KEY, everything else as a "<file>.json" sidecar
+PNG_KEY = "parameters"
+SIDECAR_EXT = ".json"
+VERSION = 1
+
+_PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+_MEDIA_EXTS = {".png", ".jpg", ".jpeg", ".webp", ".wav", ".mp3", ".ogg", ".mp4", ".gif", ".webm"}
+
+
+def make_record(kind, **params):
+    """Parameter record for one output; kind names the generator (image, audio, ...)."""
+    return {"kind": kind, "version": VERSION, **params}
+
+
+def png_info(record):
+    """PngInfo carrying record, for image.save(path, pnginfo=...)."""
+    from PIL.PngImagePlugin import PngInfo
+
+    info = PngInfo()
+    info.add_text(PNG_KEY, json.dumps(record))
+    return info
+
+
+def save_image(image, path, record):
+    """Save an image output in the background with its parameters attached.
+
+    PNGs embed the record; other formats (WebP) get a sidecar.
+    """
+    if path.lower().endswith(".png"):
+        return output.save_image_async(image, path, pnginfo=png_info(record))
+    write_sidecar(path, record)
+    return output.save_image_async(image, path)
+
+
+def write_sidecar(path, record):
+    output.write_text(path + SIDECAR_EXT, json.dumps(record, indent=2))
+
+
+def read_png_text(path):
+    """Text chunks of a PNG, read without touching the pixel data.
+
+    Walks the chunk list and stops at the first IDAT, so the cost is a few
+    small reads regardless of the image size.
+    """
+    texts = {}
+    with open(path, "rb") as f:
+        if f.read(8) != _PNG_SIGNATURE:
+            return texts
+        while True:
+            header = f.read(8)
+            if len(header) < 8:
+                break
+            length, ctype = struct.unpack(">I4s", header)
+            if ctype in (b"IDAT", b"IEND"):
+                break
+            if ctype not in (b"tEXt", b"zTXt", b"iTXt"):
+                f.seek(length + 4, os.SEEK_CUR)  # skip data + CRC
+                continue
+            data = f.read(length)
+            f.seek(4, os.SEEK_CUR)
+            key, _, rest = data.partition(b"\0")
+            try:
+                if ctype == b"tEXt":
+                    value = rest.decode("latin-1")
+                elif ctype == b"zTXt":
+                    value = zlib.decompress(rest[1:]).decode("latin-1")
+                else:
+                    # iTXt: compression flag, method, language\0, translated keyword\0, text
+                    compressed, rest = rest[0], rest[2:]
+                    rest = rest.split(b"\0", 2)[2]
+                    value = (zlib.decompress(rest) if compressed else rest).decode("utf-8")
+            except (zlib.error, UnicodeDecodeError, IndexError):
+                continue
+            texts[key.decode("latin-1")] = value
+    return texts
+
+
+def recall(path):
+    """Generation parameters stored with an output file, or None."""
+    try:
+        if path.lower().endswith(".png"):
+            raw = read_png_text(path).get(PNG_KEY)
+            return json.loads(raw) if raw else None
+        if os.path.exists(path + SIDECAR_EXT):
+            with open(path + SIDECAR_EXT) as f:
+                return json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"[Metadata] Could not read parameters from {path}: {e}")
+    return None
+
+
+def rebuild_catalog(out_dir=OUT_DIR, path=CATALOG_PATH):
+    """Rescan out_dir and rewrite the catalog from the files' own metadata."""
+    entries = []
+    for root, dirs, files in os.walk(out_dir):
+        # Skip the result cache and other internal folders
+        dirs[:] = [d for d in dirs if not d.startswith(".")]
+        for name in files:
+            full = os.path.join(root, name)
+            if os.path.splitext(name)[1].lower() not in _MEDIA_EXTS:
+                continue
+            record = recall(full)
+            if record is None:
+                continue
+            entries.append({"path": full, "mtime": os.path.getmtime(full), **record})
+    entries.sort(key=lambda e: e["mtime"], reverse=True)
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    output.write_text(path, json.dumps(entries, indent=2))
+    print(f"[Metadata] Catalog rebuilt: {len(entries)} entries")
+    return entries
@@ -0,0 +1,300 @@
+import os
+import time
+import uuid
+import atexit
+import shutil
+import datetime
+import threading
+import contextlib
+from concurrent.futures import ThreadPoolExecutor
+
+OUT_DIR = os.path.expanduser("~/CreationStudio/outputs")
+# Files are written here first and renamed into place, so the gallery never
+# sees a half-written output. It must be on the same filesystem as OUT_DIR.
+TMP_DIR = os.path.join(OUT_DIR, ".tmp")
+# Leftovers from a crash older than this are removed on first use
+STALE_TMP_SECONDS = 24 * 3600
+
+# When written outputs are forced to disk (STUDIO_FSYNC):
+#   always - fsync each file and its directory before returning (safest, slowest)
+#   batch  - a background thread fsyncs everything written in the last
+#            FSYNC_INTERVAL seconds in one pass, so batch jobs don't wait on syncs
+#   never  - leave it to the OS
+FSYNC = os.environ.get("STUDIO_FSYNC", "batch")
+FSYNC_INTERVAL = 2.0
+
+# Image encoding. Finished images are saved by SAVE_WORKERS background threads
+# so the UI gets the image as soon as it exists in memory.
+#   STUDIO_IMAGE_FORMAT  png (default) or webp (lossless) for saved images
+#   STUDIO_PNG_COMPRESS  zlib level 0-9; Pillow's default 6 is slower than 1
+#                        for files under 10% smaller
+# Intermediates nobody views directly (the result cache) use lossless WebP at
+# the lowest effort: faster than PNG level 1 and about as small. Higher WebP
+# efforts cost 10x+ for a few percent (see benchmarks/bench_encode.py).
+SAVE_WORKERS = 2
+IMAGE_FORMAT = os.environ.get("STUDIO_IMAGE_FORMAT", "png").lower()
+PNG_COMPRESS_LEVEL = int(os.environ.get("STUDIO_PNG_COMPRESS", "1"))
+WEBP_METHOD = 0  # lossless WebP effort, 0 (fast) - 6 (small)
+
+_id_lock = threading.Lock()
+_reserved = set()
+_tmp_ready = False
+
+_pending = set()
+_pending_lock = threading.Lock()
+_flusher = None
+
+_save_pool = None
+_save_pool_lock = threading.Lock()
+_pending_saves = set()
+_stats = {}  # format -> [count, seconds, bytes]
+_stats_lock = threading.Lock()
+
+
+def new_id():
+    """Sortable, collision-free output ID: timestamp plus a random suffix."""
+    ts = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+    return f"{ts}_{uuid.uuid4().hex[:6]}"
+
+
+def allocate(subdir, prefix, ext, output_id=None):
+    """Reserve a unique path OUT_DIR/subdir/prefix_<id>.ext and create its folder.
+
+    The path stays reserved until writing() has finished with it (after that
+    the file on disk claims the name), so concurrent jobs never get the same
+    name even before either has written its file.
+    """
+    folder = os.path.join(OUT_DIR, subdir)
+    os.makedirs(folder, exist_ok=True)
+    with _id_lock:
+        while True:
+            path = os.path.join(folder, f"{prefix}_{output_id or new_id()}.{ext}")
+            if path not in _reserved and not os.path.exists(path):
+                _reserved.add(path)
+                return path
+            # An explicit ID that is taken falls back to a fresh one
+            output_id = None
+
+
+def sibling(path, ext):
+    """Same output with another extension (e.g. the MP3 next to a WAV)."""
+    return os.path.splitext(path)[0] + "." + ext
+
+
+def _prepare_tmp():
+    global _tmp_ready
+    os.makedirs(TMP_DIR, exist_ok=True)
+    if _tmp_ready:
+        return
+    _tmp_ready = True
+    cutoff = time.time() - STALE_TMP_SECONDS
+    for name in os.listdir(TMP_DIR):
+        tmp = os.path.join(TMP_DIR, name)
+        try:
+            if os.path.getmtime(tmp) < cutoff:
+                os.unlink(tmp)
+        except OSError:
+            pass
+
+
+def _fsync_path(path, directory=False):
+    flags = os.O_RDONLY | (getattr(os, "O_DIRECTORY", 0) if directory else 0)
+    try:
+        fd = os.open(path, flags)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        # Some platforms/filesystems can't fsync directories
+        pass
+    finally:
+        os.close(fd)
+
+
+def flush():
+    """fsync every file written since the last flush, then their directories."""
+    with _pending_lock:
+        paths = list(_pending)
+        _pending.clear()
+    if not paths:
+        return
+    for path in paths:
+        _fsync_path(path)
+    for directory in {os.path.dirname(p) for p in paths}:
+        _fsync_path(directory, directory=True)
+
+
+def _flush_loop():
+    while True:
+        time.sleep(FSYNC_INTERVAL)
+        flush()
+
+
+def _schedule_sync(path):
+    global _flusher
+    with _pending_lock:
+        _pending.add(path)
+        if _flusher is None:
+            _flusher = threading.Thread(target=_flush_loop, name="output-fsync", daemon=True)
+            _flusher.start()
+            atexit.register(flush)
+
+
+@contextlib.contextmanager
+def writing(path):
+    """Yield a temp path to write to; on success it atomically replaces path.
+
+    The temp file keeps path's extension so writers that infer the format
+    from it (Pillow, ffmpeg, pydub) behave the same. On error it is removed
+    and path is left untouched.
+    """
+    _prepare_tmp()
+    stem, ext = os.path.splitext(os.path.basename(path))
+    tmp = os.path.join(TMP_DIR, f"{stem}.{uuid.uuid4().hex[:8]}.partial{ext}")
+    try:
+        yield tmp
+        if FSYNC == "always":
+            _fsync_path(tmp)
+        os.replace(tmp, path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.unlink(tmp)
+        raise
+    finally:
+        with _id_lock:
+            _reserved.discard(path)
+    if FSYNC == "always":
+        _fsync_path(os.path.dirname(path), directory=True)
+    elif FSYNC == "batch":
+        _schedule_sync(path)
+
+
+def image_ext():
+    """Extension for saved images under the configured IMAGE_FORMAT."""
+    return "webp" if IMAGE_FORMAT == "webp" else "png"
+
+
+def intermediate_format():
+    """(Pillow format, extension) for cache-only images."""
+    from PIL import features
+
+    return ("WEBP", "webp") if features.check("webp") else ("PNG", "png")
+
+
+def _encoder_params(fmt):
+    if fmt == "PNG":
+        return {"compress_level": PNG_COMPRESS_LEVEL}
+    if fmt == "WEBP":
+        return {"lossless": True, "method": WEBP_METHOD}
+    return {}
+
+
+def encode_image(image, path, fmt=None, **params):
+    """image.save() with the configured encoder settings, timing the encode.
+
+    fmt defaults to the format path's extension implies; params (quality,
+    pnginfo, ...) override the defaults for that format.
+    """
+    from PIL import Image
+
+    if fmt is None:
+        Image.init()
+        fmt = Image.registered_extensions().get(os.path.splitext(path)[1].lower(), "PNG")
+    fmt = fmt.upper()
+    params = {**_encoder_params(fmt), **params}
+    start = time.perf_counter()
+    image.save(path, fmt, **params)
+    seconds = time.perf_counter() - start
+    with _stats_lock:
+        entry = _stats.setdefault(fmt, [0, 0.0, 0])
+        entry[0] += 1
+        entry[1] += seconds
+        entry[2] += os.path.getsize(path)
+
+
+def save_image(image, path, fmt=None, **params):
+    """Encode image to path atomically (see encode_image); returns path."""
+    with writing(path) as tmp:
+        encode_image(image, tmp, fmt, **params)
+    return path
+
+
+def _get_save_pool():
+    global _save_pool
+    with _save_pool_lock:
+        if _save_pool is None:
+            _save_pool = ThreadPoolExecutor(max_workers=SAVE_WORKERS, thread_name_prefix="output-save")
+        return _save_pool
+
+
+def save_image_async(image, path, fmt=None, **params):
+    """Queue save_image on the background pool and return its Future at once.
+
+    image must not be modified afterwards. Pending saves finish before the
+    interpreter exits.
+    """
+    def done(future):
+        with _pending_lock:
+            _pending_saves.discard(future)
+        if future.exception():
+            print(f"[Output] Saving {path} failed: {future.exception()}")
+
+    future = _get_save_pool().submit(save_image, image, path, fmt, **params)
+    with _pending_lock:
+        _pending_saves.add(future)
+    future.add_done_callback(done)
+    return future
+
+
+def wait_saves():
+    """Block until every queued background save has finished."""
+    with _pending_lock:
+        futures = list(_pending_saves)
+    for future in futures:
+        future.exception()
+
+
+def save_stats():
+    """Encode metrics per format, plus the background queue length."""
+    with _stats_lock:
+        formats = {
+            fmt: {
+                "count": count,
+                "mean_ms": round(seconds / count * 1000, 1),
+                "mb_per_s": round(nbytes / 2**20 / seconds, 1) if seconds else None,
+                "mean_kb": round(nbytes / count / 1024),
+            }
+            for fmt, (count, seconds, nbytes) in _stats.items()
+        }
+    with _pending_lock:
+        pending = len(_pending_saves)
+    return {"pending": pending, "formats": formats}
+
+
+def write_bytes(path, data):
+    with writing(path) as tmp:
+        with open(tmp, "wb") as f:
+            f.write(data)
+    return path
+
+
+def write_text(path, text):
+    with writing(path) as tmp:
+        with open(tmp, "w") as f:
+            f.write(text)
+    return path
+
+
+def write_wav(path, sample_rate, audio_int16):
+    import scipy.io.wavfile
+
+    with writing(path) as tmp:
+        scipy.io.wavfile.write(tmp, sample_rate, audio_int16)
+    return path
+
+
+def copy(src, path):
+    with writing(path) as tmp:
+        shutil.copyfile(src, tmp)
+    return path
@@ -0,0 +1,135 @@
+import os
+import json
+import time
+import threading
+
+STUDIO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# User manifest wins; the copy shipped with the repo is the fallback
+MANIFEST_PATHS = [
+    os.path.expanduser("~/CreationStudio/preload.json"),
+    os.path.join(STUDIO_ROOT, "preload.json"),
+]
+
+_status = {}
+_status_lock = threading.Lock()
+
+
+def _set_status(name, **fields):
+    with _status_lock:
+        _status.setdefault(name, {}).update(fields)
+
+
+def status():
+    """Snapshot of per-model readiness for the status endpoint."""
+    with _status_lock:
+        return {name: dict(entry) for name, entry in _status.items()}
+
+
+def load_manifest(path=None):
+    """Read the preload manifest. Returns a list of model entries."""
+    paths = [path] if path else MANIFEST_PATHS
+    for p in paths:
+        if p and os.path.exists(p):
+            with open(p) as f:
+                manifest = json.load(f)
+            print(f"[Preload] Using manifest {p}")
+            return [m for m in manifest.get("models", []) if m.get("enabled", True)]
+    return []
+
+
+def _preload_image(entry):
+    from . import image_gen, resources
+    model = entry.get("model", "default")
+    if model == "default":
+        model = image_gen.get_default_model()
+    pipe = image_gen.load_model(model)
+    if entry.get("warmup", True):
+        _set_status(entry["name"], state="warming")
+        # Like image_gen._run_batch: no batch runs meanwhile, and a claim on
+        # another preload thread can't move the pipe off its device mid-run
+        with image_gen._run_lock, resources.using("image"):
+            pipe(
+                prompt="warmup",
+                width=512,
+                height=512,
+                num_inference_steps=2,
+                output_type="latent",
+            )
+
+
+def _preload_audio(entry):
+    import torch
+    from . import audio_lab, resources
+    size = entry.get("model", "small")
+    processor, model = audio_lab.load_model(size)
+    if entry.get("warmup", True):
+        _set_status(entry["name"], state="warming")
+        with resources.using(f"musicgen-{size}"), torch.no_grad():
+            inputs = processor(text=["warmup"], padding=True, return_tensors="pt")
+            inputs = {k: v.to(model.device) for k, v in inputs.items()}
+            model.generate(**inputs, max_new_tokens=8)
+
+
+def _preload_voice(entry):
+    import torch
+    from . import resources, voice_gen
+    model, tokenizer = voice_gen.load_model()
+    if entry.get("warmup", True):
+        _set_status(entry["name"], state="warming")
+        with resources.using("voice"), torch.no_grad():
+            input_ids = tokenizer("A calm voice.", return_tensors="pt").input_ids.to(model.device)
+            prompt_ids = tokenizer("Hi.", return_tensors="pt").input_ids.to(model.device)
+            model.generate(input_ids=input_ids, prompt_input_ids=prompt_ids, max_new_tokens=16)
+
+
+def _preload_video(entry):
+    from . import resources, video_gen
+    pipe = video_gen.load_pipeline()
+    if entry.get("warmup", True):
+        _set_status(entry["name"], state="warming")
+        with resources.using("video"):
+            pipe(
+                prompt="warmup",
+                num_frames=5,
+                height=256,
+                width=256,
+                num_inference_steps=1,
+                output_type="latent",
+            )
+
+
+PRELOADERS = {
+    "image": _preload_image,
+    "audio": _preload_audio,
+    "voice": _preload_voice,
+    "video": _preload_video,
+}
+
+
+def _run(entry):
+    name = entry["name"]
+    start = time.time()
+    _set_status(name, state="loading", model=entry.get("model"), started=start)
+    try:
+        PRELOADERS[name](entry)
+        _set_status(name, state="ready", seconds=round(time.time() - start, 1))
+        print(f"[Preload] {name} ready in {time.time() - start:.1f}s")
+    except Exception as e:
+        _set_status(name, state="error", error=str(e), seconds=round(time.time() - start, 1))
+        print(f"[Preload] {name} failed: {e}")
+
+
+def start(path=None):
+    """Load every manifest model in its own daemon thread. Returns the threads."""
+    threads = []
+    for entry in load_manifest(path):
+        name = entry.get("name")
+        if name not in PRELOADERS:
+            print(f"[Preload] Unknown model '{name}' in manifest, skipping")
+            continue
+        _set_status(name, state="queued", model=entry.get("model"))
+        t = threading.Thread(target=_run, args=(entry,), name=f"preload-{name}", daemon=True)
+        t.start()
+        threads.append(t)
+    return threads
@@ -0,0 +1,292 @@
+import os
+import time
+import threading
+import contextlib
+
+# Models are placed on devices under a memory budget. Loaders hand their
+# model to claim(), which measures its weights, picks the accelerator with the
+# most room and, when none has enough, moves the least recently used idle
+# models to CPU (or unloads them) to make space. Generators wrap their run in
+# using(), which keeps the model from being evicted meanwhile and brings it
+# back from CPU if it was.
+#
+#   STUDIO_GPU_BUDGET  fraction of each accelerator's memory models may fill;
+#                      the rest is left for activations (default 0.75)
+#   STUDIO_CPU_BUDGET  fraction of system RAM for models parked on CPU (0.5)
+GPU_BUDGET = float(os.environ.get("STUDIO_GPU_BUDGET", "0.75"))
+CPU_BUDGET = float(os.environ.get("STUDIO_CPU_BUDGET", "0.5"))
+
+_lock = threading.RLock()
+_models = {}
+
+
+class _Model:
+    def __init__(self, name, obj, devices, unload, offload, parent, move, size):
+        self.name = name
+        self.obj = obj
+        self.devices = devices
+        self.unload = unload
+        self.offload = offload
+        self.parent = parent
+        self.move = move
+        self.bytes = size
+        self.device = None
+        self.in_use = 0
+        self.last_used = time.time()
+
+
+def _modules(obj):
+    import torch
+
+    if isinstance(obj, torch.nn.Module):
+        return [obj]
+    # diffusers pipelines
+    components = getattr(obj, "components", None) or {}
+    return [m for m in components.values() if isinstance(m, torch.nn.Module)]
+
+
+def footprint(obj, exclude=None):
+    """Bytes of parameters and buffers in obj (a module or a pipeline).
+
+    Tensors in exclude (another model's, for shared components) are skipped;
+    shared tensors are counted once.
+    """
+    seen = set(_tensor_ids(exclude)) if exclude is not None else set()
+    total = 0
+    for module in _modules(obj):
+        for tensor in (*module.parameters(), *module.buffers()):
+            if id(tensor) not in seen:
+                seen.add(id(tensor))
+                total += tensor.numel() * tensor.element_size()
+    return total
+
+
+def _tensor_ids(obj):
+    for module in _modules(obj):
+        for tensor in (*module.parameters(), *module.buffers()):
+            yield id(tensor)
+
+
+def _system_ram():
+    try:
+        return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+    except (ValueError, OSError, AttributeError):
+        return None
+
+
+def budget(device):
+    """Bytes of model weights allowed on device, or None for no limit."""
+    import torch
+
+    kind = device.split(":")[0]
+    if kind == "cuda":
+        index = int(device.split(":")[1]) if ":" in device else 0
+        return int(torch.cuda.get_device_properties(index).total_memory * GPU_BUDGET)
+    if kind == "mps":
+        # Unified memory: Metal's working-set limit is the closest to a GPU total
+        limit = getattr(torch.mps, "recommended_max_memory", None)
+        total = limit() if limit else _system_ram()
+        return int(total * GPU_BUDGET) if total else None
+    ram = _system_ram()
+    return int(ram * CPU_BUDGET) if ram else None
+
+
+def _used(device, skip=None):
+    return sum(m.bytes for m in _models.values() if m.device == device and m is not skip)
+
+
+def _free(device, skip=None):
+    limit = budget(device)
+    return float("inf") if limit is None else limit - _used(device, skip)
+
+
+def _evictable(device, keep):
+    """Idle models on device, least recently used first."""
+    candidates = [
+        m for m in _models.values()
+        if m.device == device and not m.in_use and m not in keep and m.parent not in keep
+    ]
+    return sorted(candidates, key=lambda m: m.last_used)
+
+
+def _children(entry):
+    return [m for m in _models.values() if m.parent is entry]
+
+
+def _drop(entry):
+    for child in _children(entry):
+        _drop(child)
+    _models.pop(entry.name, None)
+    entry.device = None
+    if entry.unload:
+        entry.unload()
+    entry.obj = None
+    print(f"[Resources] Unloaded {entry.name}")
+
+
+def _empty_cache(device):
+    import torch
+
+    if device.startswith("cuda"):
+        with torch.cuda.device(device):
+            torch.cuda.empty_cache()
+    elif device == "mps":
+        torch.mps.empty_cache()
+
+
+def _evict(entry, keep):
+    """Move entry off its device: to CPU when allowed and there is room, else unload."""
+    device = entry.device
+    # Children share the parent's weights, so they can't stay behind
+    for child in _children(entry):
+        _drop(child)
+    if entry.offload and device != "cpu" and _make_room("cpu", entry.bytes, keep | {entry}):
+        entry.move(entry.obj, "cpu")
+        entry.device = "cpu"
+        print(f"[Resources] Moved {entry.name} from {device} to cpu")
+    else:
+        _drop(entry)
+    _empty_cache(device)
+
+
+def _make_room(device, need, keep):
+    """Evict idle models from device until need bytes fit. Returns whether they do."""
+    for victim in _evictable(device, keep):
+        if _free(device) >= need:
+            break
+        _evict(victim, keep)
+    return _free(device) >= need
+
+
+def _place(entry):
+    """Pick a device for entry, evicting others if needed, and move it there."""
+    keep = {entry, entry.parent} - {None}
+    devices = [entry.parent.device] if entry.parent else entry.devices
+    fits = [d for d in devices if _free(d, entry) >= entry.bytes]
+    if fits:
+        device = max(fits, key=lambda d: _free(d, entry))
+    else:
+        # Where evicting idle models frees the most
+        device = max(devices, key=lambda d: _free(d, entry) + sum(m.bytes for m in _evictable(d, keep)))
+        if not _make_room(device, entry.bytes, keep):
+            print(f"[Resources] {entry.name} ({entry.bytes / 2**30:.1f} GB) is over the {device} budget")
+    if entry.device != device:
+        entry.move(entry.obj, device)
+        entry.device = device
+    return device
+
+
+def _to(obj, device):
+    obj.to(device)
+
+
+def claim(name, obj, devices=None, unload=None, offload=True, parent=None, move=None, size=None):
+    """Register obj under name, place it on one of devices and return the device.
+
+    devices are the candidates in order of preference (default: every
+    accelerator, see device.accelerators). unload() is called when the model
+    is dropped and should clear the owner's reference. offload=False unloads
+    instead of parking on CPU. A model with a parent shares its weights, is
+    placed on the parent's device and is unloaded along with it.
+    move(obj, device) relocates obj (default obj.to(device)); size overrides
+    the measured footprint (e.g. for pipelines with their own CPU offload).
+    """
+    from .device import accelerators
+
+    with _lock:
+        parent_entry = _models.get(parent) if parent else None
+        if name in _models and _models[name].obj is not obj:
+            _drop(_models[name])
+        entry = _models.get(name)
+        if entry is None:
+            if size is None:
+                size = footprint(obj, exclude=parent_entry.obj if parent_entry else None)
+            if parent_entry:
+                devices = [parent_entry.device]
+            entry = _Model(name, obj, devices or accelerators(), unload, offload,
+                           parent_entry, move or _to, size)
+            _models[name] = entry
+        entry.last_used = time.time()
+        device = _place(entry)
+        print(f"[Resources] {name} on {device} ({entry.bytes / 2**30:.2f} GB)")
+        return device
+
+
+def touch(name):
+    """Mark a model as just used, bringing it back if it was parked on CPU."""
+    with _lock:
+        entry = _models.get(name)
+        if entry is None:
+            return None
+        entry.last_used = time.time()
+        if entry.device == "cpu" and "cpu" not in entry.devices:
+            _place(entry)
+        return entry.device
+
+
+def device_of(name):
+    with _lock:
+        entry = _models.get(name)
+        return entry.device if entry else None
+
+
+@contextlib.contextmanager
+def using(name):
+    """Keep a model resident (and unevictable) for the duration of a run.
+
+    Yields the model's device, or None if name isn't registered.
+    """
+    with _lock:
+        entry = _models.get(name)
+        if entry:
+            entry.in_use += 1
+            touch(name)
+    try:
+        yield entry.device if entry else None
+    finally:
+        if entry:
+            with _lock:
+                entry.in_use -= 1
+                entry.last_used = time.time()
+
+
+def release(name):
+    """Unload a model now (e.g. a one-off pipeline that is done).
+
+    A model that is in use stays; returns whether it was unloaded.
+    """
+    with _lock:
+        entry = _models.get(name)
+        if entry is None or entry.in_use:
+            return False
+        device = entry.device
+        _drop(entry)
+        _empty_cache(device)
+        return True
+
+
+def status():
+    """Placement snapshot for the resources endpoint."""
+    from .device import accelerators
+
+    with _lock:
+        devices = sorted({*accelerators(), "cpu", *(m.device for m in _models.values())})
+        return {
+            "devices": {
+                d: {
+                    "budget_gb": None if budget(d) is None else round(budget(d) / 2**30, 2),
+                    "used_gb": round(_used(d) / 2**30, 2),
+                }
+                for d in devices
+            },
+            "models": {
+                m.name: {
+                    "device": m.device,
+                    "gb": round(m.bytes / 2**30, 2),
+                    "in_use": m.in_use,
+                    "idle_seconds": round(time.time() - m.last_used, 1),
+                    "parent": m.parent.name if m.parent else None,
+                }
+                for m in _models.values()
+            },
+        }
@@ -0,0 +1,290 @@
+import os
+import copy
+import random
+import threading
+import contextlib
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image
+from . import cache, image_gen, lora, metadata, output, resources
+from .jobs import batch_step_callback
+
+# Large-canvas mode (MultiDiffusion): every step the UNet denoises overlapping
+# TILE_SIZE px windows of the canvas latents, the noise predictions are blended
+# with feathered weights, and the scheduler steps the whole canvas at once.
+# UNet memory depends on the tile size only, so 4K+ canvases fit where a
+# direct pipeline call would not.
+TILE_SIZE = 1024
+TILE_OVERLAP = 256
+MAX_CANVAS = 8192
+
+# Spread each step's tiles over every CUDA device, with a UNet replica on
+# each extra GPU (costs one UNet of memory per GPU, registered with
+# studio.resources as "tiled:<device>")
+USE_ALL_GPUS = True
+
+_replicas = {}  # device -> UNet copy, for the model in _replica_model
+_replica_model = None
+_replica_lock = threading.Lock()
+
+
+def _tile_starts(length, tile, stride):
+    """Tile offsets covering [0, length), the last one flush with the edge."""
+    if length <= tile:
+        return [0]
+    starts = list(range(0, length - tile, stride))
+    return starts + [length - tile]
+
+
+def plan_tiles(width, height, tile_size=TILE_SIZE, overlap=TILE_OVERLAP):
+    """(top, left, height, width) of each tile, in latent pixels (1/8 scale)."""
+    lat_w, lat_h = width // 8, height // 8
+    tile = tile_size // 8
+    stride = max(1, (tile_size - overlap) // 8)
+    th, tw = min(tile, lat_h), min(tile, lat_w)
+    return [
+        (top, left, th, tw)
+        for top in _tile_starts(lat_h, th, stride)
+        for left in _tile_starts(lat_w, tw, stride)
+    ]
+
+
+def _tile_weights(th, tw, overlap, device, dtype):
+    """Weights ramping up across the overlap so seams blend instead of cutting."""
+    import torch
+
+    ramp = max(1, overlap // 8)
+
+    def axis(n):
+        i = torch.arange(n, device=device, dtype=torch.float32)
+        return torch.clamp(torch.minimum(i + 1, n - i) / ramp, max=1.0)
+
+    return torch.outer(axis(th), axis(tw)).to(dtype)[None, None]
+
+
+def tile_devices(primary):
+    """primary (the pipeline's device) first, then every other GPU if enabled."""
+    import torch
+
+    devices = [primary]
+    if USE_ALL_GPUS and primary.startswith("cuda"):
+        devices += [f"cuda:{i}" for i in range(torch.cuda.device_count()) if f"cuda:{i}" != primary]
+    return devices
+
+
+def _drop_replica(device):
+    # Called by resources when it needs the memory back
+    def unload():
+        _replicas.pop(device, None)
+    return unload
+
+
+def _unets(pipe, model_name, devices):
+    """device -> UNet; the pipeline's own UNet serves the first device."""
+    global _replica_model
+    with _replica_lock:
+        if _replica_model != model_name:
+            for device in list(_replicas):
+                resources.release(f"tiled:{device}")
+            _replicas.clear()
+            _replica_model = model_name
+        unets = {devices[0]: pipe.unet}
+        for device in devices[1:]:
+            if device not in _replicas:
+                print(f"[Tiled] Copying UNet to {device}...")
+                # Copy the uncompiled module; compiled graphs are device-specific
+                _replicas[device] = copy.deepcopy(getattr(pipe.unet, "_orig_mod", pipe.unet))
+                resources.claim(f"tiled:{device}", _replicas[device], devices=[device],
+                                unload=_drop_replica(device), offload=False)
+            unets[device] = _replicas[device]
+        return unets
+
+
+@contextlib.contextmanager
+def _holding(devices):
+    """Keep the replicas on devices from being evicted mid-render."""
+    with contextlib.ExitStack() as stack:
+        for device in devices:
+            stack.enter_context(resources.using(f"tiled:{device}"))
+        yield
+
+
+def _preview(latents):
+    import torch.nn.functional as F
+
+    # Previews of a huge canvas only need to be screen-sized
+    longest = max(latents.shape[-2:])
+    if longest > 128:
+        latents = F.interpolate(latents, scale_factor=128 / longest, mode="bilinear")
+    return image_gen.preview_latents(latents)
+
+
+def render(pipe, prompt, negative_prompt, width, height, steps, cfg, generator,
+           scheduler="Default", tile_size=TILE_SIZE, overlap=TILE_OVERLAP, model_name=None, job=None):
+    """Denoise a width x height canvas tile by tile and decode it to a PIL image."""
+    import torch
+
+    primary = pipe._execution_device
+    devices = tile_devices(str(primary))
+    do_cfg = cfg > 1
+    tiles = plan_tiles(width, height, tile_size, overlap)
+    unets = _unets(pipe, model_name, devices)
+    print(f"[Tiled] {width}x{height}: {len(tiles)} tiles of {tile_size}px on {', '.join(devices)}")
+
+    with torch.no_grad(), _holding(devices[1:]):
+        embeds, neg_embeds, pooled, neg_pooled = pipe.encode_prompt(
+            prompt=prompt,
+            negative_prompt=negative_prompt,
+            device=primary,
+            num_images_per_prompt=1,
+            do_classifier_free_guidance=do_cfg,
+        )
+        if do_cfg:
+            embeds = torch.cat([neg_embeds, embeds])
+            pooled = torch.cat([neg_pooled, pooled])
+        dtype = embeds.dtype
+        cond = {device: (embeds.to(device), pooled.to(device)) for device in devices}
+
+        weights, weight_sum = {}, torch.zeros((1, 1, height // 8, width // 8), device=primary, dtype=dtype)
+        for top, left, th, tw in tiles:
+            if (th, tw) not in weights:
+                weights[th, tw] = _tile_weights(th, tw, overlap, primary, dtype)
+            weight_sum[..., top:top + th, left:left + tw] += weights[th, tw]
+
+        def denoise(device, assigned, scaled, t):
+            emb, pool = cond[device]
+            out = []
+            for top, left, th, tw in assigned:
+                x = scaled[..., top:top + th, left:left + tw].to(device)
+                if do_cfg:
+                    x = torch.cat([x, x])
+                # SDXL micro-conditioning: the tile is a crop of the full canvas
+                time_ids = torch.tensor(
+                    [[height, width, top * 8, left * 8, th * 8, tw * 8]], device=device, dtype=dtype
+                ).repeat(x.shape[0], 1)
+                noise = unets[device](
+                    x, t.to(device),
+                    encoder_hidden_states=emb,
+                    added_cond_kwargs={"text_embeds": pool, "time_ids": time_ids},
+                ).sample
+                if do_cfg:
+                    uncond, text = noise.chunk(2)
+                    noise = uncond + cfg * (text - uncond)
+                out.append(((top, left, th, tw), noise.to(primary)))
+            return out
+
+        with image_gen.use_scheduler(pipe, scheduler):
+            sched = pipe.scheduler
+            sched.set_timesteps(steps, device=primary)
+            latents = torch.randn((1, 4, height // 8, width // 8), generator=generator, dtype=torch.float32)
+            latents = latents.to(primary, dtype) * sched.init_noise_sigma
+            callback = batch_step_callback([job], _preview)
+            if job:
+                job.start(steps)
+
+            pool_size = len(devices)
+            with ThreadPoolExecutor(max_workers=pool_size) if pool_size > 1 else contextlib.nullcontext() as executor:
+                for i, t in enumerate(sched.timesteps):
+                    # Input scaling is uniform over the canvas, so scale once and slice
+                    scaled = sched.scale_model_input(latents, t)
+                    shares = [(device, tiles[n::pool_size]) for n, device in enumerate(devices)]
+                    if executor is None:
+                        results = denoise(*shares[0], scaled, t)
+                    else:
+                        futures = [executor.submit(denoise, device, assigned, scaled, t) for device, assigned in shares]
+                        results = [r for f in futures for r in f.result()]
+
+                    noise_pred = torch.zeros_like(latents)
+                    for (top, left, th, tw), noise in results:
+                        noise_pred[..., top:top + th, left:left + tw] += noise * weights[th, tw]
+                    noise_pred /= weight_sum
+                    # One scheduler step over the whole canvas keeps multistep samplers consistent
+                    latents = sched.step(noise_pred, t, latents, generator=generator).prev_sample
+                    callback(pipe, i, t, {"latents": latents})
+
+        # VAE tiling (enabled in load_model) keeps the decode bounded too
+        vae = pipe.vae
+        upcast = vae.dtype == torch.float16 and vae.config.force_upcast
+        if upcast:
+            vae.to(dtype=torch.float32)
+        try:
+            decoded = vae.decode(latents.to(vae.dtype) / vae.config.scaling_factor, return_dict=False)[0]
+        finally:
+            if upcast:
+                vae.to(dtype=torch.float16)
+    return pipe.image_processor.postprocess(decoded, output_type="pil")[0]
+
+
+def generate(prompt, negative_prompt, model_name, width, height, steps, cfg, seed,
+             scheduler="Default", tile_size=TILE_SIZE, overlap=TILE_OVERLAP, job=None):
+    """Generate a large canvas (up to MAX_CANVAS px a side) with tiled denoising."""
+    import torch
+    from .device import cpu_autocast
+
+    width = min(MAX_CANVAS, max(512, int(width) // 64 * 64))
+    height = min(MAX_CANVAS, max(512, int(height) // 64 * 64))
+    tile_size, overlap = int(tile_size) // 64 * 64, int(overlap) // 8 * 8
+    steps, cfg = int(steps), float(cfg)
+    if overlap >= tile_size:
+        raise ValueError(f"Tile overlap ({overlap}px) must be smaller than the tile ({tile_size}px)")
+    spec = image_gen.SCHEDULERS.get(scheduler)
+    if spec and spec[2]:
+        raise ValueError(f"{scheduler} needs a LoRA, which large-canvas mode does not support")
+
+    key, image = None, None
+    if seed > 0:
+        key = cache.make_key(
+            "image",
+            prompt=prompt,
+            negative_prompt=negative_prompt,
+            model=cache.model_hash(os.path.join(image_gen.MODEL_DIR, model_name)),
+            width=width,
+            height=height,
+            steps=steps,
+            cfg=cfg,
+            seed=int(seed),
+            scheduler=scheduler,
+            tile_size=tile_size,
+            overlap=overlap,
+        )
+        hit = cache.lookup("image", key, output.intermediate_format()[1])
+        if hit:
+            # Skip only the rendering; a hit is still saved like a fresh canvas
+            image = Image.open(hit)
+            image.load()
+
+    seed = int(seed) if seed > 0 else random.randint(1, 2**31 - 1)
+    if image is None:
+        generator = torch.Generator(device="cpu").manual_seed(seed)
+        with image_gen._run_lock:
+            pipe = image_gen.load_model(model_name)
+            with resources.using("image") as device, cpu_autocast(device):
+                # Replicas are plain copies of the UNet, so run without adapters everywhere
+                lora.apply(pipe, [])
+                image = render(
+                    pipe, prompt, negative_prompt, width, height, steps, cfg, generator,
+                    scheduler=scheduler, tile_size=tile_size, overlap=overlap, model_name=model_name, job=job,
+                )
+        if key:
+            fmt, ext = output.intermediate_format()
+            cache.store("image", key, ext, lambda p: output.encode_image(image, p, fmt))
+
+    record = metadata.make_record(
+        "canvas",
+        prompt=prompt,
+        negative_prompt=negative_prompt,
+        model=model_name,
+        width=width,
+        height=height,
+        steps=steps,
+        cfg=cfg,
+        seed=seed,
+        scheduler=scheduler,
+        tile_size=tile_size,
+        overlap=overlap,
+    )
+
+    path = output.allocate("images", "canvas", output.image_ext())
+    metadata.save_image(image, path, record)
+    print(f"[Tiled] Saving to {path}")
+
+    return image
@@ -0,0 +1,123 @@
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from PIL import Image
+
+# Color vector tracing: quantize to at most MAX_COLORS flat colors, trace each
+# color's mask to polygons with OpenCV, simplify them, and stack one <path>
+# per color (largest area first). Layers are traced in parallel; OpenCV
+# releases the GIL.
+MAX_COLORS = 8
+# Douglas-Peucker tolerance in traced pixels; higher = fewer points, smaller SVG
+SIMPLIFY = 1.0
+# Islands and holes of fewer than this many traced pixels are dropped
+# (quantization speckle); strokes of any width with more pixels stay
+MIN_AREA = 12
+# Trace at most this many pixels on the long side; the SVG scales back up
+MAX_SIDE = 1024
+# Pixels with alpha below this are transparent and not traced
+ALPHA_CUTOFF = 128
+LAYER_WORKERS = 4
+
+
+def quantize(image, colors=MAX_COLORS):
+    """Per-pixel color labels (-1 = transparent) and the label -> RGB palette."""
+    rgba = np.asarray(image.convert("RGBA"))
+    alpha = rgba[..., 3]
+    pixels = rgba[..., :3].copy()
+    opaque = alpha >= ALPHA_CUTOFF
+    if opaque.any() and not opaque.all():
+        # Paint transparent pixels with the median opaque color so they don't
+        # claim a palette entry of their own
+        pixels[~opaque] = np.median(pixels[opaque], axis=0).astype(np.uint8)
+    rgb = Image.fromarray(pixels)
+    # Median cut without dithering gives flat regions, which trace cleanly
+    pal = rgb.quantize(colors=colors, method=Image.Quantize.MEDIANCUT, dither=Image.Dither.NONE)
+    # Speckle on anti-aliased edges is dropped per layer (see _despeckle)
+    labels = np.asarray(pal, dtype=np.int16)
+    labels[~opaque] = -1
+    palette = np.array(pal.getpalette()[:3 * colors], dtype=np.uint8).reshape(-1, 3)
+    return labels, palette
+
+
+def _format_path(contours):
+    parts = []
+    for contour in contours:
+        points = contour.reshape(-1, 2)
+        # Contour points are pixel centres; pixel i spans [i, i + 1] in the SVG
+        x0, y0 = points[0] + 0.5
+        # Relative line-to commands keep numbers short
+        deltas = " ".join(f"{dx} {dy}" for dx, dy in np.diff(points, axis=0))
+        parts.append(f"M{x0:g} {y0:g}l{deltas}z" if deltas else f"M{x0:g} {y0:g}z")
+    return "".join(parts)
+
+
+def _despeckle(mask, min_area):
+    """Drop islands and fill holes of fewer than min_area pixels.
+
+    Counting pixels rather than outline area keeps 1-px strokes, whose
+    outlines enclose almost nothing.
+    """
+    import cv2
+
+    _, islands, stats, _ = cv2.connectedComponentsWithStats(mask, connectivity=8)
+    small = stats[:, cv2.CC_STAT_AREA] < min_area
+    small[0] = False  # background
+    mask = np.where(small[islands], 0, mask).astype(np.uint8)
+    _, holes, stats, _ = cv2.connectedComponentsWithStats((mask == 0).astype(np.uint8), connectivity=4)
+    small = stats[:, cv2.CC_STAT_AREA] < min_area
+    small[0] = False  # the layer itself
+    mask[small[holes]] = 255
+    return mask
+
+
+def trace_layer(mask, simplify=SIMPLIFY, min_area=MIN_AREA):
+    """SVG path data for a binary mask, holes included (use fill-rule evenodd)."""
+    import cv2
+
+    mask = _despeckle(mask, min_area)
+    # Replicate the border so shapes touching the image edge run past it,
+    # then grow each layer by a pixel so simplified neighbours overlap
+    # instead of leaving hairline gaps between colors
+    mask = cv2.copyMakeBorder(mask, 1, 1, 1, 1, cv2.BORDER_REPLICATE)
+    mask = cv2.dilate(mask, np.ones((3, 3), np.uint8))
+    contours, _ = cv2.findContours(mask, cv2.RETR_CCOMP, cv2.CHAIN_APPROX_SIMPLE, offset=(-1, -1))
+    kept = []
+    for contour in contours:
+        approx = cv2.approxPolyDP(contour, simplify, True)
+        if len(approx) >= 3:
+            kept.append(approx)
+    return _format_path(kept)
+
+
+def to_svg(image, colors=MAX_COLORS, simplify=SIMPLIFY, min_area=MIN_AREA, max_side=MAX_SIDE):
+    """Trace a raster image into a compact multi-color SVG string."""
+    width, height = image.size
+    scale = min(1.0, max_side / max(width, height))
+    if scale < 1.0:
+        image = image.resize((max(1, round(width * scale)), max(1, round(height * scale))), Image.LANCZOS)
+    labels, palette = quantize(image, colors)
+
+    present, counts = np.unique(labels[labels >= 0], return_counts=True)
+    # Biggest areas first, so smaller details are painted on top
+    order = present[np.argsort(-counts)]
+
+    def layer(label):
+        mask = (labels == label).astype(np.uint8) * 255
+        return label, trace_layer(mask, simplify, min_area)
+
+    with ThreadPoolExecutor(max_workers=LAYER_WORKERS) as pool:
+        layers = list(pool.map(layer, order))
+
+    tw, th = image.size
+    paths = [
+        f'<path fill="#{r:02x}{g:02x}{b:02x}" d="{d}"/>'
+        for label, d in layers if d
+        for r, g, b in [palette[label]]
+    ]
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" '
+        f'viewBox="0 0 {tw} {th}" fill-rule="evenodd">\n'
+        + "\n".join(paths)
+        + "\n</svg>\n"
+    )
@@ -1,11 +1,16 @@
 import os
-import datetime
 import subprocess
-import torch
+import shutil
+import threading
+from . import cache, metadata, output, resources
 
-OUT_DIR = os.path.expanduser("~/CreationStudio/outputs/video")
+# Folder under output.OUT_DIR
+OUT_SUBDIR = "video"
+MODEL_ID = "Wan-AI/Wan2.1-T2V-1.3B"
+NUM_STEPS = 30
 
 _pipe = None
+_load_lock = threading.Lock()
 
 SOCIAL_PRESETS = {
     "Instagram Reels / TikTok (9:16)": (1080, 1920),
@@ -16,23 +21,39 @@ SOCIAL_PRESETS = {
 }
 
 
+def _unload():
+    global _pipe
+    _pipe = None
+
+
+def _offload_to(pipe, device):
+    # Weights stay on CPU and each component visits the GPU while it runs
+    pipe.enable_model_cpu_offload(device=device)
+
+
 def load_pipeline():
     global _pipe
-    if _pipe is None:
-        from diffusers import WanPipeline
-        from .device import DEVICE, DTYPE
-
-        print("[VideoGen] Loading Wan 2.1 T2V-1.3B...")
-        _pipe = WanPipeline.from_pretrained(
-            "Wan-AI/Wan2.1-T2V-1.3B",
-            torch_dtype=DTYPE,
-        )
-        if DEVICE == "cuda":
-            _pipe.enable_model_cpu_offload()
+    with _load_lock:
+        if _pipe is None:
+            from diffusers import WanPipeline
+            from .device import DEVICE, DTYPE
+
+            print("[VideoGen] Loading Wan 2.1 T2V-1.3B...")
+            _pipe = WanPipeline.from_pretrained(
+                MODEL_ID,
+                torch_dtype=DTYPE,
+            )
+            if DEVICE == "cuda":
+                # With CPU offload only the largest component is on the GPU at once
+                largest = max(resources.footprint(m) for m in _pipe.components.values() if hasattr(m, "parameters"))
+                device = resources.claim("video", _pipe, unload=_unload, offload=False,
+                                         move=_offload_to, size=largest)
+            else:
+                device = resources.claim("video", _pipe, unload=_unload, offload=False)
+            print(f"[VideoGen] Wan 2.2 ready on {device}")
         else:
-            _pipe = _pipe.to(DEVICE)
-        print("[VideoGen] Wan 2.2 ready!")
-    return _pipe
+            resources.touch("video")
+        return _pipe
 
 
 def _resolve_dimensions(preset, custom_w, custom_h):
@@ -50,22 +71,23 @@ def _resolve_dimensions(preset, custom_w, custom_h):
 def _postprocess_video(raw_path, final_path, target_w, target_h, fps, output_format):
     """Use ffmpeg to resize and convert video format."""
     try:
-        cmd = ["ffmpeg", "-y", "-i", raw_path]
-        if target_w and target_h:
-            cmd += [
-                "-vf",
-                f"scale={target_w}:{target_h}:force_original_aspect_ratio=decrease,"
-                f"pad={target_w}:{target_h}:(ow-iw)/2:(oh-ih)/2",
-            ]
-
-        if output_format == "gif":
-            cmd += ["-vf", f"fps={fps},scale=480:-1:flags=lanczos", final_path]
-        elif output_format == "webm":
-            cmd += ["-c:v", "libvpx-vp9", "-crf", "30", "-b:v", "0", final_path]
-        else:  # mp4
-            cmd += ["-c:v", "libx264", "-preset", "medium", "-crf", "23", final_path]
-
-        subprocess.run(cmd, check=True, capture_output=True)
+        with output.writing(final_path) as tmp:
+            cmd = ["ffmpeg", "-y", "-i", raw_path]
+            if target_w and target_h:
+                cmd += [
+                    "-vf",
+                    f"scale={target_w}:{target_h}:force_original_aspect_ratio=decrease,"
+                    f"pad={target_w}:{target_h}:(ow-iw)/2:(oh-ih)/2",
+                ]
+
+            if output_format == "gif":
+                cmd += ["-vf", f"fps={fps},scale=480:-1:flags=lanczos", tmp]
+            elif output_format == "webm":
+                cmd += ["-c:v", "libvpx-vp9", "-crf", "30", "-b:v", "0", tmp]
+            else:  # mp4
+                cmd += ["-c:v", "libx264", "-preset", "medium", "-crf", "23", tmp]
+
+            subprocess.run(cmd, check=True, capture_output=True)
         os.unlink(raw_path)
         return final_path
     except (FileNotFoundError, subprocess.CalledProcessError) as e:
@@ -73,36 +95,83 @@ def _postprocess_video(raw_path, final_path, target_w, target_h, fps, output_for
         return raw_path
 
 
-def generate_video(prompt, num_frames, guidance_scale, fps, preset, output_format, custom_w=None, custom_h=None):
-    """Generate a single video clip."""
+def generate_video(prompt, num_frames, guidance_scale, fps, preset, output_format, custom_w=None, custom_h=None, seed=0, job=None):
+    """Generate a single video clip. Pass a jobs.Job for progress and cancellation."""
     from diffusers.utils import export_to_video
 
+    fps = int(fps)
+    target_w, target_h = _resolve_dimensions(preset, custom_w, custom_h)
+    output_format = output_format.lower()
+    output_id = output.new_id()
+    final_path = output.allocate(OUT_SUBDIR, "video", output_format, output_id)
+    record = metadata.make_record(
+        "video",
+        prompt=prompt,
+        num_frames=int(num_frames),
+        guidance_scale=float(guidance_scale),
+        fps=fps,
+        preset=preset,
+        format=output_format,
+        size=[target_w, target_h],
+        seed=int(seed or 0),
+    )
+
+    # Only seeded requests are reproducible, so only those are cached
+    key = None
+    if seed and seed > 0:
+        key = cache.make_key(
+            "video",
+            prompt=prompt,
+            num_frames=int(num_frames),
+            guidance_scale=float(guidance_scale),
+            fps=fps,
+            size=(target_w, target_h),
+            format=output_format,
+            model=MODEL_ID,
+            revision=cache.hub_revision(MODEL_ID),
+            seed=int(seed),
+        )
+        hit = cache.lookup("video", key, output_format)
+        if hit:
+            output.copy(hit, final_path)
+            metadata.write_sidecar(final_path, record)
+            return final_path
+
+    import torch
+
     pipeline = load_pipeline()
 
     # Wan 2.2 1.3B works best at 480p
     gen_height, gen_width = 480, 832
 
-    video = pipeline(
-        prompt=prompt,
-        num_frames=int(num_frames),
-        guidance_scale=float(guidance_scale),
-        height=gen_height,
-        width=gen_width,
-        num_inference_steps=30,
-    ).frames[0]
+    generator = None
+    if key:
+        generator = torch.Generator(device="cpu").manual_seed(int(seed))
+    if job:
+        job.start(NUM_STEPS)
 
-    os.makedirs(OUT_DIR, exist_ok=True)
-    ts = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-    fps = int(fps)
+    with resources.using("video"):
+        video = pipeline(
+            prompt=prompt,
+            num_frames=int(num_frames),
+            guidance_scale=float(guidance_scale),
+            height=gen_height,
+            width=gen_width,
+            num_inference_steps=NUM_STEPS,
+            generator=generator,
+            callback_on_step_end=job.step_callback() if job else None,
+        ).frames[0]
 
-    raw_path = os.path.join(OUT_DIR, f"raw_{ts}.mp4")
-    export_to_video(video, raw_path, fps=fps)
+    raw_path = output.allocate(OUT_SUBDIR, "raw", "mp4", output_id)
+    with output.writing(raw_path) as tmp:
+        export_to_video(video, tmp, fps=fps)
 
-    target_w, target_h = _resolve_dimensions(preset, custom_w, custom_h)
-    output_format = output_format.lower()
-    final_path = os.path.join(OUT_DIR, f"video_{ts}.{output_format}")
     final_path = _postprocess_video(raw_path, final_path, target_w, target_h, fps, output_format)
+    # ffmpeg failures return the raw mp4, which must not be cached as output_format
+    if key and final_path != raw_path:
+        cache.store("video", key, output_format, lambda p: shutil.copyfile(final_path, p))
 
+    metadata.write_sidecar(final_path, record)
     print(f"[VideoGen] Saved to {final_path}")
     return final_path
 
@@ -118,36 +187,35 @@ def generate_video_chain(prompts_text, frames_each, guidance_scale, fps, preset,
     pipeline = load_pipeline()
     gen_height, gen_width = 480, 832
     fps = int(fps)
-    os.makedirs(OUT_DIR, exist_ok=True)
-    ts = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+    output_id = output.new_id()
 
     clip_paths = []
     for i, prompt in enumerate(prompts):
         print(f"[VideoGen] Generating clip {i+1}/{len(prompts)}: {prompt[:60]}...")
 
-        video = pipeline(
-            prompt=prompt,
-            num_frames=int(frames_each),
-            guidance_scale=float(guidance_scale),
-            height=gen_height,
-            width=gen_width,
-            num_inference_steps=30,
-        ).frames[0]
-
-        clip_path = os.path.join(OUT_DIR, f"clip_{ts}_{i:02d}.mp4")
-        export_to_video(video, clip_path, fps=fps)
+        with resources.using("video"):
+            video = pipeline(
+                prompt=prompt,
+                num_frames=int(frames_each),
+                guidance_scale=float(guidance_scale),
+                height=gen_height,
+                width=gen_width,
+                num_inference_steps=NUM_STEPS,
+            ).frames[0]
+
+        clip_path = output.allocate(OUT_SUBDIR, "clip", "mp4", f"{output_id}_{i:02d}")
+        with output.writing(clip_path) as tmp:
+            export_to_video(video, tmp, fps=fps)
         clip_paths.append(clip_path)
 
     # Stitch clips with ffmpeg concat
     if len(clip_paths) == 1:
         stitched_raw = clip_paths[0]
     else:
-        concat_file = os.path.join(OUT_DIR, f"concat_{ts}.txt")
-        with open(concat_file, "w") as f:
-            for cp in clip_paths:
-                f.write(f"file '{cp}'\n")
+        concat_file = output.allocate(OUT_SUBDIR, "concat", "txt", output_id)
+        output.write_text(concat_file, "".join(f"file '{cp}'\n" for cp in clip_paths))
 
-        stitched_raw = os.path.join(OUT_DIR, f"stitched_raw_{ts}.mp4")
+        stitched_raw = output.allocate(OUT_SUBDIR, "stitched_raw", "mp4", output_id)
         try:
             crossfade_sec = float(crossfade_frames) / fps if crossfade_frames > 0 else 0
 
@@ -166,18 +234,20 @@ def generate_video_chain(prompts_text, frames_each, guidance_scale, fps, preset,
                     )
                     prev = out
 
-                cmd = ["ffmpeg", "-y"] + inputs + [
-                    "-filter_complex", ";".join(filter_parts),
-                    "-map", "[vout]", "-c:v", "libx264", "-preset", "medium", "-crf", "23",
-                    stitched_raw,
-                ]
-                subprocess.run(cmd, check=True, capture_output=True)
+                with output.writing(stitched_raw) as tmp:
+                    cmd = ["ffmpeg", "-y"] + inputs + [
+                        "-filter_complex", ";".join(filter_parts),
+                        "-map", "[vout]", "-c:v", "libx264", "-preset", "medium", "-crf", "23",
+                        tmp,
+                    ]
+                    subprocess.run(cmd, check=True, capture_output=True)
             else:
                 # Simple concat
-                subprocess.run(
-                    ["ffmpeg", "-y", "-f", "concat", "-safe", "0", "-i", concat_file, "-c", "copy", stitched_raw],
-                    check=True, capture_output=True,
-                )
+                with output.writing(stitched_raw) as tmp:
+                    subprocess.run(
+                        ["ffmpeg", "-y", "-f", "concat", "-safe", "0", "-i", concat_file, "-c", "copy", tmp],
+                        check=True, capture_output=True,
+                    )
 
             # Clean up clips
             for cp in clip_paths:
@@ -190,7 +260,7 @@ def generate_video_chain(prompts_text, frames_each, guidance_scale, fps, preset,
     # Final resize + format conversion
     target_w, target_h = _resolve_dimensions(preset, custom_w, custom_h)
     output_format = output_format.lower()
-    final_path = os.path.join(OUT_DIR, f"chain_{ts}.{output_format}")
+    final_path = output.allocate(OUT_SUBDIR, "chain", output_format, output_id)
     final_path = _postprocess_video(stitched_raw, final_path, target_w, target_h, fps, output_format)
 
     print(f"[VideoGen] Chain saved to {final_path}")
@@ -1,13 +1,14 @@
-import os
-import datetime
+import threading
 import numpy as np
-import torch
-from .device import DEVICE
+from . import cache, dsp, metadata, output, resources
 
-OUT_DIR = os.path.expanduser("~/CreationStudio/outputs/voice")
+# Folder under output.OUT_DIR
+OUT_SUBDIR = "voice"
+MODEL_ID = "parler-tts/parler-tts-mini-v1.1"
 
 _model = None
 _tokenizer = None
+_load_lock = threading.Lock()
 
 # Voice style descriptions for Parler TTS — plain English, not cryptic presets
 VOICE_PRESETS = {
@@ -30,16 +31,42 @@ def get_voice_names():
 
 def load_model():
     global _model, _tokenizer
-    if _model is None:
-        from parler_tts import ParlerTTSForConditionalGeneration
-        from transformers import AutoTokenizer
 
-        model_id = "parler-tts/parler-tts-mini-v1.1"
-        print(f"[VoiceGen] Loading Parler TTS ({model_id})...")
-        _tokenizer = AutoTokenizer.from_pretrained(model_id)
-        _model = ParlerTTSForConditionalGeneration.from_pretrained(model_id).to(DEVICE)
-        print(f"[VoiceGen] Parler TTS loaded on {DEVICE}")
-    return _model, _tokenizer
+    with _load_lock:
+        if _model is None:
+            from parler_tts import ParlerTTSForConditionalGeneration
+            from transformers import AutoTokenizer
+            from .device import CPU_INT8, accelerators, quantize_int8
+
+            print(f"[VoiceGen] Loading Parler TTS ({MODEL_ID})...")
+            _tokenizer = AutoTokenizer.from_pretrained(MODEL_ID)
+            _model = ParlerTTSForConditionalGeneration.from_pretrained(MODEL_ID)
+            devices = accelerators()
+            if devices == ["cpu"] and CPU_INT8 and quantize_int8(_model):
+                print("[VoiceGen] int8 text encoder and decoder")
+            device = resources.claim("voice", _model, devices=devices, unload=_unload)
+            print(f"[VoiceGen] Parler TTS loaded on {device}")
+        else:
+            resources.touch("voice")
+        return _model, _tokenizer
+
+
+def precision():
+    """What Parler runs in here: "fp32", or the CPU profile's int8/bf16 settings.
+
+    Both change the samples, so they're part of the cache key.
+    """
+    from .device import CPU_INT8, accelerators, configure_cpu
+
+    if accelerators() != ["cpu"]:
+        return "fp32"
+    modes = [m for m, on in (("int8", CPU_INT8), ("bf16", configure_cpu()["bf16"])) if on]
+    return "+".join(modes) or "fp32"
+
+
+def _unload():
+    global _model, _tokenizer
+    _model, _tokenizer = None, None
 
 
 def _split_sentences(text):
@@ -61,55 +88,79 @@ def _split_sentences(text):
     return chunks if chunks else [text]
 
 
-def generate_voice(text, voice_preset_name, export_fmt="WAV"):
+def generate_voice(text, voice_preset_name, export_fmt="WAV", seed=0):
     """Generate voice from text using Parler TTS. Returns (audio_tuple, file_path)."""
-    model, tokenizer = load_model()
     description = VOICE_PRESETS.get(voice_preset_name, VOICE_PRESETS["Female (Professional)"])
+    record = metadata.make_record("voice", text=text, voice=voice_preset_name, seed=int(seed))
+
+    # Parler samples, so only seeded requests are reproducible and cached
+    key = None
+    if seed > 0:
+        key = cache.make_key(
+            "voice",
+            text=text,
+            description=description,
+            model=MODEL_ID,
+            revision=cache.hub_revision(MODEL_ID),
+            seed=int(seed),
+            # Reduced precision changes the samples; fp32 keys stay as they were
+            **({} if precision() == "fp32" else {"precision": precision()}),
+        )
+        hit = cache.lookup("voice", key, "npz")
+        if hit:
+            sample_rate, full_audio = cache.load_audio(hit)
+            return _save_voice(sample_rate, full_audio, export_fmt, record)
+
+    import torch
+    from .device import cpu_autocast, sampling_rng
+
+    model, tokenizer = load_model()
 
     chunks = _split_sentences(text)
     all_audio = []
     sample_rate = model.config.sampling_rate
 
-    for i, chunk in enumerate(chunks):
-        if not chunk.strip():
-            continue
-        print(f"[VoiceGen] Generating segment {i+1}/{len(chunks)}: {chunk[:50]}...")
+    with sampling_rng(seed if key else None), resources.using("voice") as device, cpu_autocast(device):
+        for i, chunk in enumerate(chunks):
+            if not chunk.strip():
+                continue
+            print(f"[VoiceGen] Generating segment {i+1}/{len(chunks)}: {chunk[:50]}...")
 
-        input_ids = tokenizer(description, return_tensors="pt").input_ids.to(DEVICE)
-        prompt_input_ids = tokenizer(chunk, return_tensors="pt").input_ids.to(DEVICE)
+            input_ids = tokenizer(description, return_tensors="pt").input_ids.to(model.device)
+            prompt_input_ids = tokenizer(chunk, return_tensors="pt").input_ids.to(model.device)
 
-        with torch.no_grad():
-            generation = model.generate(
-                input_ids=input_ids,
-                prompt_input_ids=prompt_input_ids,
-            )
+            with torch.no_grad():
+                generation = model.generate(
+                    input_ids=input_ids,
+                    prompt_input_ids=prompt_input_ids,
+                )
 
-        audio_np = generation.cpu().numpy().squeeze()
-        all_audio.append(audio_np)
+            audio_np = generation.float().cpu().numpy().squeeze()
+            all_audio.append(audio_np)
 
-        # Add brief silence between chunks
-        if i < len(chunks) - 1:
-            silence = np.zeros(int(sample_rate * 0.4))
-            all_audio.append(silence)
+            # Add brief silence between chunks
+            if i < len(chunks) - 1:
+                silence = np.zeros(int(sample_rate * 0.4))
+                all_audio.append(silence)
 
     if not all_audio:
         return None, None
 
     full_audio = np.concatenate(all_audio)
 
-    # Normalize audio
-    max_val = np.max(np.abs(full_audio))
-    if max_val > 0:
-        full_audio = full_audio / max_val * 0.95
+    sample_rate, full_audio = dsp.process(full_audio, sample_rate, target_lufs=dsp.VOICE_LUFS)
+
+    if key:
+        cache.store_audio("voice", key, sample_rate, full_audio)
+
+    return _save_voice(sample_rate, full_audio, export_fmt, record)
 
-    # Save
-    os.makedirs(OUT_DIR, exist_ok=True)
-    ts = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
 
-    import scipy.io.wavfile
-    audio_int16 = np.clip(full_audio * 32767, -32768, 32767).astype(np.int16)
-    wav_path = os.path.join(OUT_DIR, f"voice_{ts}.wav")
-    scipy.io.wavfile.write(wav_path, sample_rate, audio_int16)
+def _save_voice(sample_rate, full_audio, export_fmt, record):
+    """Write the voice track as WAV, converting to MP3/OGG if requested."""
+    wav_path = output.allocate(OUT_SUBDIR, "voice", "wav")
+    output.write_wav(wav_path, sample_rate, dsp.to_int16(full_audio))
+    metadata.write_sidecar(wav_path, record)
 
     export_fmt = export_fmt.lower()
     if export_fmt == "wav":
@@ -118,12 +169,11 @@ def generate_voice(text, voice_preset_name, export_fmt="WAV"):
     try:
         from pydub import AudioSegment
         sound = AudioSegment.from_wav(wav_path)
-        if export_fmt == "mp3":
-            out_path = wav_path.replace(".wav", ".mp3")
-            sound.export(out_path, format="mp3")
-        elif export_fmt == "ogg":
-            out_path = wav_path.replace(".wav", ".ogg")
-            sound.export(out_path, format="ogg")
+        if export_fmt in ("mp3", "ogg"):
+            out_path = output.sibling(wav_path, export_fmt)
+            with output.writing(out_path) as tmp:
+                sound.export(tmp, format=export_fmt)
+            metadata.write_sidecar(out_path, record)
         else:
             out_path = wav_path
         return (sample_rate, full_audio), out_path
@@ -0,0 +1,41 @@
+import pytest
+
+pytest.importorskip("torch")
+pytest.importorskip("diffusers")
+
+from studio import image_gen, resources  # noqa: E402
+
+
+class _Module:
+    def to(self, *args, **kwargs):
+        return self
+
+
+class _FakePipe(_Module):
+    def __init__(self, name):
+        self.name = name
+        self.unet = _Module()
+        self.vae = _Module()
+
+    def enable_attention_slicing(self):
+        pass
+
+    def enable_vae_tiling(self):
+        pass
+
+
+def test_switching_checkpoints(monkeypatch):
+    monkeypatch.setattr(image_gen, "OPTIMIZE", False)
+    monkeypatch.setattr(image_gen, "load_checkpoint", lambda cls, name: _FakePipe(name))
+    monkeypatch.setattr(resources, "footprint", lambda obj, exclude=None: 0)
+
+    try:
+        assert image_gen.load_model("A").name == "A"
+        pipe = image_gen.load_model("B")
+        assert pipe.name == "B"
+        assert image_gen._pipe is pipe
+        assert resources._models["image"].obj is pipe
+        # And back again: the registration isn't left orphaned
+        assert image_gen.load_model("A").name == "A"
+    finally:
+        resources.release("image")